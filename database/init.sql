@@ -1,18 +1,42 @@
 CREATE EXTENSION IF NOT EXISTS vector;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 CREATE TABLE IF NOT EXISTS conversation_history (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     chat_id BIGINT NOT NULL,
     user_message TEXT NOT NULL,
     bot_response TEXT NOT NULL,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
     session_id UUID NOT NULL,
-    message_type VARCHAR(50) DEFAULT 'text'
-);
+    message_type VARCHAR(50) DEFAULT 'text',
+    message_key UUID,
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(user_message, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(user_message, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(bot_response, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(bot_response, '')), 'B')
+    ) STORED,
+    PRIMARY KEY (id, timestamp),
+    CONSTRAINT uq_conversation_message_key UNIQUE (message_key, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Месячные секции создаются приложением (src/database/partitions.py)
+CREATE TABLE IF NOT EXISTS conversation_history_default PARTITION OF conversation_history DEFAULT;
 
-CREATE INDEX IF NOT EXISTS idx_conversation_chat_id ON conversation_history(chat_id);
-CREATE INDEX IF NOT EXISTS idx_conversation_timestamp ON conversation_history(timestamp);
+CREATE INDEX IF NOT EXISTS idx_conversation_chat_timestamp ON conversation_history(chat_id, timestamp);
 CREATE INDEX IF NOT EXISTS idx_conversation_session ON conversation_history(session_id);
+CREATE INDEX IF NOT EXISTS idx_conversation_search ON conversation_history USING gin(search_vector);
+CREATE INDEX IF NOT EXISTS idx_conversation_user_trgm ON conversation_history USING gin(user_message gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_conversation_bot_trgm ON conversation_history USING gin(bot_response gin_trgm_ops);
+
+CREATE TABLE IF NOT EXISTS chat_stats (
+    chat_id BIGINT PRIMARY KEY,
+    message_count BIGINT NOT NULL DEFAULT 0,
+    first_message_at TIMESTAMPTZ,
+    last_message_at TIMESTAMPTZ,
+    total_response_chars BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
 
 CREATE TABLE IF NOT EXISTS knowledge_base (
     id SERIAL PRIMARY KEY,
@@ -0,0 +1,25 @@
+"""
+Заполнение таблицы chat_stats по существующей истории диалогов
+"""
+import asyncio
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from src.database.database import engine, AsyncSessionLocal
+from src.database.models import ChatStats
+from src.memory.chat_stats import chat_stats_service
+
+async def backfill():
+    print("🔄 Пересчет статистики чатов...")
+    async with engine.begin() as conn:
+        await conn.run_sync(ChatStats.__table__.create, checkfirst=True)
+
+    async with AsyncSessionLocal() as session:
+        await chat_stats_service.rebuild(session)
+        await session.commit()
+    print("✅ Статистика чатов пересчитана")
+
+if __name__ == "__main__":
+    asyncio.run(backfill())
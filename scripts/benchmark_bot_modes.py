@@ -0,0 +1,184 @@
+"""
+Бенчмарк задержки «апдейт -> ответ» для режимов бота: long polling против webhook.
+
+Поднимает локальный фейковый Bot API (aiohttp) и echo-обработчик на том же
+ChatOrderedUpdateProcessor, что и бот. Задержка считается от момента, когда
+апдейт «пришел в Telegram», до вызова sendMessage. Сетевая задержка до
+реального Telegram не учитывается - сравнивается только доставка апдейта.
+"""
+import asyncio
+import argparse
+import json
+import statistics
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import httpx
+from aiohttp import web
+from fastapi import FastAPI, Request
+from telegram import Update
+from telegram.ext import Application, MessageHandler, filters
+
+from src.bot.update_processor import ChatOrderedUpdateProcessor
+
+TOKEN = "123456:BENCHMARK"
+SECRET = "benchmark-secret"
+
+class FakeBotAPI:
+    """Минимальный Bot API: getMe, getUpdates (long polling), sendMessage"""
+
+    def __init__(self):
+        self.updates: asyncio.Queue = asyncio.Queue()
+        self.injected_at = {}
+        self.latencies = []
+        self.done = asyncio.Event()
+        self.expected = 0
+
+    def make_update(self, update_id: int, chat_id: int) -> dict:
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": "Bench"},
+                "text": str(update_id)
+            }
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        elif method == "getUpdates":
+            result = await self._get_updates(float(params.get("timeout", 0)))
+        elif method == "sendMessage":
+            update_id = int(params["text"])
+            self.latencies.append((time.perf_counter() - self.injected_at[update_id]) * 1000)
+            if len(self.latencies) >= self.expected:
+                self.done.set()
+            chat_id = int(params["chat_id"])
+            result = {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params["text"]
+            }
+        else:
+            result = True
+
+        return web.json_response({"ok": True, "result": result})
+
+    async def _get_updates(self, timeout: float) -> list:
+        try:
+            first = await asyncio.wait_for(self.updates.get(), timeout=timeout or 0.01)
+        except asyncio.TimeoutError:
+            return []
+        batch = [first]
+        while not self.updates.empty():
+            batch.append(self.updates.get_nowait())
+        return batch
+
+async def echo(update: Update, context):
+    await update.message.reply_text(update.message.text)
+
+def build_application(base_url: str, concurrency: int, webhook: bool) -> Application:
+    builder = (
+        Application.builder()
+        .token(TOKEN)
+        .base_url(base_url)
+        .concurrent_updates(ChatOrderedUpdateProcessor(concurrency))
+    )
+    if webhook:
+        builder = builder.updater(None)
+    application = builder.build()
+    application.add_handler(MessageHandler(filters.TEXT, echo))
+    return application
+
+def build_webhook_api(application: Application) -> FastAPI:
+    """Тот же путь, что у /telegram/webhook в src/main.py"""
+    api = FastAPI()
+
+    @api.post("/telegram/webhook")
+    async def webhook(request: Request):
+        if request.headers.get("X-Telegram-Bot-Api-Secret-Token") != SECRET:
+            return {"ok": False}
+        update = Update.de_json(await request.json(), application.bot)
+        await application.update_queue.put(update)
+        return {"ok": True}
+
+    return api
+
+async def run_mode(mode: str, port: int, updates: int, chats: int, interval: float, concurrency: int):
+    fake = FakeBotAPI()
+    fake.expected = updates
+
+    server = web.Application()
+    server.router.add_post("/bot{token}/{method}", fake.handle)
+    runner = web.AppRunner(server)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+
+    application = build_application(f"http://127.0.0.1:{port}/bot", concurrency, mode == "webhook")
+    await application.initialize()
+    await application.start()
+
+    client = None
+    if mode == "polling":
+        await application.updater.start_polling(poll_interval=0, timeout=10)
+    else:
+        transport = httpx.ASGITransport(app=build_webhook_api(application))
+        client = httpx.AsyncClient(transport=transport, base_url="http://app")
+
+    for update_id in range(1, updates + 1):
+        payload = fake.make_update(update_id, 1000 + update_id % chats)
+        fake.injected_at[update_id] = time.perf_counter()
+        if mode == "polling":
+            fake.updates.put_nowait(payload)
+        else:
+            await client.post(
+                "/telegram/webhook",
+                content=json.dumps(payload),
+                headers={"X-Telegram-Bot-Api-Secret-Token": SECRET, "Content-Type": "application/json"}
+            )
+        if interval:
+            await asyncio.sleep(interval / 1000)
+
+    await asyncio.wait_for(fake.done.wait(), timeout=60)
+
+    if mode == "polling":
+        await application.updater.stop()
+    else:
+        await client.aclose()
+    await application.stop()
+    await application.shutdown()
+    await runner.cleanup()
+
+    timings = sorted(fake.latencies)
+    p50 = timings[len(timings) // 2]
+    p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+    print(
+        f"   {mode:<10} mean {statistics.mean(timings):7.3f} ms   "
+        f"p50 {p50:7.3f} ms   p95 {p95:7.3f} ms   max {timings[-1]:7.3f} ms"
+    )
+
+async def main(updates: int, chats: int, interval: float, concurrency: int, port: int):
+    print(f"🔄 Задержка апдейт -> ответ ({updates} апдейтов, {chats} чатов, интервал {interval} мс)\n")
+    await run_mode("polling", port, updates, chats, interval, concurrency)
+    await run_mode("webhook", port + 1, updates, chats, interval, concurrency)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Telegram bot polling vs webhook latency benchmark')
+    parser.add_argument('--updates', type=int, default=500)
+    parser.add_argument('--chats', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=2.0, help='пауза между апдейтами, мс')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--port', type=int, default=18081)
+    args = parser.parse_args()
+    asyncio.run(main(args.updates, args.chats, args.interval, args.concurrency, args.port))
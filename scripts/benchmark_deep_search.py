@@ -0,0 +1,110 @@
+"""
+Бенчмарк глубокого веб-поиска на локальной замене DuckDuckGo и сайтов:
+последовательная загрузка страниц выдачи против одновременной
+(WEB_SEARCH_DEEP_CONCURRENCY / WEB_SEARCH_DEEP_PER_HOST).
+
+Фейковый сервер отдает мгновенный ответ, HTML-выдачу со ссылками через
+редирект uddg и страницы с задержкой --delay. Страницы разнесены по
+двум хостам (127.0.0.1 и localhost), чтобы работал лимит на хост.
+Кэш отключен, Redis не нужен.
+"""
+import asyncio
+import argparse
+import sys
+import os
+import time
+from urllib.parse import quote
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from aiohttp import web
+
+from src.config import settings
+from src.mcp.services import WebSearchService
+
+PORT = 18091
+PARAGRAPH = (
+    "Медианная зарплата {level} Python-разработчика по данным вакансии номер {page} "
+    "составляет {salary} тысяч рублей в месяц, в зависимости от города и стека."
+)
+
+async def instant_answer(request: web.Request) -> web.Response:
+    return web.json_response({
+        "Heading": "Python",
+        "AbstractText": "Python - язык программирования общего назначения.",
+        "AbstractURL": f"http://127.0.0.1:{PORT}/page/0",
+        "RelatedTopics": []
+    })
+
+async def html_results(request: web.Request) -> web.Response:
+    pages = request.app["pages"]
+    hosts = ("127.0.0.1", "localhost")
+    links = "\n".join(
+        f'<a rel="nofollow" class="result__a" href="//duckduckgo.com/l/?uddg='
+        f'{quote(f"http://{hosts[n % 2]}:{PORT}/page/{n}", safe="")}&amp;rut=x">Result {n}</a>'
+        for n in range(1, pages)
+    )
+    return web.Response(text=f"<html><body>{links}</body></html>", content_type="text/html")
+
+async def page(request: web.Request) -> web.Response:
+    await asyncio.sleep(request.app["delay"])
+    n = int(request.match_info["n"])
+    paragraphs = "".join(
+        f"<p>{PARAGRAPH.format(level=level, page=n, salary=150 + 50 * i)}</p>"
+        for i, level in enumerate(["junior", "middle", "senior", "lead"])
+    )
+    body = (
+        f"<html><head><title>Зарплаты, страница {n}</title></head><body>"
+        f"<nav><a href='/'>Главная</a></nav><article><h1>Обзор рынка {n}</h1>{paragraphs}</article>"
+        f"<footer>© Сайт вакансий, все права защищены и так далее по тексту</footer></body></html>"
+    )
+    return web.Response(text=body, content_type="text/html")
+
+async def run(service: WebSearchService, query: str, concurrency: int, per_host: int) -> float:
+    service.pages._semaphore = asyncio.Semaphore(concurrency)
+    service.pages.per_host = per_host
+    service.pages._hosts.clear()
+    started = time.perf_counter()
+    result = await service.search(query, deep=True)
+    elapsed = time.perf_counter() - started
+
+    deep = result["deep"]
+    tokens = sum(page["tokens"] for page in deep["pages"])
+    print(
+        f"   concurrency={concurrency:<2} per_host={per_host:<2} {elapsed * 1000:8.1f} ms   "
+        f"страниц {len(deep['pages'])}, ошибок {len(deep['failed'])}, ~{tokens} токенов"
+    )
+    return elapsed
+
+async def main(pages: int, delay: float):
+    server = web.Application()
+    server["pages"] = pages
+    server["delay"] = delay
+    server.router.add_get("/", instant_answer)
+    server.router.add_get("/html/", html_results)
+    server.router.add_get("/page/{n}", page)
+    runner = web.AppRunner(server)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+
+    settings.web_search.deep_max_pages = pages
+    service = WebSearchService()
+    service.base_url = f"http://127.0.0.1:{PORT}/"
+    service.html_url = f"http://127.0.0.1:{PORT}/html/"
+    service.cache.enabled = False
+    await service.start()
+
+    print(f"🔄 Глубокий поиск: {pages} страниц, задержка сервера {delay * 1000:.0f} ms\n")
+    sequential = await run(service, "средняя зарплата python", 1, 1)
+    concurrent = await run(service, "средняя зарплата python", pages, 2)
+    print(f"\n✅ Ускорение: x{sequential / concurrent:.1f}")
+
+    await service.close()
+    await runner.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Deep web search benchmark against a local stand-in')
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--delay', type=float, default=0.3, help='задержка ответа страницы, с')
+    args = parser.parse_args()
+    asyncio.run(main(args.pages, args.delay))
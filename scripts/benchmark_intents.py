@@ -0,0 +1,91 @@
+"""
+Микро-бенчмарк классификации сообщений:
+старые проверки подстрок (_get_simple_response + три списка ключевых слов
++ _extract_search_query)
+против скомпилированного IntentMatcher
+"""
+import argparse
+import sys
+import os
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from src.bot.intents import intent_matcher
+
+MESSAGES = [
+    "Привет!",
+    "Найди senior Python разработчика в Москве с опытом FastAPI",
+    "Посмотри профиль github.com/torvalds и его репозитории",
+    "Обнови таблицу кандидатов, добавь Ивана",
+    "Какие вопросы задать на собеседовании тимлиду?",
+    "latest news about contest for developers",
+    "Поищи информацию про зарплаты Go разработчиков в 2024 году",
+    "Как дела?",
+    "Сравни двух кандидатов по опыту и стеку, у первого 5 лет Java, у второго 3 года Kotlin " * 4,
+]
+
+LEGACY_RESPONSES = {
+    'привет': '👋 Привет! Я HR-ассистент. Чем могу помочь?',
+    'hello': '👋 Hello! I am HR Assistant. How can I help you?',
+    'как дела': '🤖 У меня все отлично! Готов помочь с поиском кандидатов.',
+    'help': '📋 Используйте /help для списка команд',
+    'start': '🚀 Используйте /start для начала работы',
+    'health': '🏥 Используйте /health для проверки статуса',
+    'test': '🧪 Тестовый режим работает!',
+    'тест': '🧪 Тестовый режим работает!',
+}
+
+def legacy_extract_search_query(message: str) -> str:
+    search_keywords = ['найди', 'поищи', 'ищи', 'search', 'find', 'google']
+    words = message.lower().split()
+    query_words = []
+    collect = False
+    for word in words:
+        if word in search_keywords:
+            collect = True
+            continue
+        if collect and word not in ['информацию', 'информация', 'про', 'о', 'the', 'a', 'an']:
+            query_words.append(word)
+    if not query_words:
+        query_words = [word for word in words if word not in ['бот', 'bot', 'assistant', 'помощник']]
+    return ' '.join(query_words).strip()
+
+def legacy_classify(message: str):
+    message_lower = message.lower()
+    for key, response in LEGACY_RESPONSES.items():
+        if key in message_lower:
+            return response, []
+
+    tools = []
+    if any(keyword in message_lower for keyword in ['github', 'профиль', 'репозиторий', 'git']):
+        tools.append("github")
+    if any(keyword in message_lower for keyword in ['найди', 'поищи', 'информация', 'search']):
+        tools.append("web_search")
+        legacy_extract_search_query(message)
+    if any(keyword in message_lower for keyword in ['таблиц', 'sheet', 'excel', 'обнови']):
+        tools.append("google_sheets")
+    return None, tools
+
+def main(iterations: int):
+    print(f"🔄 Классификация {len(MESSAGES)} сообщений x {iterations}\n")
+
+    for name, func in (("legacy substrings", legacy_classify), ("compiled matcher", intent_matcher.classify)):
+        seconds = timeit.timeit(lambda: [func(message) for message in MESSAGES], number=iterations)
+        per_message = seconds / (iterations * len(MESSAGES)) * 1e6
+        print(f"   {name:<20} {per_message:7.2f} µs/сообщение")
+
+    print("\n🔍 Расхождения:")
+    for message in MESSAGES:
+        legacy_reply, legacy_tools = legacy_classify(message)
+        match = intent_matcher.classify(message)
+        if (legacy_reply, legacy_tools) != (match.reply, match.tools):
+            print(f"   {message[:50]!r}")
+            print(f"      legacy:   reply={bool(legacy_reply)} tools={legacy_tools}")
+            print(f"      compiled: reply={bool(match.reply)} tools={match.tools} intents={match.intents}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Intent matcher micro-benchmark')
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+    main(args.iterations)
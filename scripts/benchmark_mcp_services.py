@@ -0,0 +1,91 @@
+"""
+Бенчмарк задержки вызовов GitHubService: новая сессия на каждый вызов
+(старая реализация) против общей keep-alive сессии PooledHTTPService.
+
+По умолчанию запросы идут в локальный фейковый GitHub API, что показывает
+только стоимость TCP и создания сессии. С --base-url https://api.github.com
+добавляются DNS и TLS (нужен GITHUB_TOKEN, иначе лимит 60 запросов в час).
+"""
+import asyncio
+import argparse
+import statistics
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import aiohttp
+from aiohttp import web
+
+from src.mcp.services import GitHubService, ssl_context
+
+PROFILE = {
+    "login": "octocat", "name": "The Octocat", "company": "GitHub", "location": "San Francisco",
+    "public_repos": 8, "followers": 1000, "following": 9
+}
+
+async def fake_user(request: web.Request) -> web.Response:
+    return web.json_response({**PROFILE, "login": request.match_info["username"]})
+
+async def legacy_get_user_profile(service: GitHubService, username: str) -> dict:
+    connector = aiohttp.TCPConnector(ssl=ssl_context)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async with session.get(f"{service.base_url}/users/{username}", headers=service.headers) as response:
+            return await response.json()
+
+async def measure(name: str, func, iterations: int, concurrency: int):
+    timings = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await func()
+            timings.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(iterations)))
+    total = time.perf_counter() - started
+
+    timings.sort()
+    p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+    print(
+        f"   {name:<22} mean {statistics.mean(timings):7.2f} ms   p95 {p95:7.2f} ms   "
+        f"{iterations / total:8.1f} вызовов/с"
+    )
+
+async def main(iterations: int, concurrency: int, base_url: str, username: str):
+    runner = None
+    if not base_url:
+        server = web.Application()
+        server.router.add_get("/users/{username}", fake_user)
+        runner = web.AppRunner(server)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 18090).start()
+        base_url = "http://127.0.0.1:18090"
+
+    service = GitHubService()
+    service.base_url = base_url
+    await service.start()
+
+    print(f"🔄 get_user_profile x {iterations} (параллельно {concurrency}) -> {base_url}\n")
+    await measure(
+        "session per call", lambda: legacy_get_user_profile(service, username), iterations, concurrency
+    )
+    await measure(
+        "pooled keep-alive", lambda: service.get_user_profile(username), iterations, concurrency
+    )
+
+    await service.close()
+    if runner:
+        await runner.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='MCP services HTTP pooling benchmark')
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--base-url', default="", help='например https://api.github.com')
+    parser.add_argument('--username', default="octocat")
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.concurrency, args.base_url, args.username))
@@ -0,0 +1,86 @@
+"""
+Бенчмарк операций с историей диалога в Redis:
+старый вариант (GET/EXPIRE/SETEX + RPUSH + EXPIRE) против Lua-скриптов RedisSessionManager
+"""
+import asyncio
+import argparse
+import json
+import statistics
+import sys
+import os
+import time
+from datetime import datetime
+from uuid import uuid4
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from src.memory.redis_manager import RedisSessionManager
+
+async def legacy_get_or_create_session(client, chat_id: int, ttl: int) -> str:
+    session_key = f"session:{chat_id}"
+    existing_session = await client.get(session_key)
+    if existing_session:
+        await client.expire(session_key, ttl)
+        return existing_session.decode()
+    session_id = str(uuid4())
+    await client.setex(session_key, ttl, session_id)
+    return session_id
+
+async def legacy_save(client, chat_id: int, ttl: int):
+    session_id = await legacy_get_or_create_session(client, chat_id, ttl)
+    conversation_key = f"conversation:{session_id}"
+    conversation = {
+        "user_message": "Найди Python разработчика",
+        "bot_response": "Вот подходящие кандидаты...",
+        "timestamp": datetime.now().isoformat()
+    }
+    await client.rpush(conversation_key, json.dumps(conversation, ensure_ascii=False))
+    await client.expire(conversation_key, ttl)
+
+async def legacy_history(client, chat_id: int, ttl: int, limit: int = 10):
+    session_id = await legacy_get_or_create_session(client, chat_id, ttl)
+    conversations = await client.lrange(f"conversation:{session_id}", -limit, -1)
+    return [json.loads(conv) for conv in conversations]
+
+async def measure(name: str, func, iterations: int):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"   {name:<28} mean {statistics.mean(timings):7.3f} ms   p95 {p95:7.3f} ms")
+
+async def main(iterations: int):
+    manager = RedisSessionManager()
+    await manager.init_redis()
+    client = manager.redis_client
+    ttl = manager.session_timeout
+
+    legacy_chat_id = -int(time.time())
+    new_chat_id = legacy_chat_id - 1
+
+    print(f"🔄 Бенчмарк истории Redis ({iterations} итераций)\n")
+
+    print("💾 Сохранение сообщения:")
+    await measure("legacy (4+ round trips)", lambda: legacy_save(client, legacy_chat_id, ttl), iterations)
+    await measure(
+        "lua (1 round trip)",
+        lambda: manager.save_conversation(new_chat_id, "Найди Python разработчика", "Вот подходящие кандидаты..."),
+        iterations
+    )
+
+    print("\n📖 Чтение истории:")
+    await measure("legacy (3+ round trips)", lambda: legacy_history(client, legacy_chat_id, ttl), iterations)
+    await measure("lua (1 round trip)", lambda: manager.get_conversation_history(new_chat_id), iterations)
+
+    await manager.clear_session(legacy_chat_id)
+    await manager.clear_session(new_chat_id)
+    await manager.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Redis session benchmark')
+    parser.add_argument('--iterations', type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
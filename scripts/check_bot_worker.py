@@ -0,0 +1,165 @@
+"""
+Проверка BotWorker на локальном стенде: ошибка обработчика и отложенный апдейт.
+
+Поднимает фейковый Bot API (aiohttp) и воркер на Redis из REDIS_URL с
+отдельным префиксом потоков (по умолчанию check:bot:updates). Проверяется:
+- апдейт, обработчик которого упал, оказывается в dead letter с текстом
+  ошибки, а не подтверждается как обработанный (PTB перехватывает
+  исключения хендлеров - они должны дойти до воркера);
+- апдейт, отложенный лимитом чата, возвращается в поток партиции и
+  обрабатывается, а не теряется вне потока.
+"""
+import asyncio
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("BOT_QUEUE_STREAM_PREFIX", "check:bot:updates")
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:CHECK")
+os.environ["RATE_LIMIT_ENABLED"] = "true"
+os.environ["RATE_LIMIT_WINDOW_SECONDS"] = "2"
+os.environ["RATE_LIMIT_CHAT_MESSAGES"] = "1"
+os.environ["RATE_LIMIT_MAX_DELAY"] = "5"
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application, MessageHandler, filters
+
+from src.bot.telegram_bot import bot_instance
+from src.bot.update_stream import update_stream
+from src.bot.worker import BotWorker
+from src.memory.redis_manager import redis_session_manager
+
+CHAT_ID = -990001
+
+class FakeBotAPI:
+    """getMe и sendMessage; остальные методы просто успешны"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Check", "username": "check_bot"}
+        elif method == "sendMessage":
+            self.sent.append(params["text"])
+            result = {
+                "message_id": len(self.sent),
+                "date": int(time.time()),
+                "chat": {"id": int(params["chat_id"]), "type": "private"},
+                "text": params["text"]
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+async def handle(update: Update, context):
+    if update.message.text == "fail":
+        raise RuntimeError("handler failed on purpose")
+    await update.message.reply_text(update.message.text)
+
+def make_update(update_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": CHAT_ID, "type": "private"},
+            "from": {"id": CHAT_ID, "is_bot": False, "first_name": "Check"},
+            "text": text
+        }
+    }
+
+async def wait_for(condition, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if await condition():
+            return True
+        await asyncio.sleep(0.1)
+    return False
+
+async def main(port: int, timeout: float) -> int:
+    fake = FakeBotAPI()
+    server = web.Application()
+    server.router.add_post("/bot{token}/{method}", fake.handle)
+    runner = web.AppRunner(server)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    # Хендлеры и error handler - те же, что в TelegramBot.build_application
+    application = (
+        Application.builder()
+        .token(os.environ["TELEGRAM_BOT_TOKEN"])
+        .base_url(f"http://127.0.0.1:{port}/bot")
+        .updater(None)
+        .build()
+    )
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot_instance.admission_check), group=-1)
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle))
+    application.add_error_handler(bot_instance.error_handler)
+    await application.initialize()
+    bot_instance.application = application
+
+    client = await update_stream._client()
+    stream_key = update_stream.stream_key(update_stream.partition_for(CHAT_ID))
+    await client.delete(
+        update_stream.dead_letter_key, stream_key, update_stream.delayed_key(stream_key), f"ratelimit:chat:{CHAT_ID}"
+    )
+
+    worker = BotWorker(bot_instance.process_queued_update, worker_id="check-worker")
+    worker_task = asyncio.create_task(worker.run())
+    failures = []
+    try:
+        # "fail" занимает единственное место в окне чата, "ok" откладывается лимитом
+        await update_stream.publish(make_update(1, "fail"))
+        await update_stream.publish(make_update(2, "ok"))
+
+        async def dead_lettered():
+            return await client.xlen(update_stream.dead_letter_key) >= 1
+
+        if await wait_for(dead_lettered, timeout):
+            fields = (await client.xrange(update_stream.dead_letter_key))[0][1]
+            error = fields.get(b"error", b"").decode()
+            print(f"✅ Упавший апдейт в dead letter: {error}")
+            if "RuntimeError" not in error:
+                failures.append("dead letter entry has no handler error")
+        else:
+            failures.append("failed update did not reach the dead letter stream")
+
+        async def replayed():
+            return "ok" in fake.sent
+
+        if await wait_for(replayed, timeout):
+            print(f"✅ Отложенный апдейт вернулся в поток и обработан (отложено: {worker.delayed})")
+            if not worker.delayed:
+                failures.append("update was not deferred through the stream")
+        else:
+            failures.append("deferred update was not processed")
+
+        pending = (await client.xpending(stream_key, update_stream.group))["pending"]
+        if pending:
+            failures.append(f"{pending} updates left pending")
+        print(f"📊 {worker.stats()}")
+    finally:
+        worker.stop()
+        await worker_task
+        await client.delete(update_stream.dead_letter_key, stream_key, update_stream.delayed_key(stream_key))
+        await application.shutdown()
+        await runner.cleanup()
+        await redis_session_manager.close()
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='BotWorker dead letter and deferral check')
+    parser.add_argument('--port', type=int, default=18091)
+    parser.add_argument('--timeout', type=float, default=15.0)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.port, args.timeout)))
@@ -1,22 +1,33 @@
 import asyncio
+import argparse
+import sys
+import os
 from datetime import datetime, timedelta
-from src.database.database import AsyncSessionLocal
-from src.database.models import ConversationHistory
-from sqlalchemy import delete
 
-async def cleanup_old_messages(days: int = 30):
-    """Удаление сообщений старше указанного количества дней"""
-    async with AsyncSessionLocal() as session:
-        cutoff_date = datetime.now() - timedelta(days=days)
-        
-        stmt = delete(ConversationHistory).where(
-            ConversationHistory.timestamp < cutoff_date
-        )
-        
-        result = await session.execute(stmt)
-        await session.commit()
-        
-        print(f"Удалено сообщений: {result.rowcount}")
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from src.database.database import engine
+from src.database.partitions import drop_partitions_before, ensure_partitions
+
+async def cleanup_old_messages(days: int = 30, archive_dir: str = None):
+    """Удаление сообщений старше указанного количества дней.
+
+    Вместо DELETE удаляются целые месячные секции conversation_history,
+    заодно создаются секции на будущие месяцы.
+    """
+    cutoff_date = datetime.now() - timedelta(days=days)
+    
+    async with engine.begin() as conn:
+        await ensure_partitions(conn)
+    
+    dropped = await drop_partitions_before(cutoff_date, archive_dir)
+    
+    print(f"Удалено секций: {len(dropped)} {', '.join(dropped)}")
 
 if __name__ == "__main__":
-    asyncio.run(cleanup_old_messages(30))
+    parser = argparse.ArgumentParser(description='Conversation history retention')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--archive-dir', default=os.getenv("HISTORY_ARCHIVE_DIR"),
+                       help='Directory for CSV archives of dropped partitions')
+    args = parser.parse_args()
+    asyncio.run(cleanup_old_messages(args.days, args.archive_dir))
@@ -0,0 +1,27 @@
+"""
+Колонки обогащения кандидатов данными GitHub (github_profile, enriched_at)
+в существующей таблице candidates.
+"""
+import asyncio
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+from src.database.database import engine
+
+async def migrate():
+    async with engine.begin() as conn:
+        print("🔄 Колонки github_profile и enriched_at...")
+        await conn.execute(text("ALTER TABLE candidates ADD COLUMN IF NOT EXISTS github_profile JSONB"))
+        await conn.execute(text("ALTER TABLE candidates ADD COLUMN IF NOT EXISTS enriched_at TIMESTAMPTZ"))
+
+        print("🔄 Индекс...")
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_candidates_enriched_at ON candidates (enriched_at)"
+        ))
+    print("✅ Обогащение кандидатов настроено")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
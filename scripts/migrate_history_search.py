@@ -0,0 +1,43 @@
+"""
+Добавление полнотекстового (tsvector + GIN) и триграммного (pg_trgm) поиска
+в существующую таблицу conversation_history.
+Запускать после scripts/migrate_partition_history.py
+"""
+import asyncio
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+from src.database.database import engine
+from src.database.models import SEARCH_VECTOR_SQL
+
+async def migrate():
+    async with engine.begin() as conn:
+        print("🔄 Расширение pg_trgm...")
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+        print("🔄 Колонка search_vector (таблица будет перезаписана)...")
+        await conn.execute(text(
+            "ALTER TABLE conversation_history ADD COLUMN IF NOT EXISTS search_vector TSVECTOR "
+            f"GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED"
+        ))
+
+        print("🔄 Индексы...")
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_conversation_search "
+            "ON conversation_history USING gin(search_vector)"
+        ))
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_conversation_user_trgm "
+            "ON conversation_history USING gin(user_message gin_trgm_ops)"
+        ))
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_conversation_bot_trgm "
+            "ON conversation_history USING gin(bot_response gin_trgm_ops)"
+        ))
+    print("✅ Поиск по истории настроен")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
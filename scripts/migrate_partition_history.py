@@ -0,0 +1,119 @@
+"""
+Перевод conversation_history на секционирование по месяцам.
+Старая таблица переименовывается в conversation_history_legacy,
+данные переносятся пачками по id, каждая пачка в своей транзакции
+"""
+import asyncio
+import argparse
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+from src.database.database import engine
+from src.database.partitions import PARENT_TABLE, ensure_partitions, is_partitioned
+
+LEGACY_TABLE = f"{PARENT_TABLE}_legacy"
+
+async def prepare_tables():
+    """Переименование старой таблицы и создание секционированной"""
+    async with engine.begin() as conn:
+        if await is_partitioned(conn):
+            exists = await conn.execute(text("SELECT to_regclass(:name)"), {"name": LEGACY_TABLE})
+            if exists.scalar() is None:
+                print("✅ Таблица уже секционирована, переносить нечего")
+                return False
+            return True
+
+        print(f"🔄 Переименование {PARENT_TABLE} -> {LEGACY_TABLE}")
+        await conn.execute(text(f"ALTER TABLE {PARENT_TABLE} RENAME TO {LEGACY_TABLE}"))
+        await conn.execute(text(
+            f"ALTER TABLE {LEGACY_TABLE} RENAME CONSTRAINT {PARENT_TABLE}_pkey TO {LEGACY_TABLE}_pkey"
+        ))
+        await conn.execute(text(
+            f"ALTER SEQUENCE IF EXISTS {PARENT_TABLE}_id_seq RENAME TO {LEGACY_TABLE}_id_seq"
+        ))
+        await conn.execute(text(f"ALTER TABLE {LEGACY_TABLE} ADD COLUMN IF NOT EXISTS message_key UUID"))
+        for index in ("idx_conversation_chat_id", "idx_conversation_timestamp",
+                      "idx_conversation_session", "idx_conversation_message_key"):
+            await conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+
+        await conn.execute(text(f"""
+            CREATE TABLE {PARENT_TABLE} (
+                id SERIAL,
+                chat_id BIGINT NOT NULL,
+                user_message TEXT NOT NULL,
+                bot_response TEXT NOT NULL,
+                timestamp TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                session_id UUID NOT NULL,
+                message_type VARCHAR(50) DEFAULT 'text',
+                message_key UUID,
+                PRIMARY KEY (id, timestamp),
+                CONSTRAINT uq_conversation_message_key UNIQUE (message_key, timestamp)
+            ) PARTITION BY RANGE (timestamp)
+        """))
+        await conn.execute(text(
+            f"CREATE INDEX idx_conversation_chat_timestamp ON {PARENT_TABLE}(chat_id, timestamp)"
+        ))
+        await conn.execute(text(
+            f"CREATE INDEX idx_conversation_session ON {PARENT_TABLE}(session_id)"
+        ))
+
+        # новые сообщения получают id после старых, чтобы не пересекаться с переносимыми
+        await conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{PARENT_TABLE}', 'id'), "
+            f"greatest((SELECT max(id) FROM {LEGACY_TABLE}), 1))"
+        ))
+
+        first = await conn.execute(text(f"SELECT min(timestamp) FROM {LEGACY_TABLE}"))
+        first_timestamp = first.scalar()
+        await ensure_partitions(conn, since=first_timestamp.date() if first_timestamp else None)
+    return True
+
+async def copy_batches(batch_size: int):
+    """Перенос строк пачками, можно перезапускать после сбоя"""
+    async with engine.connect() as conn:
+        max_id = (await conn.execute(text(f"SELECT coalesce(max(id), 0) FROM {LEGACY_TABLE}"))).scalar()
+        last_id = (await conn.execute(
+            text(f"SELECT coalesce(max(id), 0) FROM {PARENT_TABLE} WHERE id <= :max_id"),
+            {"max_id": max_id}
+        )).scalar()
+        await conn.commit()
+
+        copied = 0
+        while last_id < max_id:
+            async with conn.begin():
+                result = await conn.execute(text(f"""
+                    INSERT INTO {PARENT_TABLE}
+                        (id, chat_id, user_message, bot_response, timestamp, session_id, message_type, message_key)
+                    SELECT id, chat_id, user_message, bot_response,
+                           coalesce(timestamp, now()), session_id, message_type, message_key
+                    FROM {LEGACY_TABLE}
+                    WHERE id > :last_id AND id <= :upper_id
+                """), {"last_id": last_id, "upper_id": last_id + batch_size})
+            copied += result.rowcount
+            last_id += batch_size
+            print(f"   перенесено {copied} строк (id <= {min(last_id, max_id)})")
+    return copied
+
+async def migrate(batch_size: int, drop_legacy: bool):
+    if not await prepare_tables():
+        return
+
+    copied = await copy_batches(batch_size)
+    print(f"✅ Перенесено строк: {copied}")
+
+    if drop_legacy:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+        print(f"🗑️  {LEGACY_TABLE} удалена")
+    else:
+        print(f"ℹ️  {LEGACY_TABLE} сохранена, удалите ее флагом --drop-legacy после проверки")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Partition conversation_history by month')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--drop-legacy', action='store_true')
+    args = parser.parse_args()
+    asyncio.run(migrate(args.batch_size, args.drop_legacy))
@@ -0,0 +1,118 @@
+"""
+Перекодирование истории диалогов в Redis из JSON в компактный msgpack-формат.
+
+Обрабатываются списки conversation:{session:<chat_id>}. Старые записи
+читаются и без миграции, скрипт лишь освобождает память. Список
+заменяется Lua-скриптом, только если он не изменился после чтения, -
+сообщение, сохраненное ботом во время миграции, не теряется (иначе
+список перечитывается заново).
+
+Списки прежней раскладки conversation:<session_id> бот больше не читает
+(история чата восстанавливается из PostgreSQL); --drop-legacy удаляет их.
+"""
+import asyncio
+import argparse
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from src.memory.redis_manager import redis_session_manager, decode_conversation, encode_conversation
+from datetime import datetime
+
+CURRENT_PATTERN = "conversation:{session:*}"
+MAX_RETRIES = 3
+
+# KEYS[1] - ключ истории; ARGV[1] - TTL, если у ключа его нет, ARGV[2] - число
+# прочитанных записей N, ARGV[3..N+2] - прочитанные записи, ARGV[N+3..] - новые.
+# Возвращает 0, если список изменился после чтения.
+REPLACE_IF_UNCHANGED_SCRIPT = """
+local count = tonumber(ARGV[2])
+local current = redis.call('LRANGE', KEYS[1], 0, -1)
+if #current ~= count then
+    return 0
+end
+for i = 1, count do
+    if current[i] ~= ARGV[i + 2] then
+        return 0
+    end
+end
+local ttl = redis.call('PTTL', KEYS[1])
+redis.call('DEL', KEYS[1])
+for i = count + 3, #ARGV do
+    redis.call('RPUSH', KEYS[1], ARGV[i])
+end
+if ttl > 0 then
+    redis.call('PEXPIRE', KEYS[1], ttl)
+else
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+async def migrate_key(client, replace, key: bytes, max_history: int, dry_run: bool) -> int:
+    """Перекодированных сообщений в списке; 0 - перекодировать нечего"""
+    for _ in range(MAX_RETRIES):
+        entries = await client.lrange(key, 0, -1)
+        if not any(raw[:1] == b"{" for raw in entries):
+            return 0
+
+        encoded = []
+        for raw in entries[-max_history:]:
+            conv = decode_conversation(raw)
+            encoded.append(encode_conversation(
+                conv["user_message"],
+                conv["bot_response"],
+                datetime.fromisoformat(conv["timestamp"])
+            ))
+        if dry_run:
+            return len(encoded)
+
+        if await replace(
+            keys=[key],
+            args=[redis_session_manager.session_timeout, len(entries), *entries, *encoded]
+        ):
+            return len(encoded)
+
+    print(f"⚠️ {key.decode()} меняется во время миграции, пропущен")
+    return 0
+
+async def migrate(dry_run: bool = False, drop_legacy: bool = False):
+    await redis_session_manager.init_redis()
+    client = redis_session_manager.redis_client
+    replace = client.register_script(REPLACE_IF_UNCHANGED_SCRIPT)
+    max_history = redis_session_manager.max_history
+
+    print("📊 До миграции:", await redis_session_manager.get_memory_report())
+
+    migrated_keys = 0
+    migrated_entries = 0
+    async for key in client.scan_iter(match=CURRENT_PATTERN, count=500):
+        count = await migrate_key(client, replace, key, max_history, dry_run)
+        if count:
+            migrated_keys += 1
+            migrated_entries += count
+
+    legacy_keys = 0
+    async for key in client.scan_iter(match="conversation:*", count=500):
+        if key.startswith(b"conversation:{"):
+            continue
+        legacy_keys += 1
+        if drop_legacy and not dry_run:
+            await client.unlink(key)
+
+    print(f"✅ Перекодировано списков: {migrated_keys}, сообщений: {migrated_entries}")
+    if legacy_keys:
+        action = "удалено" if drop_legacy and not dry_run else "найдено (удалить: --drop-legacy)"
+        print(f"🗑️ Списков прежней раскладки conversation:<session_id> {action}: {legacy_keys}")
+    if not dry_run:
+        print("📊 После миграции:", await redis_session_manager.get_memory_report())
+
+    await redis_session_manager.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Redis history migration')
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--drop-legacy', action='store_true', help='удалить списки conversation:<session_id>')
+    args = parser.parse_args()
+    asyncio.run(migrate(args.dry_run, args.drop_legacy))
@@ -0,0 +1,184 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+from uuid import uuid4
+import logging
+
+from src.config import settings
+from src.llm.llm_service import llm_queue
+from src.memory.redis_manager import redis_session_manager
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED_REPLY = "⏳ Слишком много сообщений. Подождите {seconds} сек. и повторите запрос."
+GLOBAL_LIMITED_REPLY = "⏳ Сейчас очень много запросов. Повторите, пожалуйста, через {seconds} сек."
+OVERLOADED_REPLY = "🚦 Сервис перегружен, ответить сейчас не получится. Попробуйте через минуту."
+
+# Скользящее окно на ZSET: KEYS[1] - окно чата, KEYS[2] - глобальное окно;
+# ARGV[1] - now (мс), ARGV[2] - окно (мс), ARGV[3] - лимит чата,
+# ARGV[4] - глобальный лимит, ARGV[5] - уникальный id запроса.
+# Возвращает {0, 0} при допуске или {1|2, мс до освобождения места}.
+SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - window)
+redis.call('ZREMRANGEBYSCORE', KEYS[2], 0, now - window)
+local limits = {tonumber(ARGV[3]), tonumber(ARGV[4])}
+for i = 1, 2 do
+    if redis.call('ZCARD', KEYS[i]) >= limits[i] then
+        local oldest = redis.call('ZRANGE', KEYS[i], 0, 0, 'WITHSCORES')
+        return {i, tonumber(oldest[2]) + window - now}
+    end
+end
+for i = 1, 2 do
+    redis.call('ZADD', KEYS[i], now, ARGV[5])
+    redis.call('PEXPIRE', KEYS[i], window)
+end
+return {0, 0}
+"""
+
+class AdmissionController:
+    """Допуск сообщений к обработке до вызова MCP и LLM.
+
+    Сначала сброс нагрузки: если обработчиков в работе или запросов в
+    очереди к LLM больше порога, сразу отвечаем заготовкой. Затем
+    скользящее окно в Redis на чат и глобально; если место освободится
+    в пределах max_delay, апдейт откладывается через defer (без удержания
+    слота и очереди чата на время ожидания), иначе отклоняется. В
+    процессе бота отложенный апдейт подается заново schedule_retry, под
+    BotWorker - возвращается в поток партиции воркером. Отложенный апдейт
+    повторно не откладывается.
+    При недоступности Redis лимиты не применяются (fail open).
+    """
+
+    def __init__(self):
+        self.config = settings.rate_limit
+        self.window_ms = self.config.window_seconds * 1000
+        self.in_flight = 0
+        self._script = None
+        self._deferred: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.counters: Dict[str, int] = {
+            "admitted": 0,
+            "delayed": 0,
+            "dropped_chat_limit": 0,
+            "dropped_global_limit": 0,
+            "shed_overload": 0,
+            "limiter_errors": 0
+        }
+
+    async def _check(self, chat_id: int) -> Tuple[int, int]:
+        if not redis_session_manager.redis_client:
+            await redis_session_manager.init_redis()
+        if self._script is None:
+            self._script = redis_session_manager.redis_client.register_script(SLIDING_WINDOW_SCRIPT)
+
+        verdict, retry_after_ms = await self._script(
+            keys=[f"ratelimit:chat:{chat_id}", "ratelimit:global"],
+            args=[
+                int(time.time() * 1000),
+                self.window_ms,
+                self.config.chat_limit,
+                self.config.global_limit,
+                uuid4().hex
+            ]
+        )
+        return int(verdict), int(retry_after_ms)
+
+    def _overloaded(self) -> bool:
+        return (
+            self.in_flight >= self.config.max_in_flight
+            or llm_queue.depth >= self.config.max_llm_queue
+        )
+
+    async def admit(
+        self,
+        chat_id: int,
+        defer: Optional[Callable[[float], None]] = None
+    ) -> Optional[str]:
+        """None - сообщение допущено, иначе текст ответа для пользователя ("" - без ответа).
+
+        defer(delay) вызывается, если место освободится в пределах max_delay;
+        без defer такой апдейт отклоняется.
+        """
+        if not self.config.enabled:
+            return None
+
+        if self._overloaded():
+            self.counters["shed_overload"] += 1
+            return OVERLOADED_REPLY
+
+        try:
+            verdict, retry_after_ms = await self._check(chat_id)
+            if verdict and defer is not None and retry_after_ms <= self.config.max_delay * 1000:
+                self.counters["delayed"] += 1
+                defer(retry_after_ms / 1000)
+                return ""
+        except Exception as e:
+            self.counters["limiter_errors"] += 1
+            logger.warning(f"Rate limiter unavailable, admitting message: {e}")
+            verdict = 0
+
+        if verdict == 1:
+            self.counters["dropped_chat_limit"] += 1
+            return await self._limited_reply(chat_id, RATE_LIMITED_REPLY, retry_after_ms)
+        if verdict == 2:
+            self.counters["dropped_global_limit"] += 1
+            return await self._limited_reply(chat_id, GLOBAL_LIMITED_REPLY, retry_after_ms)
+
+        self.counters["admitted"] += 1
+        return None
+
+    def is_deferred(self, update_id: int) -> bool:
+        return update_id in self._deferred
+
+    def schedule_retry(self, update_id: int, delay: float, resubmit: Callable[[], Awaitable]):
+        """Повторная подача апдейта в процессе бота после delay секунд"""
+        self._deferred.add(update_id)
+
+        async def run():
+            try:
+                await asyncio.sleep(delay)
+                await resubmit()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Deferred update {update_id} failed: {e}")
+            finally:
+                self._deferred.discard(update_id)
+
+        task = asyncio.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _limited_reply(self, chat_id: int, template: str, retry_after_ms: int) -> Optional[str]:
+        """Предупреждение - одно на окно, чтобы флуд не превращался в поток ответов"""
+        try:
+            first = await redis_session_manager.redis_client.set(
+                f"ratelimit:notice:{chat_id}", 1, nx=True, px=self.window_ms
+            )
+        except Exception:
+            first = True
+        if not first:
+            return ""
+        return template.format(seconds=max(1, round(retry_after_ms / 1000)))
+
+    @asynccontextmanager
+    async def track(self):
+        """Учет обработчиков в работе для сброса нагрузки"""
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "in_flight": self.in_flight,
+            "deferred": len(self._deferred),
+            "llm": llm_queue.stats()
+        }
+
+admission_controller = AdmissionController()
@@ -0,0 +1,178 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# Декларативная таблица намерений. stem=True - русские слова сводятся к основе
+# и совпадают с любой словоформой ("таблица" -> "таблицу", "таблицы"),
+# иначе термин совпадает только как целое слово или фраза.
+# reply - ответ без LLM, tool - MCP инструмент для _process_user_request.
+INTENTS = [
+    {"name": "greeting", "terms": ["привет", "hello"], "stem": True,
+     "reply": "👋 Привет! Я HR-ассистент. Чем могу помочь?"},
+    {"name": "how_are_you", "terms": ["как дела"],
+     "reply": "🤖 У меня все отлично! Готов помочь с поиском кандидатов."},
+    {"name": "help", "terms": ["help"], "reply": "📋 Используйте /help для списка команд"},
+    {"name": "start", "terms": ["start"], "reply": "🚀 Используйте /start для начала работы"},
+    {"name": "health", "terms": ["health"], "reply": "🏥 Используйте /health для проверки статуса"},
+    {"name": "test", "terms": ["test", "тест"], "reply": "🧪 Тестовый режим работает!"},
+    {"name": "github", "terms": ["github", "git", "профиль", "репозиторий"], "stem": True, "tool": "github"},
+    {"name": "web_search", "terms": ["найди", "поищи", "информация", "search"], "stem": True, "tool": "web_search"},
+    {"name": "sheets", "terms": ["таблица", "sheet", "excel", "обнови"], "stem": True, "tool": "google_sheets"},
+    # модификатор поиска: текст страниц из выдачи вместо одних сниппетов
+    {"name": "deep_search", "terms": ["подробно", "детально", "deep"], "stem": True},
+]
+
+# Слова, после которых начинается поисковый запрос
+SEARCH_TRIGGERS = ["найди", "поищи", "ищи", "search", "find", "google"]
+SEARCH_STOP_WORDS = {"информацию", "информация", "про", "о", "the", "a", "an", "подробно", "подробнее", "детально", "deep"}
+BOT_NAMES = {"бот", "bot", "assistant", "помощник"}
+
+GITHUB_USER_PATTERN = re.compile(r"github\.com/([a-z0-9](?:[a-z0-9-]{0,38}))")
+PUNCTUATION = ".,!?;:()[]«»\"'"
+
+RUSSIAN_ENDINGS = frozenset([
+    "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими",
+    "ить", "ать", "ять", "еть", "ите", "ете", "ишь", "ешь",
+    "ая", "яя", "ое", "ее", "ые", "ие", "ый", "ий", "ой", "ей", "ую", "юю",
+    "ом", "ем", "ам", "ям", "ах", "ях", "ов", "ев", "ию", "ия", "ии", "ью", "ья",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+])
+_ENDING_LENGTHS = sorted({len(ending) for ending in RUSSIAN_ENDINGS}, reverse=True)
+
+_CYRILLIC = re.compile(r"[а-я]")
+
+def stem_russian(word: str) -> str:
+    """Упрощенный стеммер: отсечение самого длинного окончания с основой от 3 букв"""
+    word = word.lower().replace("ё", "е")
+    for length in _ENDING_LENGTHS:
+        if len(word) - length >= 3 and word[-length:] in RUSSIAN_ENDINGS:
+            return word[:-length]
+    return word
+
+@dataclass
+class IntentMatch:
+    intents: List[str] = field(default_factory=list)
+    tools: List[str] = field(default_factory=list)
+    reply: Optional[str] = None
+    github_users: List[str] = field(default_factory=list)
+    search_query: str = ""
+
+def _trie_pattern(entries: List[Tuple[str, str]]) -> str:
+    """Regex из префиксного дерева терминов: (слово, хвост), хвост - "" или \\w*.
+
+    Общие префиксы вынесены, поэтому в каждой позиции текста движок
+    проверяет один символ, а не все термины по очереди.
+    """
+    trie: Dict = {}
+    for word, tail in entries:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node.setdefault(None, set()).add(tail)
+
+    def build(node: Dict) -> str:
+        alternatives = [
+            (r"\s+" if char == " " else re.escape(char)) + build(child)
+            for char, child in sorted((item for item in node.items() if item[0] is not None))
+        ]
+        if None in node:
+            # пустая альтернатива последней: сначала пробуем более длинные слова
+            alternatives.append(r"\w*" if r"\w*" in node[None] else "")
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return "(?:" + "|".join(alternatives) + ")"
+
+    return build(trie)
+
+class IntentMatcher:
+    """Классификация сообщения за один проход скомпилированного regex.
+
+    Таблица намерений один раз собирается в префиксное дерево: точные
+    слова, русские основы со словоформами и фразы. Совпадения ищутся только
+    по границам слов, поэтому "contest" не совпадает с "test". Вместе с
+    намерениями извлекаются GitHub-логины и поисковый запрос.
+    """
+
+    def __init__(self, intents: List[Dict] = INTENTS, search_triggers: List[str] = SEARCH_TRIGGERS):
+        self.intents = {intent["name"]: intent for intent in intents}
+        self.search_triggers = set(search_triggers) | {stem_russian(trigger) for trigger in search_triggers}
+        self._words: Dict[str, str] = {}
+        self._stems: Dict[str, str] = {}
+
+        entries = [(trigger, "") for trigger in search_triggers]
+        for intent in intents:
+            name = intent["name"]
+            for term in intent["terms"]:
+                term = " ".join(term.lower().replace("ё", "е").split())
+                if intent.get("stem") and _CYRILLIC.search(term) and " " not in term:
+                    stem = stem_russian(term)
+                    self._stems.setdefault(stem, name)
+                    entries.append((stem, r"\w*"))
+                elif intent.get("stem") and " " not in term:
+                    # латиница: допускаем множественное число (sheets, profiles)
+                    for form in (term, term + "s", term + "es"):
+                        self._words.setdefault(form, name)
+                        entries.append((form, ""))
+                else:
+                    self._words.setdefault(term, name)
+                    entries.append((term, ""))
+
+        self._stem_lengths = sorted({len(stem) for stem in self._stems}, reverse=True)
+        self.pattern = re.compile(r"(?<!\w)" + _trie_pattern(entries) + r"(?!\w)")
+
+    def _lookup(self, word: str) -> Optional[str]:
+        name = self._words.get(" ".join(word.split()))
+        if name is None:
+            for length in self._stem_lengths:
+                name = self._stems.get(word[:length])
+                if name:
+                    break
+        return name
+
+    def classify(self, message: str) -> IntentMatch:
+        text = message.lower().replace("ё", "е")
+        result = IntentMatch()
+        query_start = None
+
+        for match in self.pattern.finditer(text):
+            word = match.group(0)
+            name = self._lookup(word)
+            if name and name not in result.intents:
+                result.intents.append(name)
+            if query_start is None and (
+                word in self.search_triggers
+                or (name == "web_search" and stem_russian(word) in self.search_triggers)
+            ):
+                query_start = match.end()
+
+        if "github.com/" in text:
+            result.github_users = GITHUB_USER_PATTERN.findall(text)
+            if "github" not in result.intents:
+                result.intents.append("github")
+
+        for name in result.intents:
+            intent = self.intents[name]
+            if intent.get("tool") and intent["tool"] not in result.tools:
+                result.tools.append(intent["tool"])
+            if result.reply is None and intent.get("reply"):
+                result.reply = intent["reply"]
+
+        # ответ без LLM только если в сообщении нет запроса к инструментам
+        if result.tools:
+            result.reply = None
+
+        if "web_search" in result.intents:
+            result.search_query = self._search_query(text, query_start)
+        return result
+
+    @staticmethod
+    def _search_query(text: str, query_start: Optional[int]) -> str:
+        if query_start is not None:
+            words = [word.strip(PUNCTUATION) for word in text[query_start:].split()]
+            words = [word for word in words if word and word not in SEARCH_STOP_WORDS]
+            if words:
+                return " ".join(words)
+        words = [word.strip(PUNCTUATION) for word in text.split()]
+        return " ".join(word for word in words if word and word not in BOT_NAMES)
+
+intent_matcher = IntentMatcher()
@@ -2,10 +2,11 @@ import os
 import sys
 import logging
 import asyncio
+from typing import Any, Callable, Dict, Optional
 from telegram import Update, BotCommand
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, 
-    filters, ContextTypes
+    filters, ContextTypes, ApplicationHandlerStop
 )
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -18,9 +19,15 @@ try:
     from src.config import settings
     from src.database.database import AsyncSessionLocal
     from src.memory.session_manager import session_manager
+    from src.memory.write_behind import history_writer
     from src.llm.llm_service import LLMService
-    from src.mcp.mcp_client import mcp_client
+    from src.mcp.mcp_client import mcp_client, run_tools
     from src.knowledge.vector_search import VectorSearchService
+    from src.bot.update_processor import ChatOrderedUpdateProcessor
+    from src.bot.intents import intent_matcher, IntentMatch
+    from src.bot.admission import admission_controller
+    from src.bot.update_stream import UpdateDeferred
+    from src.monitoring.health_prober import health_prober
 except ImportError as e:
     print(f"❌ Ошибка импорта: {e}")
     print("📁 Текущая директория:", os.getcwd())
@@ -34,6 +41,9 @@ class HRAssistantBot:
     def __init__(self):
         self.application = None
         self.is_running = False
+        self.update_processor = ChatOrderedUpdateProcessor(settings.telegram.max_concurrent_updates)
+        # Апдейты BotWorker'а в обработке: update_id -> {"deferred", "defer", "error"}
+        self._queued: Dict[int, Dict[str, Any]] = {}
         
         try:
             self.llm_service = LLMService()
@@ -83,11 +93,11 @@ class HRAssistantBot:
     
     async def health_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
-            from src.database.database import check_db_connection
-            from src.mcp.services import check_mcp_services
+            from src.monitoring.health_prober import health_prober
             
-            db_status = await check_db_connection()
-            mcp_status = await check_mcp_services()
+            snapshot = await health_prober.snapshot()
+            db_status = snapshot["checks"]["database"]["ok"]
+            mcp_status = await health_prober.mcp_status()
             
             service_names = {
                 "github": "GitHub",
@@ -102,6 +112,8 @@ class HRAssistantBot:
                 mcp_services_text += f"• {name}: {status_icon}\n"
             
             ai_status = "🟢" if self.llm_service and self.llm_service.client else "🔴"
+            dispatcher = self.update_processor.stats()
+            admission = admission_controller.stats()
             
             health_status = "🟢 Все системы работают" if db_status and all(mcp_status.values()) else "🟡 Частичные проблемы" if db_status else "🔴 Критические проблемы"
             
@@ -110,11 +122,20 @@ class HRAssistantBot:
 
 📊 **Статус сервисов:**
 • База данных: {'🟢' if db_status else '🔴'}
-• Telegram API: 🟢
+• Redis: {'🟢' if snapshot['checks']['redis']['ok'] else '🔴'}
+• Telegram API: {'🟢' if snapshot['checks']['telegram']['ok'] else '🔴'}
 • AI сервис: {ai_status}
 
 🔧 **MCP инструменты:**
 {mcp_services_text}
+⚙️ **Обработка сообщений:**
+• В работе: {dispatcher['in_flight']}/{dispatcher['max_concurrent_updates']}
+• В очереди: {dispatcher['waiting']}
+• Среднее ожидание: {dispatcher['avg_queue_wait_ms']} мс
+• Очередь к AI: {admission['llm']['queued']}
+• Задержано / отклонено: {admission['delayed']} / {admission['dropped_chat_limit'] + admission['dropped_global_limit'] + admission['shed_overload']}
+
+🕒 Проверено: {snapshot['checked_at'].strftime('%H:%M:%S')}
             """
     
             await update.message.reply_text(status_text)
@@ -130,23 +151,54 @@ class HRAssistantBot:
         
         await update.message.reply_text("🧹 История диалога очищена! Начинаем новый разговор.")
     
+    def _defer_callback(self, update: Update, application: Application) -> Optional[Callable[[float], None]]:
+        """Как отложить апдейт; None - апдейт уже откладывался и повторно не откладывается"""
+        job = self._queued.get(update.update_id)
+        if job is not None:
+            # Под BotWorker апдейт возвращает в поток сам воркер (см. UpdateDeferred)
+            return None if job["deferred"] else lambda delay: job.update(defer=delay)
+        if admission_controller.is_deferred(update.update_id):
+            return None
+        # Повторная подача идет через update_processor: снова очередь чата и глобальный слот
+        return lambda delay: admission_controller.schedule_retry(
+            update.update_id, delay,
+            lambda: application.update_processor.process_update(update, application.process_update(update))
+        )
+    
+    async def admission_check(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Допуск сообщения до основных обработчиков (группа -1)"""
+        reply = await admission_controller.admit(
+            update.effective_chat.id,
+            self._defer_callback(update, context.application)
+        )
+        if reply is None:
+            return
+        if reply:
+            await update.message.reply_text(reply)
+        logger.info(f"🚫 Сообщение от {update.effective_chat.id} отложено или отклонено admission-контролем")
+        raise ApplicationHandlerStop
+    
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        async with admission_controller.track():
+            await self._handle_message(update, context)
+    
+    async def _handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_message = update.message.text
         chat_id = update.effective_chat.id
         
         logger.info(f"📨 Получено сообщение от {chat_id}: {user_message}")
         
         try:
-            simple_response = self._get_simple_response(user_message)
-            if simple_response:
-                await update.message.reply_text(simple_response)
+            intent = intent_matcher.classify(user_message)
+            if intent.reply:
+                await update.message.reply_text(intent.reply)
                 return
             
             await context.bot.send_chat_action(chat_id=chat_id, action="typing")
             
             async with AsyncSessionLocal() as session:
                 if self.llm_service and self.llm_service.client:
-                    mcp_results = await self._process_user_request(user_message, session)
+                    mcp_results = await self._process_user_request(user_message, session, intent)
                     response = await self.llm_service.generate_response(
                         user_message=user_message,
                         chat_id=chat_id,
@@ -166,10 +218,26 @@ class HRAssistantBot:
             
         except Exception as e:
             logger.error(f"Error processing message: {e}")
+            self._record_failure(update, e)
             error_message = "⚠️ Произошла ошибка при обработке запроса. Попробуйте еще раз."
             await update.message.reply_text(error_message)
+    
+    def _record_failure(self, update: object, error: BaseException):
+        """Ошибка апдейта из очереди воркеров - process_queued_update поднимет ее для dead letter"""
+        if isinstance(update, Update) and update.update_id in self._queued:
+            self._queued[update.update_id]["error"] = error
+    
+    async def error_handler(self, update: object, context: ContextTypes.DEFAULT_TYPE):
+        """Ошибки хендлеров, перехваченные PTB"""
+        logger.error(f"Update handling failed: {context.error}", exc_info=context.error)
+        self._record_failure(update, context.error)
 
-    async def _process_user_request(self, user_message: str, session: AsyncSession) -> list:
+    async def _process_user_request(
+        self,
+        user_message: str,
+        session: AsyncSession,
+        intent: IntentMatch = None
+    ) -> list:
         """Обработка запросов с MCP инструментами"""
         mcp_results = []
         
@@ -177,35 +245,37 @@ class HRAssistantBot:
             return mcp_results
             
         try:
-            message_lower = user_message.lower()
-            
-            if any(keyword in message_lower for keyword in ['github', 'профиль', 'репозиторий', 'git']):
-                github_result = await self._handle_github_request(user_message)
-                if github_result:
-                    mcp_results.append({"tool": "github", "result": github_result})
+            intent = intent or intent_matcher.classify(user_message)
             
-            if any(keyword in message_lower for keyword in ['найди', 'поищи', 'информация', 'search']):
-                search_result = await self._handle_web_search(user_message)
-                if search_result:
-                    mcp_results.append({"tool": "web_search", "result": search_result})
+            calls = {}
+            if "github" in intent.tools:
+                calls["github"] = self._handle_github_request(user_message, intent.github_users)
+            if "web_search" in intent.tools:
+                calls["web_search"] = self._handle_web_search(
+                    intent.search_query, deep="deep_search" in intent.intents
+                )
+            if "google_sheets" in intent.tools:
+                calls["google_sheets"] = self._handle_sheets_request(user_message)
             
-            if any(keyword in message_lower for keyword in ['таблиц', 'sheet', 'excel', 'обнови']):
-                sheets_result = await self._handle_sheets_request(user_message)
-                if sheets_result:
-                    mcp_results.append({"tool": "google_sheets", "result": sheets_result})
+            if calls:
+                results = await run_tools(calls)
+                mcp_results = [
+                    result for result in results
+                    if result["status"] != "success" or result["result"]
+                ]
+                logger.info("MCP tools: " + ", ".join(
+                    f"{result['tool']}={result['status']} {result['elapsed_ms']}ms" for result in results
+                ))
                     
         except Exception as e:
             logger.error(f"Error in MCP processing: {e}")
         
         return mcp_results
     
-    async def _handle_github_request(self, message: str) -> str:
+    async def _handle_github_request(self, message: str, github_users: list) -> str:
         try:
-            words = message.split()
-            for word in words:
-                if 'github.com/' in word:
-                    username = word.split('github.com/')[-1].split('/')[0]
-                    return await mcp_client.github.get_user_profile(username)
+            if github_users:
+                return await mcp_client.github.get_user_profile(github_users[0])
             
             return await mcp_client.github.search_repositories(message)
             
@@ -213,14 +283,12 @@ class HRAssistantBot:
             logger.error(f"GitHub request error: {e}")
             return f"Ошибка при работе с GitHub: {str(e)}"
     
-    async def _handle_web_search(self, message: str) -> str:
+    async def _handle_web_search(self, search_query: str, deep: bool = False) -> str:
         try:
-            search_query = self._extract_search_query(message)
-            
             if not search_query:
                 return "🔍 Пожалуйста, уточните что именно вы хотите найти"
                 
-            result = await mcp_client.web_search.search_web(search_query, num_results=3)
+            result = await mcp_client.web_search.search_web(search_query, num_results=3, deep=deep)
             return result
             
         except Exception as e:
@@ -229,55 +297,24 @@ class HRAssistantBot:
 
     def _get_simple_response(self, message: str) -> str:
         """Простые ответы без LLM"""
-        message_lower = message.lower()
-        
-        responses = {
-            'привет': '👋 Привет! Я HR-ассистент. Чем могу помочь?',
-            'hello': '👋 Hello! I am HR Assistant. How can I help you?',
-            'как дела': '🤖 У меня все отлично! Готов помочь с поиском кандидатов.',
-            'help': '📋 Используйте /help для списка команд',
-            'start': '🚀 Используйте /start для начала работы',
-            'health': '🏥 Используйте /health для проверки статуса',
-            'test': '🧪 Тестовый режим работает!',
-            'тест': '🧪 Тестовый режим работает!',
-        }
-        
-        for key, response in responses.items():
-            if key in message_lower:
-                return response
-        
-        return None
-
-    def _extract_search_query(self, message: str) -> str:
-        """Извлекает поисковый запрос из сообщения"""
-        search_keywords = ['найди', 'поищи', 'ищи', 'search', 'find', 'google']
-        
-        words = message.lower().split()
-        query_words = []
-        
-        collect = False
-        for word in words:
-            if word in search_keywords:
-                collect = True
-                continue
-            if collect:
-                if word not in ['информацию', 'информация', 'про', 'о', 'the', 'a', 'an']:
-                    query_words.append(word)
-        
-        if not query_words:
-            bot_names = ['бот', 'bot', 'assistant', 'помощник']
-            query_words = [word for word in words if word not in bot_names]
-        
-        return ' '.join(query_words).strip()
+        return intent_matcher.classify(message).reply
     
     async def _handle_sheets_request(self, message: str) -> str:
         try:
+            if not settings.sheets_sync.spreadsheet_id:
+                return "Google Sheets: таблица кандидатов не настроена (SHEET_ID)"
             if 'прочитай' in message.lower() or 'покажи' in message.lower():
                 return await mcp_client.sheets.read_spreadsheet(
-                    "your-spreadsheet-id", "A1:D10"
+                    settings.sheets_sync.spreadsheet_id, f"{settings.sheets_sync.worksheet}!A1:H10"
+                )
+            elif 'обнови' in message.lower() or 'синхрониз' in message.lower():
+                from src.candidates.sheets_sync import candidate_sheet_sync
+                summary = await candidate_sheet_sync.sync()
+                return (
+                    f"📊 Таблица синхронизирована: строк {summary['rows']}, "
+                    f"новых {summary['inserted']}, изменено {summary['updated']}, "
+                    f"статусов записано в таблицу {summary['status_written']}"
                 )
-            elif 'обнови' in message.lower():
-                return "Google Sheets: Готов обновить таблицу (нужен spreadsheet_id)"
             else:
                 return "Google Sheets: Могу читать и обновлять таблицы кандидатов"
                 
@@ -294,26 +331,102 @@ class HRAssistantBot:
         ]
         await self.application.bot.set_my_commands(commands)
     
+    async def post_init(self, application: Application):
+        session_manager.start_cleanup()
+        await history_writer.start()
+        health_prober.start()
+    
+    async def post_shutdown(self, application: Application):
+        await session_manager.stop_cleanup()
+        await history_writer.stop()
+        await health_prober.stop()
+    
+    def build_application(self) -> Application:
+        builder = (
+            Application.builder()
+            .token(settings.telegram.bot_token)
+            .concurrent_updates(self.update_processor)
+            .post_init(self.post_init)
+            .post_shutdown(self.post_shutdown)
+        )
+        if settings.telegram.bot_mode != "polling":
+            builder = builder.updater(None)
+        
+        application = builder.build()
+        application.add_handler(
+            MessageHandler(filters.TEXT & ~filters.COMMAND, self.admission_check),
+            group=-1
+        )
+        application.add_handler(CommandHandler("start", self.start))
+        application.add_handler(CommandHandler("help", self.help_command))
+        application.add_handler(CommandHandler("health", self.health_command))
+        application.add_handler(CommandHandler("clear", self.clear_command))
+        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
+        application.add_error_handler(self.error_handler)
+        return application
+    
+    async def start_webhook(self):
+        """Запуск в режиме webhook внутри event loop FastAPI.
+
+        Апдейты приходят на webhook_path приложения src/main.py и кладутся
+        в update_queue (BOT_MODE=webhook) или в UpdateStream для воркеров
+        (BOT_MODE=queue); фоновые задачи памяти запускает lifespan API.
+        """
+        if not settings.telegram.bot_token or not settings.telegram.webhook_url:
+            raise ValueError("TELEGRAM_BOT_TOKEN and WEBHOOK_URL are required for webhook mode")
+        if not settings.telegram.webhook_secret:
+            raise ValueError("TELEGRAM_WEBHOOK_SECRET is required for webhook mode")
+        
+        self.application = self.build_application()
+        await self.application.initialize()
+        await self.setup_commands()
+        await self.application.bot.set_webhook(
+            url=settings.telegram.webhook_url.rstrip("/") + settings.telegram.webhook_path,
+            secret_token=settings.telegram.webhook_secret,
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=True
+        )
+        await self.application.start()
+        self.is_running = True
+        logger.info(f"Telegram bot started in webhook mode: {settings.telegram.webhook_url}")
+    
+    async def process_queued_update(self, payload: dict, deferred: bool = False):
+        """Обработка апдейта из очереди воркеров (BOT_MODE=queue) до завершения хендлеров.
+
+        PTB перехватывает исключения хендлеров, поэтому ошибка, записанная
+        error_handler'ом или _handle_message, поднимается здесь - воркер
+        отправит апдейт в dead letter. Отложенный лимитером апдейт
+        поднимает UpdateDeferred; deferred - это уже повторная подача.
+        """
+        update = Update.de_json(payload, self.application.bot)
+        job = {"deferred": deferred, "defer": None, "error": None}
+        self._queued[update.update_id] = job
+        try:
+            await self.application.process_update(update)
+        finally:
+            self._queued.pop(update.update_id, None)
+        if job["defer"] is not None:
+            raise UpdateDeferred(job["defer"])
+        if job["error"] is not None:
+            raise job["error"]
+    
     def run(self):
-        """Синхронный запуск бота для локального использования"""
+        """Синхронный запуск бота для локального использования (long polling)"""
         print("🤖 Запуск HR Assistant Bot...")
         
         if not settings.telegram.bot_token:
             print("❌ ОШИБКА: TELEGRAM_BOT_TOKEN не установлен!")
             return
         
+        if settings.telegram.bot_mode == "webhook":
+            print("ℹ️  BOT_MODE=webhook: апдейты принимает API (src/main.py), polling не запускается")
+            return
+        if settings.telegram.bot_mode == "queue":
+            print("ℹ️  BOT_MODE=queue: апдейты обрабатывают воркеры (python -m src.bot.worker)")
+            return
+        
         try:
-            self.application = (
-                Application.builder()
-                .token(settings.telegram.bot_token)
-                .build()
-            )
-            
-            self.application.add_handler(CommandHandler("start", self.start))
-            self.application.add_handler(CommandHandler("help", self.help_command))
-            self.application.add_handler(CommandHandler("health", self.health_command))
-            self.application.add_handler(CommandHandler("clear", self.clear_command))
-            self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
+            self.application = self.build_application()
             
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
@@ -346,30 +459,33 @@ async def stop_bot():
         bot_instance.is_running = False
         logger.info("Telegram bot stopped")
 
+async def process_webhook_update(payload: dict):
+    """Передача апдейта из webhook в очередь PTB (обработка идет в фоне)"""
+    application = bot_instance.application
+    update = Update.de_json(payload, application.bot)
+    await application.update_queue.put(update)
+
 async def check_bot_health() -> dict:
-    """Функция проверки здоровья бота - исправленная версия"""
+    """Состояние бота: доступность Telegram API из снимка health prober'а"""
     try:
-        from src.config import settings
-        
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"https://api.telegram.org/bot{settings.telegram.bot_token}/getMe",
-                timeout=10
-            ) as response:
-                bot_ok = response.status == 200
+        snapshot = await health_prober.snapshot()
+        telegram = snapshot["checks"]["telegram"]
+        bot_ok = telegram["ok"]
                 
-        try:
-            from src.memory.session_manager import session_manager
+        from src.memory.session_manager import session_manager
+        active_sessions = snapshot["metrics"]["active_chats"]
+        if active_sessions is None:
             active_sessions = len(session_manager.active_sessions)
-        except Exception:
-            active_sessions = 0
             
         return {
             "status": "healthy" if bot_ok else "unhealthy",
             "message": "Bot is connected to Telegram API" if bot_ok else "Bot is not connected",
             "active_sessions": active_sessions,
-            "telegram_api": bot_ok
+            "memory_sessions": session_manager.get_memory_stats(),
+            "dispatcher": bot_instance.update_processor.stats(),
+            "admission": admission_controller.stats(),
+            "telegram_api": bot_ok,
+            "telegram_latency_ms": telegram["latency_ms"]
         }
         
     except Exception as e:
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Dict, Optional
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Параллельная обработка апдейтов с сохранением порядка внутри чата.
+
+    Разные чаты обрабатываются одновременно (не больше
+    max_concurrent_updates), апдейты одного чата - строго по очереди.
+    Очередь чата ожидается до захвата глобального слота, поэтому
+    «болтливый» чат не занимает слоты, пока ждет своей очереди.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._chat_locks: Dict[int, list] = {}
+        self.in_flight = 0
+        self.waiting = 0
+        self.processed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @staticmethod
+    def _chat_id(update: object) -> Optional[int]:
+        if isinstance(update, Update) and update.effective_chat:
+            return update.effective_chat.id
+        return None
+
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        queued_at = time.monotonic()
+        self.waiting += 1
+        timed = self._timed(coroutine, queued_at)
+
+        chat_id = self._chat_id(update)
+        if chat_id is None:
+            await super().process_update(update, timed)
+            return
+
+        entry = self._chat_locks.setdefault(chat_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await super().process_update(update, timed)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chat_locks[chat_id]
+
+    async def _timed(self, coroutine: Awaitable[Any], queued_at: float):
+        wait = time.monotonic() - queued_at
+        self.waiting -= 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        await coroutine
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        self.in_flight += 1
+        try:
+            await coroutine
+        finally:
+            self.in_flight -= 1
+            self.processed += 1
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent_updates": self.max_concurrent_updates,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "active_chats": len(self._chat_locks),
+            "processed": self.processed,
+            "avg_queue_wait_ms": round(self.total_wait / self.processed * 1000, 2) if self.processed else 0.0,
+            "max_queue_wait_ms": round(self.max_wait * 1000, 2)
+        }
@@ -0,0 +1,115 @@
+import json
+import zlib
+from typing import Optional
+import redis.asyncio as redis
+import logging
+
+from src.config import settings
+from src.memory.redis_manager import redis_session_manager
+
+logger = logging.getLogger(__name__)
+
+class UpdateDeferred(Exception):
+    """Апдейт отложен лимитером: воркер вернет его в поток через delay секунд"""
+
+    def __init__(self, delay: float):
+        super().__init__(f"update deferred for {delay:.2f}s")
+        self.delay = delay
+
+class UpdateStream:
+    """Очередь апдейтов Telegram в Redis Streams (ingress для BOT_MODE=queue).
+
+    Апдейты раскладываются по partitions потокам по хэшу chat_id, поэтому
+    все апдейты одного чата попадают в один поток и читаются в порядке
+    поступления. Каждый поток в любой момент принадлежит одному воркеру
+    (см. src/bot/worker.py).
+    """
+
+    def __init__(self):
+        self.partitions = settings.bot_queue.partitions
+        self.prefix = settings.bot_queue.stream_prefix
+        self.group = settings.bot_queue.consumer_group
+        self.max_length = settings.bot_queue.max_length
+        self.published = 0
+
+    async def _client(self) -> redis.Redis:
+        if not redis_session_manager.redis_client:
+            await redis_session_manager.init_redis()
+        return redis_session_manager.redis_client
+
+    def stream_key(self, partition: int) -> str:
+        return f"{self.prefix}:{partition}"
+
+    def delayed_key(self, stream_key: str) -> str:
+        """ZSET отложенных апдейтов потока партиции; hash tag - слот самого потока"""
+        return f"{self.prefix}:delayed:{{{stream_key}}}"
+
+    @property
+    def dead_letter_key(self) -> str:
+        return f"{self.prefix}:dead"
+
+    def partition_for(self, chat_id: Optional[int]) -> int:
+        if chat_id is None:
+            return 0
+        return zlib.crc32(str(chat_id).encode()) % self.partitions
+
+    @staticmethod
+    def extract_chat_id(payload: dict) -> Optional[int]:
+        """chat_id из сырого апдейта без сборки объекта Update"""
+        for field in ("message", "edited_message", "channel_post", "edited_channel_post"):
+            if field in payload:
+                return payload[field].get("chat", {}).get("id")
+        callback = payload.get("callback_query")
+        if callback and callback.get("message"):
+            return callback["message"].get("chat", {}).get("id")
+        for field in ("my_chat_member", "chat_member", "chat_join_request"):
+            if field in payload:
+                return payload[field].get("chat", {}).get("id")
+        return None
+
+    async def publish(self, payload: dict) -> str:
+        """Постановка сырого апдейта в поток его партиции"""
+        client = await self._client()
+        chat_id = self.extract_chat_id(payload)
+        entry_id = await client.xadd(
+            self.stream_key(self.partition_for(chat_id)),
+            {
+                "chat_id": chat_id if chat_id is not None else "",
+                "update": json.dumps(payload, ensure_ascii=False)
+            },
+            maxlen=self.max_length,
+            approximate=True
+        )
+        self.published += 1
+        return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+
+    async def ensure_groups(self):
+        client = await self._client()
+        for partition in range(self.partitions):
+            try:
+                await client.xgroup_create(self.stream_key(partition), self.group, id="0", mkstream=True)
+            except redis.ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+    async def backlog(self) -> dict:
+        """Длина потоков и число неподтвержденных апдейтов по партициям"""
+        client = await self._client()
+        async with client.pipeline(transaction=False) as pipe:
+            for partition in range(self.partitions):
+                pipe.xlen(self.stream_key(partition))
+                pipe.xpending(self.stream_key(partition), self.group)
+                pipe.zcard(self.delayed_key(self.stream_key(partition)))
+            results = await pipe.execute(raise_on_error=False)
+
+        report = {}
+        for partition in range(self.partitions):
+            length, pending, delayed = results[3 * partition:3 * partition + 3]
+            report[partition] = {
+                "length": length if isinstance(length, int) else 0,
+                "pending": pending["pending"] if isinstance(pending, dict) else 0,
+                "delayed": delayed if isinstance(delayed, int) else 0
+            }
+        return report
+
+update_stream = UpdateStream()
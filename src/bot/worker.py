@@ -0,0 +1,353 @@
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import redis.asyncio as redis
+import logging
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.config import settings
+from src.bot.update_stream import update_stream, UpdateDeferred
+
+logger = logging.getLogger(__name__)
+
+WORKERS_KEY_SUFFIX = "workers"
+
+# KEYS[1] - ключ владельца партиции; ARGV[1] - id воркера, ARGV[2] - срок аренды (мс)
+RENEW_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# KEYS[1] - ZSET отложенных апдейтов, KEYS[2] - поток партиции; ARGV[1] - now (мс),
+# ARGV[2] - сколько вернуть за раз, ARGV[3] - MAXLEN потока. Наступившие апдейты
+# возвращаются в поток с пометкой deferred и удаляются из ZSET атомарно.
+RELEASE_DELAYED_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    local entry = cjson.decode(member)
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*',
+        'chat_id', entry['chat_id'], 'update', entry['update'], 'deferred', '1')
+    redis.call('ZREM', KEYS[1], member)
+end
+return #due
+"""
+
+# KEYS[1] - ключ владельца партиции; ARGV[1] - id воркера
+RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class BotWorker:
+    """Воркер, обрабатывающий апдейты из партиций UpdateStream.
+
+    Воркеры регистрируются в ZSET с отметкой heartbeat; партиции делятся
+    между живыми воркерами по кругу. Партицию читает только держатель
+    аренды (ключ с PX), поэтому порядок апдейтов чата сохраняется и при
+    перебалансировке: прежний владелец дорабатывает пачку и отпускает
+    аренду, новый сначала перехватывает ее неподтвержденные апдейты.
+
+    Обработчик получает апдейт и признак повторной подачи. Ошибка
+    обработчика отправляет апдейт в dead letter. UpdateDeferred (лимитер
+    отложил апдейт) переносит его в ZSET отложенных той же транзакцией,
+    что и XACK, - по сроку он возвращается в поток партиции и снова
+    проходит аренду и порядок чата.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[dict, bool], Awaitable[None]],
+        worker_id: Optional[str] = None,
+        max_concurrency: Optional[int] = None
+    ):
+        self.handler = handler
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = settings.bot_queue.batch_size
+        self.block_ms = settings.bot_queue.block_ms
+        self.lease_ms = settings.bot_queue.lease_ms
+        self.max_deliveries = settings.bot_queue.max_deliveries
+        self.workers_key = f"{update_stream.prefix}:{WORKERS_KEY_SUFFIX}"
+        self._semaphore = asyncio.Semaphore(max_concurrency or settings.telegram.max_concurrent_updates)
+        self._partitions: Dict[int, Tuple[asyncio.Task, asyncio.Event]] = {}
+        self._stopping = asyncio.Event()
+        self._client: Optional[redis.Redis] = None
+        self._renew_lease = None
+        self._release_lease = None
+        self._release_delayed = None
+        self.processed = 0
+        self.delayed = 0
+        self.failed = 0
+        self.dead_lettered = 0
+
+    def owner_key(self, partition: int) -> str:
+        return f"{update_stream.prefix}:owner:{partition}"
+
+    async def run(self):
+        """Основной цикл: heartbeat, перебалансировка и продление аренды"""
+        self._client = await update_stream._client()
+        self._renew_lease = self._client.register_script(RENEW_LEASE_SCRIPT)
+        self._release_lease = self._client.register_script(RELEASE_LEASE_SCRIPT)
+        self._release_delayed = self._client.register_script(RELEASE_DELAYED_SCRIPT)
+        await update_stream.ensure_groups()
+        logger.info(f"Bot worker {self.worker_id} started")
+
+        interval = self.lease_ms / 3000
+        try:
+            while not self._stopping.is_set():
+                try:
+                    await self._rebalance()
+                except Exception as e:
+                    logger.error(f"Worker rebalance failed: {e}")
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self._shutdown()
+
+    def stop(self):
+        self._stopping.set()
+
+    async def _live_workers(self) -> List[str]:
+        now_ms = int(time.time() * 1000)
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.zadd(self.workers_key, {self.worker_id: now_ms})
+            pipe.zremrangebyscore(self.workers_key, 0, now_ms - self.lease_ms)
+            pipe.zrange(self.workers_key, 0, -1)
+            _, _, members = await pipe.execute()
+        return sorted(member.decode() for member in members)
+
+    def _assigned(self, workers: List[str]) -> Set[int]:
+        index = workers.index(self.worker_id)
+        return {
+            partition for partition in range(update_stream.partitions)
+            if partition % len(workers) == index
+        }
+
+    async def _rebalance(self):
+        assigned = self._assigned(await self._live_workers())
+
+        for partition, (task, stop_event) in list(self._partitions.items()):
+            if task.done():
+                self._partitions.pop(partition)
+                continue
+            # аренда продлевается и у уходящей партиции, пока дорабатывается пачка
+            renewed = await self._renew_lease(
+                keys=[self.owner_key(partition)],
+                args=[self.worker_id, self.lease_ms]
+            )
+            if not renewed:
+                logger.warning(f"Lease for partition {partition} lost by {self.worker_id}")
+                stop_event.set()
+            elif partition not in assigned:
+                stop_event.set()
+
+        for partition in assigned - set(self._partitions):
+            acquired = await self._client.set(
+                self.owner_key(partition), self.worker_id, nx=True, px=self.lease_ms
+            )
+            if not acquired:
+                # прежний владелец еще дорабатывает пачку - повторим на следующем шаге
+                continue
+            stop_event = asyncio.Event()
+            task = asyncio.create_task(self._consume(partition, stop_event))
+            self._partitions[partition] = (task, stop_event)
+            logger.info(f"Partition {partition} acquired by {self.worker_id}")
+
+    async def _consume(self, partition: int, stop_event: asyncio.Event):
+        stream_key = update_stream.stream_key(partition)
+        try:
+            # апдейты прежнего владельца идут раньше новых, иначе нарушится порядок
+            entries = await self._claim_pending(stream_key)
+            while entries:
+                await self._process(stream_key, entries)
+                entries = await self._claim_pending(stream_key)
+
+            while not stop_event.is_set() and not self._stopping.is_set():
+                await self._release_delayed(
+                    keys=[update_stream.delayed_key(stream_key), stream_key],
+                    args=[int(time.time() * 1000), self.batch_size, update_stream.max_length]
+                )
+                response = await self._client.xreadgroup(
+                    update_stream.group,
+                    self.worker_id,
+                    streams={stream_key: ">"},
+                    count=self.batch_size,
+                    block=self.block_ms
+                )
+                if response:
+                    await self._process(stream_key, response[0][1])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Partition {partition} consumer failed: {e}")
+        finally:
+            try:
+                await self._release_lease(keys=[self.owner_key(partition)], args=[self.worker_id])
+            except Exception as e:
+                logger.warning(f"Failed to release partition {partition}: {e}")
+            logger.info(f"Partition {partition} released by {self.worker_id}")
+
+    async def _claim_pending(self, stream_key: str) -> List[Tuple[bytes, Dict]]:
+        """Перехват всех неподтвержденных апдейтов партиции (аренда дает эксклюзивность)"""
+        claimed = []
+        start_id = "0-0"
+        while True:
+            start_id, entries = (await self._client.xautoclaim(
+                stream_key,
+                update_stream.group,
+                self.worker_id,
+                min_idle_time=0,
+                start_id=start_id,
+                count=self.batch_size
+            ))[:2]
+            claimed.extend(entry for entry in entries if entry[1])
+            if start_id in (b"0-0", "0-0") or not entries:
+                break
+        if not claimed:
+            return []
+
+        pending = await self._client.xpending_range(
+            stream_key, update_stream.group,
+            min=claimed[0][0], max=claimed[-1][0], count=len(claimed)
+        )
+        deliveries = {item["message_id"]: item["times_delivered"] for item in pending}
+        poisoned = [entry for entry in claimed if deliveries.get(entry[0], 0) > self.max_deliveries]
+        if poisoned:
+            await self._dead_letter(stream_key, poisoned)
+            poisoned_ids = {entry_id for entry_id, _ in poisoned}
+            claimed = [entry for entry in claimed if entry[0] not in poisoned_ids]
+
+        logger.info(f"Claimed {len(claimed)} pending updates from {stream_key}")
+        return claimed
+
+    async def _dead_letter(self, stream_key: str, entries: List[Tuple[bytes, Dict]], error: Optional[str] = None):
+        extra = {b"source": stream_key}
+        if error:
+            extra[b"error"] = error
+        async with self._client.pipeline(transaction=False) as pipe:
+            for entry_id, fields in entries:
+                pipe.xadd(update_stream.dead_letter_key, {**fields, **extra}, maxlen=10000, approximate=True)
+            pipe.xack(stream_key, update_stream.group, *[entry_id for entry_id, _ in entries])
+            pipe.xdel(stream_key, *[entry_id for entry_id, _ in entries])
+            await pipe.execute()
+        self.dead_lettered += len(entries)
+        logger.error(f"Moved {len(entries)} updates from {stream_key} to dead letter stream")
+
+    async def _delay(self, stream_key: str, entry_id: bytes, fields: Dict, delay: float):
+        """Перенос апдейта в отложенные вместе с XACK/XDEL исходной записи (MULTI)"""
+        member = json.dumps({
+            "chat_id": fields.get(b"chat_id", b"").decode(),
+            "update": fields[b"update"].decode()
+        }, ensure_ascii=False)
+        due_ms = int((time.time() + delay) * 1000)
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.zadd(update_stream.delayed_key(stream_key), {member: due_ms})
+            pipe.xack(stream_key, update_stream.group, entry_id)
+            pipe.xdel(stream_key, entry_id)
+            await pipe.execute()
+        self.delayed += 1
+
+    async def _process(self, stream_key: str, entries: List[Tuple[bytes, Dict]]):
+        """Чаты пачки обрабатываются параллельно, апдейты одного чата - по порядку"""
+        by_chat: "OrderedDict[bytes, List[Tuple[bytes, Dict]]]" = OrderedDict()
+        for entry in entries:
+            by_chat.setdefault(entry[1].get(b"chat_id", b""), []).append(entry)
+
+        await asyncio.gather(*(
+            self._process_chat(stream_key, chat_entries)
+            for chat_entries in by_chat.values()
+        ))
+
+    async def _process_chat(self, stream_key: str, entries: List[Tuple[bytes, Dict]]):
+        async with self._semaphore:
+            for entry_id, fields in entries:
+                try:
+                    await self.handler(json.loads(fields[b"update"]), fields.get(b"deferred") == b"1")
+                    self.processed += 1
+                except UpdateDeferred as e:
+                    await self._delay(stream_key, entry_id, fields, e.delay)
+                    continue
+                except Exception as e:
+                    # ошибка обработчика не должна блокировать очередь чата:
+                    # апдейт уходит в dead letter вместе с текстом ошибки
+                    self.failed += 1
+                    logger.error(f"Update {entry_id} handling failed: {e}")
+                    await self._dead_letter(stream_key, [(entry_id, fields)], f"{e.__class__.__name__}: {e}")
+                    continue
+                async with self._client.pipeline(transaction=False) as pipe:
+                    pipe.xack(stream_key, update_stream.group, entry_id)
+                    pipe.xdel(stream_key, entry_id)
+                    await pipe.execute()
+
+    async def _shutdown(self):
+        for _, stop_event in self._partitions.values():
+            stop_event.set()
+        tasks = [task for task, _ in self._partitions.values()]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._partitions.clear()
+        try:
+            await self._client.zrem(self.workers_key, self.worker_id)
+        except Exception as e:
+            logger.warning(f"Failed to unregister worker: {e}")
+        logger.info(
+            f"Bot worker {self.worker_id} stopped: processed {self.processed}, "
+            f"failed {self.failed}, dead lettered {self.dead_lettered}"
+        )
+
+    def stats(self) -> Dict:
+        return {
+            "worker_id": self.worker_id,
+            "partitions": sorted(self._partitions),
+            "processed": self.processed,
+            "failed": self.failed,
+            "delayed": self.delayed,
+            "dead_lettered": self.dead_lettered
+        }
+
+async def main():
+    import signal
+    from src.bot.telegram_bot import bot_instance
+    from src.memory.session_manager import session_manager
+    from src.memory.write_behind import history_writer
+    from src.memory.redis_manager import redis_session_manager
+
+    application = bot_instance.build_application()
+    await application.initialize()
+    bot_instance.application = application
+    session_manager.start_cleanup()
+    await history_writer.start()
+
+    worker = BotWorker(bot_instance.process_queued_update)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        await session_manager.stop_cleanup()
+        await history_writer.stop()
+        await application.shutdown()
+        await redis_session_manager.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=getattr(logging, settings.log_level.upper()),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(main())
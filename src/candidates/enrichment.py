@@ -0,0 +1,153 @@
+import asyncio
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from sqlalchemy import or_, select, update
+import logging
+
+from src.config import settings
+from src.database.database import AsyncSessionLocal
+from src.database.models import Candidate
+
+logger = logging.getLogger(__name__)
+
+GITHUB_URL_PATTERN = re.compile(
+    r"^(?:https?://)?(?:www\.)?github\.com/([A-Za-z0-9](?:[A-Za-z0-9-]{0,38}))/?(?:[?#].*)?$",
+    re.IGNORECASE
+)
+
+class CandidateEnricher:
+    """Обогащение кандидатов данными GitHub по github_url.
+
+    Кандидаты без enriched_at или с enriched_at старше stale_after
+    выбираются пачкой до limit, их логины уходят одним вызовом
+    bulk_user_profiles MCP-сервера GitHub (GraphQL, десятки пользователей
+    на запрос, приоритет bulk), результаты записываются одним
+    UPDATE по первичному ключу. Несуществующие пользователи и
+    некорректные ссылки тоже получают enriched_at, чтобы не запрашивать
+    их каждый цикл; неудавшиеся пачки остаются устаревшими.
+    """
+
+    def __init__(self):
+        self.interval = settings.github.enrich_interval
+        self.stale_after = timedelta(seconds=settings.github.enrich_stale_after)
+        self.limit = settings.github.enrich_limit
+        self.last_run: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.counters = {
+            "runs": 0,
+            "enriched": 0,
+            "not_found": 0,
+            "invalid_url": 0,
+            "failed": 0
+        }
+
+    @staticmethod
+    def github_login(github_url: str) -> Optional[str]:
+        match = GITHUB_URL_PATTERN.match(github_url.strip())
+        return match.group(1) if match else None
+
+    async def enrich(self, candidate_ids: Optional[List[int]] = None, force: bool = False) -> Dict[str, Any]:
+        """Один проход обогащения; candidate_ids/force - ручной запуск для выбранных кандидатов"""
+        async with self._lock:
+            now = datetime.now(timezone.utc)
+            stmt = select(Candidate.id, Candidate.github_url).where(Candidate.github_url.isnot(None))
+            if candidate_ids:
+                stmt = stmt.where(Candidate.id.in_(candidate_ids))
+            if not force:
+                stmt = stmt.where(or_(
+                    Candidate.enriched_at.is_(None),
+                    Candidate.enriched_at < now - self.stale_after
+                ))
+            stmt = stmt.order_by(Candidate.enriched_at.asc().nullsfirst()).limit(self.limit)
+
+            async with AsyncSessionLocal() as session:
+                candidates = (await session.execute(stmt)).all()
+                if not candidates:
+                    return {"selected": 0, "enriched": 0, "not_found": 0, "invalid_url": 0, "failed": 0}
+
+                by_login: Dict[str, List[int]] = {}
+                rows = []
+                for candidate_id, github_url in candidates:
+                    login = self.github_login(github_url)
+                    if login:
+                        by_login.setdefault(login.lower(), []).append(candidate_id)
+                    else:
+                        rows.append({
+                            "id": candidate_id,
+                            "github_profile": {"error": "invalid_github_url"},
+                            "enriched_at": now
+                        })
+                summary = {"selected": len(candidates), "enriched": 0, "not_found": 0, "invalid_url": len(rows), "failed": 0}
+
+                if by_login:
+                    from src.mcp.mcp_client import mcp_client
+                    result = await mcp_client.github.bulk_user_profiles(list(by_login))
+                    profiles = {login.lower(): profile for login, profile in (result.get("data") or {}).items()}
+                    if result.get("error"):
+                        logger.error(f"Candidate enrichment call failed: {result['error']}")
+
+                    for login, ids in by_login.items():
+                        if login not in profiles:
+                            summary["failed"] += len(ids)
+                            continue
+                        profile = profiles[login]
+                        if profile is None:
+                            summary["not_found"] += len(ids)
+                            profile = {"login": login, "error": "not_found"}
+                        else:
+                            summary["enriched"] += len(ids)
+                        rows.extend(
+                            {"id": candidate_id, "github_profile": profile, "enriched_at": now}
+                            for candidate_id in ids
+                        )
+
+                if rows:
+                    await session.execute(update(Candidate), rows)
+                    await session.commit()
+
+            self.counters["runs"] += 1
+            for name in ("enriched", "not_found", "invalid_url", "failed"):
+                self.counters[name] += summary[name]
+            self.last_run = now
+            logger.info(f"Candidate enrichment: {summary}")
+            return summary
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "running": self.is_running,
+            "last_run": self.last_run.isoformat() if self.last_run else None
+        }
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.is_running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                # Выборка заполнена целиком и без сбоев - устаревших больше limit, продолжаем сразу
+                while True:
+                    summary = await self.enrich()
+                    if summary["selected"] < self.limit or summary["failed"]:
+                        break
+            except Exception as e:
+                logger.error(f"Candidate enrichment error: {e}")
+            await asyncio.sleep(self.interval)
+
+candidate_enricher = CandidateEnricher()
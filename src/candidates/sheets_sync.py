@@ -0,0 +1,313 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import logging
+
+from src.config import settings
+from src.database.database import AsyncSessionLocal
+from src.database.models import Candidate, SheetSyncRow
+
+logger = logging.getLogger(__name__)
+
+# Заголовок колонки (без регистра) -> поле Candidate
+FIELD_ALIASES = {
+    "id": ("id", "candidate_id", "id кандидата"),
+    "name": ("name", "имя", "фио", "кандидат"),
+    "email": ("email", "e-mail", "почта"),
+    "github_url": ("github", "github_url", "гитхаб"),
+    "linkedin_url": ("linkedin", "linkedin_url"),
+    "skills": ("skills", "навыки", "стек"),
+    "experience_level": ("level", "experience_level", "уровень", "грейд"),
+    "status": ("status", "статус"),
+    "notes": ("notes", "комментарий", "заметки")
+}
+SYNCED_FIELDS = ("name", "email", "github_url", "linkedin_url", "skills", "experience_level", "status", "notes")
+
+def column_letter(index: int) -> str:
+    """Буква колонки A1 по индексу с нуля"""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+def parse_skills(value: Optional[str]) -> Optional[Dict[str, str]]:
+    """'Python: senior, SQL' -> {"Python": "senior", "SQL": ""}"""
+    if not value:
+        return None
+    skills = {}
+    for item in re.split(r"[,;\n]", value):
+        name, _, level = item.partition(":")
+        if name.strip():
+            skills[name.strip()] = level.strip()
+    return skills or None
+
+def chunks(items: List[Any], size: int) -> Iterator[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class CandidateSheetSync:
+    """Инкрементальная синхронизация таблицы рекрутеров с candidates.
+
+    Лист читается одним values.batchGet, колонки сопоставляются с полями
+    Candidate по заголовкам (FIELD_ALIASES). Для каждой строки считается
+    хэш значений; строки с тем же хэшем, что в sheet_sync_rows, не
+    трогаются. Измененные строки обновляются, новые вставляются
+    (сначала сопоставляясь по email, чтобы не плодить дубли) - пакетами
+    по db_chunk_size через executemany. Идентификатор кандидата пишется
+    в колонку ID, а статусы, измененные в базе при неизменной строке,
+    возвращаются в таблицу - все одним values.batchUpdate до коммита
+    транзакции, так что хэш строки сдвигается только вместе с записью в
+    таблицу.
+    """
+
+    def __init__(self, spreadsheet_id: Optional[str] = None, worksheet: Optional[str] = None):
+        config = settings.sheets_sync
+        self.spreadsheet_id = spreadsheet_id or config.spreadsheet_id
+        self.worksheet = worksheet or config.worksheet
+        self.interval = config.interval
+        self.chunk_size = config.db_chunk_size
+        self.sheet_key = f"{self.spreadsheet_id}:{self.worksheet}"
+        self.last_run: Optional[datetime] = None
+        self.last_summary: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def sheet_range(self) -> str:
+        return "'" + self.worksheet.replace("'", "''") + "'"
+
+    def _cell(self, column: int, row: int) -> str:
+        return f"{self.sheet_range}!{column_letter(column)}{row}"
+
+    @staticmethod
+    def map_columns(header: List[Any]) -> Dict[str, int]:
+        columns: Dict[str, int] = {}
+        for index, title in enumerate(header):
+            title = str(title).strip().lower()
+            for field, aliases in FIELD_ALIASES.items():
+                if title in aliases and field not in columns:
+                    columns[field] = index
+        return columns
+
+    @staticmethod
+    def parse_row(row: List[Any], columns: Dict[str, int]) -> Dict[str, Any]:
+        fields = {}
+        for field in SYNCED_FIELDS:
+            index = columns.get(field)
+            if index is None:
+                continue
+            value = str(row[index]).strip() if index < len(row) else ""
+            fields[field] = value or None
+        if "skills" in fields:
+            fields["skills"] = parse_skills(fields["skills"])
+        if "status" in fields:
+            fields["status"] = fields["status"] or "new"
+        return fields
+
+    @staticmethod
+    def row_hash(fields: Dict[str, Any]) -> str:
+        return hashlib.sha1(json.dumps(fields, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+    async def _read_sheet(self) -> List[List[Any]]:
+        from src.mcp.mcp_client import mcp_client
+        result = await mcp_client.sheets.batch_read(self.spreadsheet_id, [self.sheet_range])
+        if result.get("status") != "success":
+            raise RuntimeError(f"Sheet read failed: {result.get('message')}")
+        return result["data"].get(self.sheet_range) or []
+
+    async def _write_sheet(self, data: List[Dict[str, Any]]):
+        from src.mcp.mcp_client import mcp_client
+        result = await mcp_client.sheets.batch_update(self.spreadsheet_id, data)
+        if result.get("status") != "success":
+            raise RuntimeError(f"Sheet write-back failed: {result.get('message')}")
+
+    async def _lookup(self, session, column, values: List[Any]) -> Dict[Any, tuple]:
+        """{значение колонки: (id, status)} пакетами, чтобы не упереться в лимит параметров"""
+        found = {}
+        for chunk in chunks(values, self.chunk_size):
+            rows = await session.execute(
+                select(column, Candidate.id, Candidate.status).where(column.in_(chunk))
+            )
+            for value, candidate_id, status in rows.all():
+                found[value] = (candidate_id, status)
+        return found
+
+    async def sync(self) -> Dict[str, Any]:
+        """Один проход синхронизации; возвращает сводку по строкам"""
+        if not self.spreadsheet_id:
+            raise ValueError("SHEET_ID is not configured")
+
+        async with self._lock:
+            started = time.monotonic()
+            values = await self._read_sheet()
+            summary = {"rows": 0, "unchanged": 0, "updated": 0, "inserted": 0, "matched_by_email": 0, "status_written": 0}
+            if not values:
+                return summary
+
+            header, rows = values[0], values[1:]
+            columns = self.map_columns(header)
+            if "name" not in columns:
+                raise ValueError(f"Worksheet '{self.worksheet}' has no name column")
+
+            write_back: List[Dict[str, Any]] = []
+            if "id" not in columns:
+                columns["id"] = len(header)
+                write_back.append({"range": self._cell(columns["id"], 1), "values": [["ID"]]})
+
+            parsed = []
+            for offset, row in enumerate(rows):
+                fields = self.parse_row(row, columns)
+                if not fields.get("name"):
+                    continue
+                raw_id = str(row[columns["id"]]).strip() if columns["id"] < len(row) else ""
+                parsed.append({
+                    "row": offset + 2,
+                    "id": int(raw_id) if raw_id.isdigit() else None,
+                    "fields": fields,
+                    "hash": self.row_hash(fields)
+                })
+            summary["rows"] = len(parsed)
+            table = Candidate.__table__
+
+            async with AsyncSessionLocal() as session:
+                state = dict((await session.execute(
+                    select(SheetSyncRow.candidate_id, SheetSyncRow.row_hash)
+                    .where(SheetSyncRow.sheet_key == self.sheet_key)
+                )).all())
+                existing = await self._lookup(session, Candidate.id, [item["id"] for item in parsed if item["id"]])
+
+                updates, inserts, status_rows, seen = [], [], [], set()
+                for item in parsed:
+                    # Скопированная строка с тем же ID - новый кандидат
+                    if item["id"] in existing and item["id"] not in seen:
+                        seen.add(item["id"])
+                        if state.get(item["id"]) != item["hash"]:
+                            updates.append(item)
+                        elif "status" in columns and existing[item["id"]][1] != item["fields"]["status"]:
+                            # Строка не менялась, а статус сменили в базе - возвращаем его в таблицу
+                            item["fields"]["status"] = existing[item["id"]][1]
+                            item["hash"] = self.row_hash(item["fields"])
+                            write_back.append({
+                                "range": self._cell(columns["status"], item["row"]),
+                                "values": [[item["fields"]["status"] or ""]]
+                            })
+                            status_rows.append(item)
+                        else:
+                            summary["unchanged"] += 1
+                    else:
+                        inserts.append(item)
+
+                # Новые строки без ID, но с email существующего кандидата - это он же
+                emails = [item["fields"]["email"] for item in inserts if item["fields"].get("email")]
+                by_email = await self._lookup(session, Candidate.email, emails) if emails else {}
+                new_rows = []
+                for item in inserts:
+                    match = by_email.get(item["fields"].get("email"))
+                    if match and match[0] not in seen:
+                        seen.add(match[0])
+                        item["id"] = match[0]
+                        updates.append(item)
+                        write_back.append({"range": self._cell(columns["id"], item["row"]), "values": [[item["id"]]]})
+                        summary["matched_by_email"] += 1
+                    else:
+                        new_rows.append(item)
+                inserts = new_rows
+
+                field_names = [field for field in SYNCED_FIELDS if field in columns]
+                if updates:
+                    stmt = (
+                        update(table)
+                        .where(table.c.id == bindparam("candidate_id"))
+                        .values({field: bindparam(f"v_{field}") for field in field_names})
+                    )
+                    for chunk in chunks(updates, self.chunk_size):
+                        await session.execute(stmt, [
+                            {"candidate_id": item["id"], **{f"v_{field}": item["fields"][field] for field in field_names}}
+                            for item in chunk
+                        ])
+                summary["updated"] = len(updates)
+                summary["status_written"] = len(status_rows)
+
+                for chunk in chunks(inserts, self.chunk_size):
+                    result = await session.execute(
+                        insert(table).returning(table.c.id, sort_by_parameter_order=True),
+                        [item["fields"] for item in chunk]
+                    )
+                    for item, candidate_id in zip(chunk, result.scalars().all()):
+                        item["id"] = candidate_id
+                        write_back.append({"range": self._cell(columns["id"], item["row"]), "values": [[candidate_id]]})
+                summary["inserted"] = len(inserts)
+
+                synced = updates + inserts + status_rows
+                if synced:
+                    stmt = pg_insert(SheetSyncRow)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[SheetSyncRow.sheet_key, SheetSyncRow.candidate_id],
+                        set_={"row_hash": stmt.excluded.row_hash, "status": stmt.excluded.status, "synced_at": func.now()}
+                    )
+                    for chunk in chunks(synced, self.chunk_size):
+                        await session.execute(stmt, [
+                            {
+                                "sheet_key": self.sheet_key,
+                                "candidate_id": item["id"],
+                                "row_hash": item["hash"],
+                                "status": item["fields"].get("status")
+                            }
+                            for item in chunk
+                        ])
+
+                # Таблица пишется до коммита: если batchUpdate не прошел, транзакция
+                # откатывается и хэши не сдвигаются - иначе строки без ID вставились
+                # бы повторно, а неизменная строка вернула бы в базу старый статус
+                if write_back:
+                    await self._write_sheet(write_back)
+                await session.commit()
+
+            summary["duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+            self.last_run = datetime.now()
+            self.last_summary = summary
+            logger.info(f"Sheet sync {self.sheet_key}: {summary}")
+            return summary
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sheet": self.sheet_key,
+            "running": self.is_running,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_summary": self.last_summary
+        }
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.is_running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Sheet sync error: {e}")
+            await asyncio.sleep(self.interval)
+
+candidate_sheet_sync = CandidateSheetSync()
@@ -1,5 +1,5 @@
 import os
-from typing import Optional, List
+from typing import Dict, Optional, List
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 import logging
@@ -13,6 +13,7 @@ class AISettings(BaseSettings):
     base_url: str = os.getenv("AI_BASE_URL", "https://api.groq.com/openai/v1")
     chat_model: str = os.getenv("AI_CHAT_MODEL", "openai/gpt-oss-120b")
     embeddings_model: str = os.getenv("AI_EMBEDDINGS_MODEL", "text-embedding-ada-002")
+    max_concurrent_requests: int = int(os.getenv("AI_MAX_CONCURRENT_REQUESTS", "8"))
     
     @property
     def effective_base_url(self) -> str:
@@ -72,6 +73,10 @@ class TelegramSettings(BaseSettings):
     bot_name: str = "HRProAssistant"
     bot_username: str = "HRProAssistant_bot"
     webhook_url: Optional[str] = os.getenv("WEBHOOK_URL")
+    webhook_secret: str = os.getenv("TELEGRAM_WEBHOOK_SECRET", "")
+    webhook_path: str = "/telegram/webhook"
+    bot_mode: str = os.getenv("BOT_MODE", "polling").lower()
+    max_concurrent_updates: int = int(os.getenv("BOT_MAX_CONCURRENT_UPDATES", "32"))
     admin_chat_id: Optional[int] = os.getenv("ADMIN_CHAT_ID")
     description: str = "🤖 AI-помощник для IT-рекрутинга. Найду лучших разработчиков, проанализирую GitHub и организую процесс найма!"
 
@@ -85,6 +90,63 @@ class MCPSettings(BaseSettings):
     sheets_url: str = os.getenv("MCP_SHEETS_URL", "http://mcp_sheets:8003")
     
     enable_mcp: bool = os.getenv("ENABLE_MCP", "true").lower() == "true"
+    http_pool_limit: int = int(os.getenv("MCP_HTTP_POOL_LIMIT", "100"))
+    http_pool_limit_per_host: int = int(os.getenv("MCP_HTTP_POOL_LIMIT_PER_HOST", "20"))
+    http_keepalive_timeout: float = float(os.getenv("MCP_HTTP_KEEPALIVE_TIMEOUT", "60"))
+    http_dns_cache_ttl: int = int(os.getenv("MCP_HTTP_DNS_CACHE_TTL", "300"))
+    http_timeout: float = float(os.getenv("MCP_HTTP_TIMEOUT", "15"))
+    sheets_max_workers: int = int(os.getenv("SHEETS_MAX_WORKERS", "4"))
+    sheets_handle_ttl: int = int(os.getenv("SHEETS_HANDLE_TTL", "600"))
+    
+    tools_deadline: float = float(os.getenv("MCP_TOOLS_DEADLINE", "8.0"))
+    tool_budgets: Dict[str, float] = {
+        "github": float(os.getenv("MCP_GITHUB_BUDGET", "6.0")),
+        "web_search": float(os.getenv("MCP_WEB_SEARCH_BUDGET", "8.0")),
+        "google_sheets": float(os.getenv("MCP_SHEETS_BUDGET", "5.0")),
+    }
+
+class GitHubSettings(BaseSettings):
+    cache_enabled: bool = os.getenv("GITHUB_CACHE_ENABLED", "true").lower() == "true"
+    cache_fresh_ttl: int = int(os.getenv("GITHUB_CACHE_FRESH_TTL", "600"))
+    cache_stale_ttl: int = int(os.getenv("GITHUB_CACHE_STALE_TTL", str(7 * 24 * 3600)))
+    # Пул токенов через запятую; без него используется GITHUB_TOKEN
+    tokens: List[str] = [
+        token.strip()
+        for token in (os.getenv("GITHUB_TOKENS") or os.getenv("GITHUB_TOKEN", "")).split(",")
+        if token.strip()
+    ]
+    interactive_reserve: int = int(os.getenv("GITHUB_INTERACTIVE_RESERVE", "100"))
+    max_concurrent_requests: int = int(os.getenv("GITHUB_MAX_CONCURRENT_REQUESTS", "10"))
+    max_rate_limit_retries: int = int(os.getenv("GITHUB_MAX_RATE_LIMIT_RETRIES", "2"))
+    max_retry_wait: float = float(os.getenv("GITHUB_MAX_RETRY_WAIT", "30"))
+    graphql_batch_size: int = int(os.getenv("GITHUB_GRAPHQL_BATCH_SIZE", "25"))
+    enrich_enabled: bool = os.getenv("CANDIDATE_ENRICH_ENABLED", "false").lower() == "true"
+    enrich_interval: int = int(os.getenv("CANDIDATE_ENRICH_INTERVAL", "3600"))
+    enrich_stale_after: int = int(os.getenv("CANDIDATE_ENRICH_STALE_AFTER", str(7 * 24 * 3600)))
+    enrich_limit: int = int(os.getenv("CANDIDATE_ENRICH_LIMIT", "500"))
+
+class WebSearchSettings(BaseSettings):
+    cache_enabled: bool = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+    cache_ttl: int = int(os.getenv("SEARCH_CACHE_TTL", "3600"))
+    cache_stale_ttl: int = int(os.getenv("SEARCH_CACHE_STALE_TTL", str(24 * 3600)))
+    html_url: str = os.getenv("WEB_SEARCH_HTML_URL", "https://html.duckduckgo.com/html/")
+    deep_max_pages: int = int(os.getenv("WEB_SEARCH_DEEP_PAGES", "5"))
+    deep_concurrency: int = int(os.getenv("WEB_SEARCH_DEEP_CONCURRENCY", "8"))
+    deep_per_host: int = int(os.getenv("WEB_SEARCH_DEEP_PER_HOST", "2"))
+    deep_max_bytes: int = int(os.getenv("WEB_SEARCH_DEEP_MAX_BYTES", str(512 * 1024)))
+    deep_page_timeout: float = float(os.getenv("WEB_SEARCH_DEEP_PAGE_TIMEOUT", "4.0"))
+    # Весь глубокий поиск укладывается в бюджет инструмента web_search (MCP_WEB_SEARCH_BUDGET)
+    deep_deadline: float = float(os.getenv("WEB_SEARCH_DEEP_DEADLINE", "6.0"))
+    deep_serp_timeout: float = float(os.getenv("WEB_SEARCH_DEEP_SERP_TIMEOUT", "2.0"))
+    deep_token_budget: int = int(os.getenv("WEB_SEARCH_DEEP_TOKEN_BUDGET", "3000"))
+    deep_content_ttl: int = int(os.getenv("WEB_SEARCH_DEEP_CONTENT_TTL", str(24 * 3600)))
+
+class SheetsSyncSettings(BaseSettings):
+    enabled: bool = os.getenv("SHEETS_SYNC_ENABLED", "false").lower() == "true"
+    spreadsheet_id: str = os.getenv("SHEET_ID", "")
+    worksheet: str = os.getenv("SHEETS_SYNC_WORKSHEET", "Candidates")
+    interval: int = int(os.getenv("SHEETS_SYNC_INTERVAL", "300"))
+    db_chunk_size: int = int(os.getenv("SHEETS_SYNC_DB_CHUNK_SIZE", "2000"))
 
 class VectorDBSettings(BaseSettings):
     vector_dimension: int = int(os.getenv("VECTOR_DIMENSION", "1536"))
@@ -95,6 +157,8 @@ class RedisSettings(BaseSettings):
     port: int = int(os.getenv("REDIS_PORT", "6379"))
     password: str = os.getenv("REDIS_PASSWORD", "")
     db: int = int(os.getenv("REDIS_DB", "0"))
+    history_compression: bool = os.getenv("REDIS_HISTORY_COMPRESSION", "true").lower() == "true"
+    history_compression_threshold: int = int(os.getenv("REDIS_HISTORY_COMPRESSION_THRESHOLD", "1024"))
     
     @property
     def url(self) -> str:
@@ -102,11 +166,46 @@ class RedisSettings(BaseSettings):
             return f"redis://:{self.password}@{self.host}:{self.port}/{self.db}"
         return f"redis://{self.host}:{self.port}/{self.db}"
 
+class WriteBehindSettings(BaseSettings):
+    enabled: bool = os.getenv("HISTORY_WRITE_BEHIND", "false").lower() == "true"
+    stream_key: str = os.getenv("HISTORY_STREAM_KEY", "history:stream")
+    consumer_group: str = os.getenv("HISTORY_CONSUMER_GROUP", "history_flushers")
+    batch_size: int = int(os.getenv("HISTORY_FLUSH_BATCH_SIZE", "200"))
+    flush_interval: float = float(os.getenv("HISTORY_FLUSH_INTERVAL", "1.0"))
+    claim_idle_ms: int = int(os.getenv("HISTORY_CLAIM_IDLE_MS", "60000"))
+    # Столько неудачных записей пачки подряд, прежде чем искать в ней битые записи
+    max_attempts: int = int(os.getenv("HISTORY_FLUSH_MAX_ATTEMPTS", "3"))
+    dead_letter_key: str = os.getenv("HISTORY_DEAD_LETTER_KEY", "history:stream:dead")
+
+class BotQueueSettings(BaseSettings):
+    partitions: int = int(os.getenv("BOT_QUEUE_PARTITIONS", "16"))
+    stream_prefix: str = os.getenv("BOT_QUEUE_STREAM_PREFIX", "bot:updates")
+    consumer_group: str = os.getenv("BOT_QUEUE_CONSUMER_GROUP", "bot_workers")
+    max_length: int = int(os.getenv("BOT_QUEUE_MAX_LENGTH", "100000"))
+    batch_size: int = int(os.getenv("BOT_QUEUE_BATCH_SIZE", "32"))
+    block_ms: int = int(os.getenv("BOT_QUEUE_BLOCK_MS", "1000"))
+    lease_ms: int = int(os.getenv("BOT_QUEUE_LEASE_MS", "15000"))
+    max_deliveries: int = int(os.getenv("BOT_QUEUE_MAX_DELIVERIES", "5"))
+
+class RateLimitSettings(BaseSettings):
+    enabled: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    window_seconds: int = int(os.getenv("RATE_LIMIT_WINDOW_SECONDS", "60"))
+    chat_limit: int = int(os.getenv("RATE_LIMIT_CHAT_MESSAGES", "10"))
+    global_limit: int = int(os.getenv("RATE_LIMIT_GLOBAL_MESSAGES", "600"))
+    max_delay: float = float(os.getenv("RATE_LIMIT_MAX_DELAY", "3.0"))
+    # Порог ниже BOT_MAX_CONCURRENT_UPDATES, иначе лимит обработчиков не срабатывает никогда
+    max_in_flight: int = int(os.getenv(
+        "LOAD_SHED_MAX_IN_FLIGHT", str(int(os.getenv("BOT_MAX_CONCURRENT_UPDATES", "32")) * 3 // 4)
+    ))
+    max_llm_queue: int = int(os.getenv("LOAD_SHED_MAX_LLM_QUEUE", "16"))
+
 class MonitoringSettings(BaseSettings):
     prometheus_port: int = int(os.getenv("PROMETHEUS_PORT", "9090"))
     grafana_port: int = int(os.getenv("GRAFANA_PORT", "3000"))
     enable_metrics: bool = os.getenv("ENABLE_METRICS", "true").lower() == "true"
     metrics_port: int = int(os.getenv("METRICS_PORT", "8000"))
+    health_probe_interval: float = float(os.getenv("HEALTH_PROBE_INTERVAL", "15"))
+    health_probe_timeout: float = float(os.getenv("HEALTH_PROBE_TIMEOUT", "3.0"))
 
 class CICDSettings(BaseSettings):
     test_timeout: int = int(os.getenv("TEST_TIMEOUT", "30"))
@@ -119,13 +218,21 @@ class Settings(BaseSettings):
     debug: bool = os.getenv("DEBUG", "False").lower() == "true"
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
     max_conversation_history: int = int(os.getenv("MAX_CONVERSATION_HISTORY", "50"))
+    memory_sessions_max_size: int = int(os.getenv("MEMORY_SESSIONS_MAX_SIZE", "10000"))
+    memory_sessions_ttl: int = int(os.getenv("MEMORY_SESSIONS_TTL", str(24 * 3600)))
     
     database: DatabaseSettings = DatabaseSettings()
     telegram: TelegramSettings = TelegramSettings()
     mcp: MCPSettings = MCPSettings()
+    github: GitHubSettings = GitHubSettings()
+    sheets_sync: SheetsSyncSettings = SheetsSyncSettings()
+    web_search: WebSearchSettings = WebSearchSettings()
     vector_db: VectorDBSettings = VectorDBSettings()
     ai: AISettings = AISettings()
     redis: RedisSettings = RedisSettings()
+    write_behind: WriteBehindSettings = WriteBehindSettings()
+    bot_queue: BotQueueSettings = BotQueueSettings()
+    rate_limit: RateLimitSettings = RateLimitSettings()
     monitoring: MonitoringSettings = MonitoringSettings()
     cicd: CICDSettings = CICDSettings()
     security: SecuritySettings = SecuritySettings()
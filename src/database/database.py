@@ -32,8 +32,11 @@ async def get_db() -> AsyncSession:
 
 async def init_db():
     from src.database.models import Base
+    from src.database.partitions import ensure_partitions
     async with engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         await conn.run_sync(Base.metadata.create_all)
+        await ensure_partitions(conn)
     
     print("Database initialized successfully")
 
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, BigInteger
-from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, BigInteger, Index, UniqueConstraint, Computed
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 import uuid
@@ -7,16 +7,53 @@ from pgvector.sqlalchemy import Vector
 
 Base = declarative_base()
 
+# Сообщения смешанные (русский + английский), поэтому индексируются обеими конфигурациями
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian', coalesce(user_message, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(user_message, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(bot_response, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(bot_response, '')), 'B')"
+)
+
 class ConversationHistory(Base):
+    """История диалогов, секционированная по месяцам (см. src/database/partitions.py)"""
     __tablename__ = "conversation_history"
+    __table_args__ = (
+        UniqueConstraint("message_key", "timestamp", name="uq_conversation_message_key"),
+        Index("idx_conversation_chat_timestamp", "chat_id", "timestamp"),
+        Index("idx_conversation_session", "session_id"),
+        Index("idx_conversation_search", "search_vector", postgresql_using="gin"),
+        Index(
+            "idx_conversation_user_trgm", "user_message",
+            postgresql_using="gin", postgresql_ops={"user_message": "gin_trgm_ops"}
+        ),
+        Index(
+            "idx_conversation_bot_trgm", "bot_response",
+            postgresql_using="gin", postgresql_ops={"bot_response": "gin_trgm_ops"}
+        ),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
-    chat_id = Column(BigInteger, nullable=False, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    chat_id = Column(BigInteger, nullable=False)
     user_message = Column(Text, nullable=False)
     bot_response = Column(Text, nullable=False)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    timestamp = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     session_id = Column(UUID(as_uuid=True), nullable=False, default=uuid.uuid4)
     message_type = Column(String(50), default="text")
+    message_key = Column(UUID(as_uuid=True), default=uuid.uuid4)
+    search_vector = Column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True))
+
+class ChatStats(Base):
+    """Накопительная статистика по чату, обновляется при каждой записи истории"""
+    __tablename__ = "chat_stats"
+    
+    chat_id = Column(BigInteger, primary_key=True)
+    message_count = Column(BigInteger, nullable=False, default=0)
+    first_message_at = Column(DateTime(timezone=True))
+    last_message_at = Column(DateTime(timezone=True))
+    total_response_chars = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 class KnowledgeBase(Base):
     __tablename__ = "knowledge_base"
@@ -41,9 +78,21 @@ class Candidate(Base):
     experience_level = Column(String(50))
     status = Column(String(50), default="new")
     notes = Column(Text)
+    github_profile = Column(JSONB)
+    enriched_at = Column(DateTime(timezone=True), index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+class SheetSyncRow(Base):
+    """Последнее синхронизированное состояние строки таблицы рекрутеров"""
+    __tablename__ = "sheet_sync_rows"
+    
+    sheet_key = Column(String(300), primary_key=True)
+    candidate_id = Column(Integer, primary_key=True)
+    row_hash = Column(String(40), nullable=False)
+    status = Column(String(50))
+    synced_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class Vacancy(Base):
     __tablename__ = "vacancies"
     
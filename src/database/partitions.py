@@ -0,0 +1,193 @@
+import asyncio
+import os
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+import logging
+
+from src.database.database import engine
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "conversation_history"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+STATS_TABLE = "chat_stats"
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+def add_months(value: date, months: int) -> date:
+    month_index = value.year * 12 + value.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_p{month.year}_{month.month:02d}"
+
+def parse_partition_month(name: str) -> Optional[date]:
+    """conversation_history_p2025_10 -> date(2025, 10, 1)"""
+    prefix = f"{PARENT_TABLE}_p"
+    if not name.startswith(prefix):
+        return None
+    try:
+        year, month = name[len(prefix):].split("_")
+        return date(int(year), int(month), 1)
+    except ValueError:
+        return None
+
+async def create_month_partition(conn: AsyncConnection, month: date):
+    await conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} "
+        f"PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    ))
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    result = await conn.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :name"),
+        {"name": PARENT_TABLE}
+    )
+    return result.scalar() == "p"
+
+async def ensure_partitions(
+    conn: AsyncConnection,
+    months_ahead: int = 3,
+    since: Optional[date] = None
+):
+    """Создание DEFAULT-секции и месячных секций до now + months_ahead"""
+    if not await is_partitioned(conn):
+        logger.warning(
+            f"{PARENT_TABLE} is not partitioned, run scripts/migrate_partition_history.py"
+        )
+        return
+    
+    await conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"
+    ))
+
+    current = month_start(since or date.today())
+    last = add_months(month_start(date.today()), months_ahead)
+    while current <= last:
+        await create_month_partition(conn, current)
+        current = add_months(current, 1)
+
+async def list_partitions(conn: AsyncConnection) -> List[Tuple[str, date]]:
+    result = await conn.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+        JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+        WHERE parent.relname = :parent
+    """), {"parent": PARENT_TABLE})
+
+    partitions = []
+    for (name,) in result:
+        month = parse_partition_month(name)
+        if month:
+            partitions.append((name, month))
+    return sorted(partitions, key=lambda item: item[1])
+
+async def archive_partition(conn: AsyncConnection, name: str, archive_dir: str) -> str:
+    """Выгрузка секции в CSV через COPY перед удалением"""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv")
+    raw_connection = await conn.get_raw_connection()
+    await raw_connection.driver_connection.copy_from_table(
+        name, output=path, format="csv", header=True
+    )
+    return path
+
+async def subtract_chat_stats(conn: AsyncConnection, source: str, params: Optional[dict] = None) -> List[int]:
+    """Вычитание из chat_stats сообщений, которые сейчас будут удалены.
+
+    source - удаляемые строки: секция или «секция WHERE ...». Возвращает
+    затронутые чаты для refresh_chat_stats после удаления.
+    """
+    result = await conn.execute(text(f"""
+        WITH removed AS (
+            SELECT chat_id, count(*) AS messages, coalesce(sum(length(bot_response)), 0) AS chars
+            FROM {source}
+            GROUP BY chat_id
+        )
+        UPDATE {STATS_TABLE} AS stats SET
+            message_count = stats.message_count - removed.messages,
+            total_response_chars = stats.total_response_chars - removed.chars,
+            updated_at = now()
+        FROM removed
+        WHERE stats.chat_id = removed.chat_id
+        RETURNING stats.chat_id
+    """), params or {})
+    return [chat_id for (chat_id,) in result]
+
+async def refresh_chat_stats(conn: AsyncConnection, chat_ids: List[int]):
+    """Границы переписки по оставшимся строкам; чаты без истории удаляются, как после rebuild()"""
+    if not chat_ids:
+        return
+    await conn.execute(text(f"""
+        UPDATE {STATS_TABLE} AS stats SET
+            first_message_at = bounds.first_message_at,
+            last_message_at = bounds.last_message_at
+        FROM (
+            SELECT chat_id, min(timestamp) AS first_message_at, max(timestamp) AS last_message_at
+            FROM {PARENT_TABLE}
+            WHERE chat_id = ANY(:chat_ids)
+            GROUP BY chat_id
+        ) AS bounds
+        WHERE stats.chat_id = bounds.chat_id
+    """), {"chat_ids": chat_ids})
+    await conn.execute(text(f"""
+        DELETE FROM {STATS_TABLE}
+        WHERE chat_id = ANY(:chat_ids)
+          AND NOT EXISTS (SELECT 1 FROM {PARENT_TABLE} WHERE {PARENT_TABLE}.chat_id = {STATS_TABLE}.chat_id)
+    """), {"chat_ids": chat_ids})
+
+async def drop_partitions_before(
+    cutoff: datetime,
+    archive_dir: Optional[str] = None
+) -> List[str]:
+    """Удаление целых месячных секций, полностью лежащих раньше cutoff.
+
+    Секция, в которую попадает cutoff, остается до следующего месяца.
+    Сообщения удаляемых секций вычитаются из chat_stats в той же
+    транзакции, что и удаление.
+    """
+    dropped = []
+    async with engine.connect() as conn:
+        partitions = await list_partitions(conn)
+        await conn.commit()
+        
+        for name, month in partitions:
+            if add_months(month, 1) > cutoff.date():
+                continue
+
+            async with conn.begin():
+                if archive_dir:
+                    path = await archive_partition(conn, name, archive_dir)
+                    logger.info(f"Partition {name} archived to {path}")
+                chat_ids = await subtract_chat_stats(conn, name)
+                await conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+                await conn.execute(text(f"DROP TABLE {name}"))
+                await refresh_chat_stats(conn, chat_ids)
+            dropped.append(name)
+            logger.info(f"Partition {name} dropped")
+
+        async with conn.begin():
+            chat_ids = await subtract_chat_stats(
+                conn, f"{DEFAULT_PARTITION} WHERE timestamp < :cutoff", {"cutoff": cutoff}
+            )
+            await conn.execute(
+                text(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < :cutoff"),
+                {"cutoff": cutoff}
+            )
+            await refresh_chat_stats(conn, chat_ids)
+    return dropped
+
+async def partition_maintenance_loop(interval: int = 24 * 3600, months_ahead: int = 3):
+    """Периодическое создание будущих секций (запускается в фоне API)"""
+    while True:
+        try:
+            async with engine.begin() as conn:
+                await ensure_partitions(conn, months_ahead)
+        except Exception as e:
+            logger.error(f"Partition maintenance failed: {e}")
+        await asyncio.sleep(interval)
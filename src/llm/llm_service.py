@@ -1,17 +1,49 @@
+import asyncio
 import logging
 from openai import AsyncOpenAI
 from src.config import settings
-from src.database.models import ConversationHistory
+from src.memory.history_store import history_store
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 logger = logging.getLogger(__name__)
 
+class LLMRequestQueue:
+    """Ограничение одновременных запросов к AI провайдеру с учетом очереди.
+
+    Общий для всех экземпляров LLMService; depth используется
+    admission-контролем бота для сброса нагрузки.
+    """
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.depth = 0
+        self.in_flight = 0
+
+    async def __aenter__(self):
+        self.depth += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.depth -= 1
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {"max_concurrent": self.max_concurrent, "in_flight": self.in_flight, "queued": self.depth}
+
+llm_queue = LLMRequestQueue(settings.ai.max_concurrent_requests)
+
 class LLMService:
     
     def __init__(self):
         self.client = self._create_client()
+        self.history_turns = 3
         logger.info(f"LLMService initialized with provider: {settings.ai.ai_provider}")
     
     def _create_client(self):
@@ -57,20 +89,19 @@ class LLMService:
             system_prompt = self._build_system_prompt(mcp_results)
             
             messages = [{"role": "system", "content": system_prompt}]
-            
-            for msg in history[-6:]:
-                messages.append(msg)
+            messages.extend(history)
             
             messages.append({"role": "user", "content": user_message})
             
             logger.info(f"Отправка запроса к {settings.ai.chat_model}")
             
-            response = await self.client.chat.completions.create(
-                model=settings.ai.chat_model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=1000
-            )
+            async with llm_queue:
+                response = await self.client.chat.completions.create(
+                    model=settings.ai.chat_model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=1000
+                )
             
             result = response.choices[0].message.content
             logger.info(f"Получен ответ длиной {len(result)} символов")
@@ -93,21 +124,17 @@ class LLMService:
         self, 
         chat_id: int, 
         session: AsyncSession,
-        limit: int = 20
+        turns: int = None
     ) -> list:
-        """Получает историю диалога из базы данных"""
+        """Получает последние обмены диалога через общий кэш истории"""
+        turns = turns or self.history_turns
         try:
-            stmt = select(ConversationHistory).where(
-                ConversationHistory.chat_id == chat_id
-            ).order_by(ConversationHistory.timestamp.desc()).limit(limit)
-            
-            result = await session.execute(stmt)
-            messages = result.scalars().all()
+            conversations = await history_store.get_recent(chat_id, turns, session)
             
             history = []
-            for msg in reversed(messages):
-                history.append({"role": "user", "content": msg.user_message})
-                history.append({"role": "assistant", "content": msg.bot_response})
+            for conv in conversations:
+                history.append({"role": "user", "content": conv["user_message"]})
+                history.append({"role": "assistant", "content": conv["bot_response"]})
             
             logger.debug(f"Загружено {len(history)} сообщений из истории для chat_id {chat_id}")
             return history
@@ -137,9 +164,16 @@ class LLMService:
 Используй инструменты когда это необходимо для ответа на вопрос."""
 
         if mcp_results:
-            base_prompt += "\n\nДоступные инструменты поиска:"
+            base_prompt += "\n\nРезультаты инструментов по запросу пользователя:"
             for result in mcp_results:
-                base_prompt += f"\n- {result.get('tool', 'Unknown')}"
+                tool = result.get('tool', 'Unknown')
+                status = result.get('status', 'success')
+                if status == "success":
+                    base_prompt += f"\n\n[{tool}]\n{result.get('result')}"
+                elif status == "timeout":
+                    base_prompt += f"\n\n[{tool}] не ответил вовремя, данных нет - не выдумывай их"
+                else:
+                    base_prompt += f"\n\n[{tool}] ошибка: {result.get('error')}"
         
         return base_prompt
     
@@ -1,10 +1,12 @@
 from datetime import datetime
+import asyncio
+import secrets
 import sys
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent))
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging
@@ -28,11 +30,52 @@ async def lifespan(app: FastAPI):
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
+    
+    from src.database.partitions import partition_maintenance_loop
+    partition_task = asyncio.create_task(partition_maintenance_loop())
+    
+    from src.memory.session_manager import session_manager
+    session_manager.start_cleanup()
+    
+    from src.memory.write_behind import history_writer
+    try:
+        await history_writer.start()
+    except Exception as e:
+        logger.error(f"History write-behind start failed: {e}")
+    
+    from src.monitoring.health_prober import health_prober
+    health_prober.start()
+    
+    from src.candidates.enrichment import candidate_enricher
+    if settings.github.enrich_enabled:
+        candidate_enricher.start()
+    
+    from src.candidates.sheets_sync import candidate_sheet_sync
+    if settings.sheets_sync.enabled:
+        candidate_sheet_sync.start()
+    
+    if settings.telegram.bot_mode in ("webhook", "queue"):
+        from src.bot.telegram_bot import bot_instance
+        try:
+            await bot_instance.start_webhook()
+        except Exception as e:
+            logger.error(f"Telegram webhook start failed: {e}")
         
     yield
     
     logger.info("Shutting down HR Assistant API...")
     
+    if settings.telegram.bot_mode in ("webhook", "queue"):
+        from src.bot.telegram_bot import stop_bot
+        await stop_bot()
+    
+    partition_task.cancel()
+    await session_manager.stop_cleanup()
+    await history_writer.stop()
+    await health_prober.stop()
+    await candidate_enricher.stop()
+    await candidate_sheet_sync.stop()
+    
     from src.mcp.mcp_client import close_mcp_clients
     await close_mcp_clients()
     logger.info("MCP clients closed")
@@ -81,6 +124,32 @@ async def debug_ai():
     
     return debug_info
 
+@app.post(settings.telegram.webhook_path, include_in_schema=False)
+async def telegram_webhook(request: Request):
+    """Прием апдейтов Telegram в режимах BOT_MODE=webhook и queue"""
+    from src.bot.telegram_bot import bot_instance, process_webhook_update
+    
+    if settings.telegram.bot_mode not in ("webhook", "queue") or not bot_instance.is_running:
+        raise HTTPException(status_code=404, detail="Webhook mode is disabled")
+    
+    token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    # compare_digest на str с не-ASCII символами бросает TypeError, поэтому сравниваются байты
+    if not secrets.compare_digest(token.encode(), settings.telegram.webhook_secret.encode()):
+        raise HTTPException(status_code=403, detail="Invalid secret token")
+    
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Update must be a JSON object")
+    if settings.telegram.bot_mode == "queue":
+        from src.bot.update_stream import update_stream
+        await update_stream.publish(payload)
+    else:
+        await process_webhook_update(payload)
+    return {"ok": True}
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.security.allowed_origins,
@@ -116,17 +185,16 @@ async def health_check():
 @app.get("/api/v1/health")
 async def health_check_detailed():
     """Детальный health check"""
-    from src.database.database import check_db_connection
-    from src.mcp.services import check_mcp_services
+    from src.monitoring.health_prober import health_prober
     
-    db_status = await check_db_connection()
-    mcp_status = await check_mcp_services()
+    snapshot = await health_prober.snapshot()
+    db_status = snapshot["checks"]["database"]["ok"]
     
     return {
         "status": "healthy" if db_status else "unhealthy",
         "database": db_status,
-        "mcp_services": mcp_status,
-        "timestamp": datetime.now()
+        "mcp_services": await health_prober.mcp_status(),
+        "timestamp": snapshot["checked_at"]
     }
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode
+import redis.asyncio as redis
+import logging
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+class GitHubResponseCache:
+    """Кэш ответов GitHub API в Redis с условной ревалидацией.
+
+    Запись хранит тело ответа вместе с ETag и Last-Modified. В течение
+    fresh_ttl ответ отдается без запроса, после - запрос уходит с
+    If-None-Match / If-Modified-Since, и 304 (не расходует лимит токена)
+    только продлевает свежесть. Запись живет в Redis stale_ttl, чтобы
+    ревалидация была возможна и для давно не запрошенных профилей.
+    Устаревший ответ подменяет ошибку только при сбое GitHub (сеть, 5xx,
+    лимит запросов); на 404/410 запись удаляется.
+    """
+
+    def __init__(self):
+        self.enabled = settings.github.cache_enabled
+        self.fresh_ttl = settings.github.cache_fresh_ttl
+        self.stale_ttl = settings.github.cache_stale_ttl
+        self.prefix = "github:cache"
+        self._client: Optional[redis.Redis] = None
+        self.counters = {
+            "hits": 0,
+            "revalidated": 0,
+            "misses": 0,
+            "stale_served": 0,
+            "evicted": 0,
+            "errors": 0
+        }
+
+    async def _redis(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.from_url(settings.redis.url, socket_connect_timeout=2)
+        return self._client
+
+    def key(self, url: str, params: Optional[Dict[str, Any]] = None) -> str:
+        query = urlencode(sorted((params or {}).items()))
+        digest = hashlib.sha1(f"{url}?{query}".encode()).hexdigest()
+        return f"{self.prefix}:{digest}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        try:
+            raw = await (await self._redis()).get(key)
+        except Exception as e:
+            self.counters["errors"] += 1
+            logger.warning(f"GitHub cache read failed: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+    async def put(self, key: str, body: Any, etag: Optional[str], last_modified: Optional[str]):
+        if not self.enabled:
+            return
+        entry = {
+            "body": body,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time()
+        }
+        try:
+            await (await self._redis()).set(key, json.dumps(entry), ex=self.stale_ttl)
+        except Exception as e:
+            self.counters["errors"] += 1
+            logger.warning(f"GitHub cache write failed: {e}")
+
+    async def delete(self, key: str):
+        """Удаление записи об удаленном пользователе или репозитории"""
+        if not self.enabled:
+            return
+        self.counters["evicted"] += 1
+        try:
+            await (await self._redis()).delete(key)
+        except Exception as e:
+            self.counters["errors"] += 1
+            logger.warning(f"GitHub cache delete failed: {e}")
+
+    @staticmethod
+    def can_serve_stale(status: Optional[int], rate_limited: bool) -> bool:
+        """Устаревший ответ - только вместо сбоя: сеть (status None), 5xx или лимит запросов"""
+        return status is None or status >= 500 or status == 429 or (status == 403 and rate_limited)
+
+    async def touch(self, key: str, entry: Dict[str, Any]):
+        """Продление свежести после 304"""
+        entry["fetched_at"] = time.time()
+        await self.put(key, entry["body"], entry.get("etag"), entry.get("last_modified"))
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry["fetched_at"] < self.fresh_ttl
+
+    @staticmethod
+    def conditional_headers(entry: Dict[str, Any]) -> Dict[str, str]:
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["revalidated"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round((self.counters["hits"] + self.counters["revalidated"]) / lookups, 4) if lookups else 0.0,
+            "fresh_ttl": self.fresh_ttl
+        }
+
+    async def close(self):
+        if self._client:
+            await self._client.close()
+            self._client = None
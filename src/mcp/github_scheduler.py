@@ -0,0 +1,168 @@
+import asyncio
+import time
+from typing import Dict, List, Mapping, Optional
+import logging
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, BULK)
+
+# X-RateLimit-Resource -> (окно квоты в секундах, лимит с токеном, лимит без токена)
+CORE = "core"
+SEARCH = "search"
+GRAPHQL = "graphql"
+RESOURCES = {
+    CORE: (3600, 5000, 60),
+    SEARCH: (60, 30, 10),
+    GRAPHQL: (3600, 5000, 0)
+}
+
+class TokenState:
+    """Квота одного токена по последним заголовкам X-RateLimit-*"""
+
+    def __init__(self, token: str, resource: str = CORE):
+        self.token = token
+        self.window, limit, anonymous_limit = RESOURCES[resource]
+        self.limit = limit if token else anonymous_limit
+        self.remaining = self.limit
+        self.reset_at = time.time() + self.window
+        self.blocked_until = 0.0
+        self.next_bulk_at = 0.0
+        self.requests = 0
+
+    @property
+    def name(self) -> str:
+        return f"...{self.token[-4:]}" if self.token else "anonymous"
+
+    def bulk_floor(self, reserve: int) -> int:
+        """Резерв не больше половины квоты, иначе при малом лимите (search, без токена) bulk не пойдет никогда"""
+        return min(reserve, self.limit // 2)
+
+    def available_at(self, priority: str, reserve: int) -> float:
+        """Момент, когда токен можно использовать для запроса с данным приоритетом"""
+        now = time.time()
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.window
+        ready = max(now, self.blocked_until)
+        floor = 0 if priority == INTERACTIVE else self.bulk_floor(reserve)
+        if self.remaining <= floor:
+            ready = max(ready, self.reset_at)
+        if priority == BULK:
+            ready = max(ready, self.next_bulk_at)
+        return ready
+
+class GitHubRateScheduler:
+    """Планировщик запросов к GitHub API с учетом лимитов.
+
+    Квота каждого токена берется из заголовков ответов. Интерактивные
+    запросы идут сразу, пока у токена есть квота. Массовые ждут, пока есть
+    интерактивные в очереди, не трогают резерв reserve и равномерно
+    распределяются по окну до X-RateLimit-Reset. Retry-After и вторичные
+    лимиты блокируют токен. При нескольких токенах выбирается тот, что
+    освободится раньше, а при равенстве - с большей оставшейся квотой.
+
+    У каждого ресурса GitHub (core, search, graphql) своя квота, поэтому
+    на ресурс - свой планировщик; заголовки ответа с чужим
+    X-RateLimit-Resource не учитываются.
+    """
+
+    def __init__(self, tokens: Optional[List[str]] = None, resource: str = CORE):
+        tokens = tokens if tokens is not None else settings.github.tokens
+        self.resource = resource
+        self.tokens = [TokenState(token, resource) for token in (tokens or [""])]
+        self.reserve = settings.github.interactive_reserve
+        self._semaphore = asyncio.Semaphore(settings.github.max_concurrent_requests)
+        self._changed = asyncio.Condition()
+        self.waiting: Dict[str, int] = {priority: 0 for priority in PRIORITIES}
+        self.counters = {"throttled": 0, "rate_limited": 0, "retried": 0}
+
+    def _pick(self, priority: str) -> tuple:
+        return min(
+            ((state.available_at(priority, self.reserve), -state.remaining, index)
+             for index, state in enumerate(self.tokens))
+        )
+
+    def wait_time(self, priority: str = INTERACTIVE) -> float:
+        """Сколько секунд ждать ближайшего свободного токена"""
+        return max(self._pick(priority)[0] - time.time(), 0)
+
+    async def acquire(self, priority: str = INTERACTIVE) -> TokenState:
+        """Ожидание разрешения на запрос; возвращает токен, от имени которого его делать"""
+        priority = priority if priority in PRIORITIES else INTERACTIVE
+        self.waiting[priority] += 1
+        throttled = False
+        try:
+            async with self._changed:
+                while True:
+                    ready_at, _, index = self._pick(priority)
+                    delay = ready_at - time.time()
+                    if priority == BULK and self.waiting[INTERACTIVE]:
+                        delay = max(delay, 0.05)
+                    if delay <= 0:
+                        break
+                    throttled = True
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), timeout=min(delay, 60))
+                    except asyncio.TimeoutError:
+                        pass
+
+                state = self.tokens[index]
+                state.remaining = max(state.remaining - 1, 0)
+                state.requests += 1
+                if priority == BULK:
+                    budget = max(state.remaining - state.bulk_floor(self.reserve), 1)
+                    state.next_bulk_at = time.time() + max(state.reset_at - time.time(), 0) / budget
+        finally:
+            self.waiting[priority] -= 1
+        if throttled:
+            self.counters["throttled"] += 1
+        await self._semaphore.acquire()
+        return state
+
+    async def release(self, state: TokenState, status: Optional[int], headers: Mapping[str, str]) -> float:
+        """Учет ответа; возвращает паузу перед повтором, если ответ - лимит (иначе 0)"""
+        self._semaphore.release()
+        retry_after = 0.0
+        now = time.time()
+
+        if "X-RateLimit-Remaining" in headers and headers.get("X-RateLimit-Resource", self.resource) == self.resource:
+            state.remaining = int(headers["X-RateLimit-Remaining"])
+            state.limit = int(headers.get("X-RateLimit-Limit", state.limit))
+            state.reset_at = float(headers.get("X-RateLimit-Reset", state.reset_at))
+
+        if status in (403, 429):
+            if "Retry-After" in headers:
+                retry_after = float(headers["Retry-After"])
+            elif state.remaining == 0:
+                retry_after = max(state.reset_at - now, 1)
+            if retry_after:
+                state.blocked_until = now + retry_after
+                self.counters["rate_limited"] += 1
+                logger.warning(f"GitHub rate limit on token {state.name}, blocked for {retry_after:.0f}s")
+
+        async with self._changed:
+            self._changed.notify_all()
+        return retry_after
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "resource": self.resource,
+            "waiting": dict(self.waiting),
+            "tokens": [
+                {
+                    "token": state.name,
+                    "remaining": state.remaining,
+                    "limit": state.limit,
+                    "reset_in": max(round(state.reset_at - time.time()), 0),
+                    "blocked_for": max(round(state.blocked_until - time.time()), 0),
+                    "requests": state.requests
+                }
+                for state in self.tokens
+            ]
+        }
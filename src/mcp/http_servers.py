@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Any
@@ -15,13 +16,34 @@ class ToolCallResponse(BaseModel):
     data: Any = None
     error: str = None
 
-app_github = FastAPI(title="GitHub MCP Server")
+def pooled_lifespan(service):
+    """Открытие общей HTTP-сессии сервиса на старте приложения и закрытие на остановке"""
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await service.start()
+        yield
+        await service.close()
+    return lifespan
+
 github_service = GitHubService()
+app_github = FastAPI(title="GitHub MCP Server", lifespan=pooled_lifespan(github_service))
 
 @app_github.get("/health")
 async def health():
     return {"status": "healthy"}
 
+@app_github.get("/cache/stats")
+async def cache_stats():
+    return github_service.cache.stats()
+
+@app_github.get("/rate-limit")
+async def rate_limit_stats():
+    return {
+        "rest": github_service.scheduler.stats(),
+        "search": github_service.search_scheduler.stats(),
+        "graphql": github_service.graphql_scheduler.stats()
+    }
+
 @app_github.get("/tools")
 async def list_tools():
     return [
@@ -30,7 +52,10 @@ async def list_tools():
             "description": "Get GitHub user profile information",
             "inputSchema": {
                 "type": "object",
-                "properties": {"username": {"type": "string"}},
+                "properties": {
+                    "username": {"type": "string"},
+                    "priority": {"type": "string", "enum": ["interactive", "bulk"]}
+                },
                 "required": ["username"]
             }
         },
@@ -42,21 +67,36 @@ async def list_tools():
                 "properties": {
                     "query": {"type": "string"},
                     "language": {"type": "string"},
-                    "sort": {"type": "string", "enum": ["stars", "forks", "updated"]}
+                    "sort": {"type": "string", "enum": ["stars", "forks", "updated"]},
+                    "priority": {"type": "string", "enum": ["interactive", "bulk"]}
                 },
                 "required": ["query"]
             }
+        },
+        {
+            "name": "bulk_user_profiles",
+            "description": "Get profiles, top repositories, languages and contributions for many GitHub users at once",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "usernames": {"type": "array", "items": {"type": "string"}},
+                    "priority": {"type": "string", "enum": ["interactive", "bulk"]}
+                },
+                "required": ["usernames"]
+            }
         }
     ]
 
 @app_github.post("/tools/call")
 async def call_tool(request: ToolCallRequest):
     try:
+        # Массовый анализ кандидатов передает priority=bulk и пропускает интерактивные запросы вперед
+        priority = request.arguments.get("priority", "interactive")
         if request.name == "get_user_profile":
             username = request.arguments.get("username")
             if not username:
                 return ToolCallResponse(status="error", error="Missing required parameter: username")
-            result = await github_service.get_user_profile(username)
+            result = await github_service.get_user_profile(username, priority=priority)
             return ToolCallResponse(status="success", data=result)
             
         elif request.name == "search_repositories":
@@ -65,7 +105,16 @@ async def call_tool(request: ToolCallRequest):
                 return ToolCallResponse(status="error", error="Missing required parameter: query")
             language = request.arguments.get("language")
             sort = request.arguments.get("sort", "stars")
-            result = await github_service.search_repositories(query, language, sort)
+            result = await github_service.search_repositories(query, language, sort, priority=priority)
+            return ToolCallResponse(status="success", data=result)
+            
+        elif request.name == "bulk_user_profiles":
+            usernames = request.arguments.get("usernames")
+            if not usernames:
+                return ToolCallResponse(status="error", error="Missing required parameter: usernames")
+            result = await github_service.bulk_user_profiles(
+                usernames, priority=request.arguments.get("priority", "bulk")
+            )
             return ToolCallResponse(status="success", data=result)
         else:
             return ToolCallResponse(status="error", error=f"Unknown tool: {request.name}")
@@ -73,13 +122,20 @@ async def call_tool(request: ToolCallRequest):
         logger.error(f"GitHub tool error: {e}")
         return ToolCallResponse(status="error", error=str(e))
 
-app_web_search = FastAPI(title="Web Search MCP Server")
 web_search_service = WebSearchService()
+app_web_search = FastAPI(title="Web Search MCP Server", lifespan=pooled_lifespan(web_search_service))
 
 @app_web_search.get("/health")
 async def health():
     return {"status": "healthy"}
 
+@app_web_search.get("/cache/stats")
+async def search_cache_stats():
+    return {
+        **web_search_service.cache.stats(),
+        "pages": web_search_service.pages.stats()
+    }
+
 @app_web_search.get("/tools")
 async def list_tools():
     return [
@@ -90,7 +146,8 @@ async def list_tools():
                 "type": "object",
                 "properties": {
                     "query": {"type": "string"},
-                    "num_results": {"type": "integer", "minimum": 1, "maximum": 10}
+                    "num_results": {"type": "integer", "minimum": 1, "maximum": 10},
+                    "deep": {"type": "boolean", "description": "Also fetch and extract text of top result pages"}
                 },
                 "required": ["query"]
             }
@@ -105,7 +162,9 @@ async def call_tool(request: ToolCallRequest):
             if not query:
                 return ToolCallResponse(status="error", error="Missing required parameter: query")
             num_results = request.arguments.get("num_results", 3)
-            result = await web_search_service.search(query, num_results)
+            result = await web_search_service.search(
+                query, num_results, deep=bool(request.arguments.get("deep", False))
+            )
             return ToolCallResponse(status="success", data=result)
         else:
             return ToolCallResponse(status="error", error=f"Unknown tool: {request.name}")
@@ -113,13 +172,17 @@ async def call_tool(request: ToolCallRequest):
         logger.error(f"Web search tool error: {e}")
         return ToolCallResponse(status="error", error=str(e))
 
-app_sheets = FastAPI(title="Google Sheets MCP Server")
 sheets_service = GoogleSheetsService()
+app_sheets = FastAPI(title="Google Sheets MCP Server", lifespan=pooled_lifespan(sheets_service))
 
 @app_sheets.get("/health")
 async def health():
     return {"status": "healthy"}
 
+@app_sheets.get("/stats")
+async def sheets_stats():
+    return sheets_service.stats()
+
 @app_sheets.get("/tools")
 async def list_tools():
     return [
@@ -147,6 +210,41 @@ async def list_tools():
                 },
                 "required": ["spreadsheet_id", "range_name", "values"]
             }
+        },
+        {
+            "name": "batch_read",
+            "description": "Read several ranges from Google Sheets in one request",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "spreadsheet_id": {"type": "string"},
+                    "ranges": {"type": "array", "items": {"type": "string"}}
+                },
+                "required": ["spreadsheet_id", "ranges"]
+            }
+        },
+        {
+            "name": "batch_update",
+            "description": "Update several ranges in Google Sheets in one request",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "spreadsheet_id": {"type": "string"},
+                    "data": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "range": {"type": "string"},
+                                "values": {"type": "array", "items": {"type": "array"}}
+                            },
+                            "required": ["range", "values"]
+                        }
+                    },
+                    "value_input_option": {"type": "string", "enum": ["RAW", "USER_ENTERED"]}
+                },
+                "required": ["spreadsheet_id", "data"]
+            }
         }
     ]
 
@@ -195,6 +293,44 @@ async def call_tool(request: ToolCallRequest):
             result = await sheets_service.update_spreadsheet(spreadsheet_id, range_name, values)
             return ToolCallResponse(status="success", data=result)
             
+        elif request.name == "batch_read":
+            spreadsheet_id = request.arguments.get("spreadsheet_id")
+            ranges = request.arguments.get("ranges")
+            
+            if not spreadsheet_id:
+                return ToolCallResponse(
+                    status="error", 
+                    error="Missing required parameter: spreadsheet_id"
+                )
+            if not ranges:
+                return ToolCallResponse(
+                    status="error", 
+                    error="Missing required parameter: ranges"
+                )
+                
+            result = await sheets_service.batch_read(spreadsheet_id, ranges)
+            return ToolCallResponse(status="success", data=result)
+            
+        elif request.name == "batch_update":
+            spreadsheet_id = request.arguments.get("spreadsheet_id")
+            data = request.arguments.get("data")
+            
+            if not spreadsheet_id:
+                return ToolCallResponse(
+                    status="error", 
+                    error="Missing required parameter: spreadsheet_id"
+                )
+            if not data or any("range" not in item or "values" not in item for item in data):
+                return ToolCallResponse(
+                    status="error", 
+                    error="Missing required parameter: data (list of {range, values})"
+                )
+                
+            result = await sheets_service.batch_update(
+                spreadsheet_id, data, request.arguments.get("value_input_option", "USER_ENTERED")
+            )
+            return ToolCallResponse(status="success", data=result)
+            
         else:
             return ToolCallResponse(status="error", error=f"Unknown tool: {request.name}")
     except Exception as e:
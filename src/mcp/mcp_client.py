@@ -1,7 +1,8 @@
 import asyncio
+import time
 import aiohttp
 from tenacity import retry, stop_after_attempt, wait_exponential
-from typing import Dict, Any, List, Optional
+from typing import Awaitable, Dict, Any, List, Optional
 import logging
 from src.config import settings
 
@@ -31,13 +32,13 @@ class BaseMCPClient:
             self.session = aiohttp.ClientSession(timeout=self.timeout)
     
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    async def _make_request(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def _make_request(self, endpoint: str, data: Dict[str, Any], timeout: float = 10) -> Dict[str, Any]:
         await self._ensure_session()
         
         url = f"{self.base_url}/{endpoint}"
         
         try:
-            async with asyncio.timeout(10):
+            async with asyncio.timeout(timeout):
                 async with self.session.post(
                     url,
                     json=data,
@@ -73,11 +74,11 @@ class BaseMCPClient:
                 "error": f"Unexpected error: {str(e)}"
             }
     
-    async def call_tool(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    async def call_tool(self, name: str, arguments: Dict[str, Any], timeout: float = 10) -> Dict[str, Any]:
         return await self._make_request("tools/call", {
             "name": name,
             "arguments": arguments
-        })
+        }, timeout=timeout)
     
     async def close(self):
         if self.session:
@@ -120,13 +121,23 @@ class GitHubClient(BaseMCPClient):
                     formatted += f"   ⭐ Stars: {repo.get('stargazers_count', 0)}\n\n"
                 return formatted.strip()
         return f"❌ GitHub Search Error: {result.get('error', 'Unknown error')}"
+    
+    async def bulk_user_profiles(self, usernames: List[str], timeout: float = 300) -> Dict[str, Any]:
+        """Сырые профили для обогащения кандидатов: {"data": {login: профиль | None}, "failed": [...]}"""
+        result = await self.call_tool(
+            "bulk_user_profiles", {"usernames": usernames, "priority": "bulk"}, timeout=timeout
+        )
+        if result.get("status") == "success" and isinstance(result.get("data"), dict):
+            return result["data"]
+        return {"status": "error", "data": {}, "failed": usernames, "error": result.get("error")}
 
 class WebSearchClient(BaseMCPClient):
     
-    async def search_web(self, query: str, num_results: int = 3) -> str:
+    async def search_web(self, query: str, num_results: int = 3, deep: bool = False) -> str:
         result = await self.call_tool("search_web", {
             "query": query,
-            "num_results": num_results
+            "num_results": num_results,
+            "deep": deep
         })
         
         if result.get("status") == "success" and "data" in result:
@@ -145,6 +156,9 @@ class WebSearchClient(BaseMCPClient):
                     
                     formatted += f"{i}. **{title}**\n"
                     formatted += f"   {snippet}\n\n"
+                
+                for page in data.get("deep", {}).get("pages", []):
+                    formatted += f"📄 {page.get('title') or page['url']} ({page['url']}):\n{page['content']}\n\n"
                 return formatted.strip()
         return f"❌ Search Error: {result.get('error', 'Unknown error')}"
 
@@ -168,9 +182,64 @@ class GoogleSheetsClient(BaseMCPClient):
                     formatted += f"Row {i+1}: {', '.join(str(cell) for cell in row)}\n"
                 return formatted.strip()
         return f"❌ Sheets Error: {result.get('error', 'Unknown error')}"
+    
+    async def batch_read(self, spreadsheet_id: str, ranges: List[str], timeout: float = 60) -> Dict[str, Any]:
+        """Сырые значения диапазонов: {"status": ..., "data": {диапазон: строки}}"""
+        result = await self.call_tool(
+            "batch_read", {"spreadsheet_id": spreadsheet_id, "ranges": ranges}, timeout=timeout
+        )
+        if result.get("status") == "success" and isinstance(result.get("data"), dict):
+            return result["data"]
+        return {"status": "error", "message": result.get("error", "Unknown error")}
+    
+    async def batch_update(self, spreadsheet_id: str, data: List[Dict[str, Any]], timeout: float = 60) -> Dict[str, Any]:
+        result = await self.call_tool(
+            "batch_update", {"spreadsheet_id": spreadsheet_id, "data": data}, timeout=timeout
+        )
+        if result.get("status") == "success" and isinstance(result.get("data"), dict):
+            return result["data"]
+        return {"status": "error", "message": result.get("error", "Unknown error")}
 
 mcp_client = MCPClient()
 
+async def run_tools(
+    calls: Dict[str, Awaitable[Any]],
+    deadline: Optional[float] = None,
+    budgets: Optional[Dict[str, float]] = None
+) -> List[Dict[str, Any]]:
+    """Параллельный вызов инструментов с общим дедлайном и бюджетом на каждый.
+
+    Все вызовы стартуют одновременно, поэтому общее время не больше
+    deadline. Инструмент, не уложившийся в свой бюджет, отменяется и
+    попадает в результат со статусом timeout, остальные не ждут его.
+    """
+    deadline = deadline if deadline is not None else settings.mcp.tools_deadline
+    budgets = budgets if budgets is not None else settings.mcp.tool_budgets
+
+    async def run(tool: str, call: Awaitable[Any]) -> Dict[str, Any]:
+        budget = min(budgets.get(tool, deadline), deadline)
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(budget):
+                result = await call
+            status, error = "success", None
+        except TimeoutError:
+            result, status, error = None, "timeout", f"No response within {budget:.1f}s"
+            logger.warning(f"MCP tool {tool} timed out after {budget:.1f}s")
+        except Exception as e:
+            result, status, error = None, "error", str(e)
+            logger.error(f"MCP tool {tool} failed: {e}")
+
+        return {
+            "tool": tool,
+            "status": status,
+            "result": result,
+            "error": error,
+            "elapsed_ms": round((time.monotonic() - started) * 1000, 1)
+        }
+
+    return list(await asyncio.gather(*(run(tool, call) for tool, call in calls.items())))
+
 async def close_mcp_clients():
     await mcp_client.github.close()
     await mcp_client.web_search.close() 
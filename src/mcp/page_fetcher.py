@@ -0,0 +1,249 @@
+import asyncio
+import codecs
+import hashlib
+import re
+import time
+from contextlib import asynccontextmanager
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+import aiohttp
+import logging
+
+from src.config import settings
+from src.mcp.search_cache import SearchResultCache
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (compatible; HRAssistantBot/1.0)"
+SKIP_TAGS = frozenset([
+    "script", "style", "noscript", "template", "svg", "nav", "header", "footer", "aside",
+    "form", "iframe", "button", "select", "canvas"
+])
+BLOCK_TAGS = frozenset([
+    "p", "div", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "td", "th", "br",
+    "section", "article", "main", "blockquote", "pre", "dd", "dt", "table", "figcaption"
+])
+MAIN_TAGS = frozenset(["article", "main"])
+MIN_PARAGRAPH_CHARS = 40
+MIN_MAIN_CHARS = 300
+CHARS_PER_TOKEN = 3
+WHITESPACE = re.compile(r"\s+")
+
+class MainTextParser(HTMLParser):
+    """Потоковое извлечение основного текста: блоки вне служебных тегов.
+
+    Текст внутри <article>/<main> собирается отдельно и, если его
+    достаточно, заменяет текст всей страницы - так отсекаются меню,
+    списки ссылок и прочий шаблон. Короткие блоки (подписи, кнопки)
+    отбрасываются.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self._in_title = False
+        self._skip_depth = 0
+        self._main_depth = 0
+        self._buffer: List[str] = []
+        self._buffer_in_main = False
+        self.paragraphs: List[str] = []
+        self.main_paragraphs: List[str] = []
+
+    def _flush(self):
+        text = WHITESPACE.sub(" ", "".join(self._buffer)).strip()
+        self._buffer = []
+        if len(text) >= MIN_PARAGRAPH_CHARS:
+            self.paragraphs.append(text)
+            if self._buffer_in_main:
+                self.main_paragraphs.append(text)
+        self._buffer_in_main = self._main_depth > 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        if tag in BLOCK_TAGS:
+            self._flush()
+        if tag in MAIN_TAGS:
+            self._main_depth += 1
+            self._buffer_in_main = True
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag == "title":
+            self._in_title = False
+        if tag in MAIN_TAGS and self._main_depth:
+            self._main_depth -= 1
+        if tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skip_depth:
+            self._buffer.append(data)
+
+    def result(self) -> Dict[str, Any]:
+        self._flush()
+        main_chars = sum(len(paragraph) for paragraph in self.main_paragraphs)
+        return {
+            "title": WHITESPACE.sub(" ", self.title).strip(),
+            "paragraphs": self.main_paragraphs if main_chars >= MIN_MAIN_CHARS else self.paragraphs
+        }
+
+class PageFetcher:
+    """Одновременная загрузка страниц результатов поиска для глубокого режима.
+
+    Общее число загрузок ограничено concurrency, к одному хосту -
+    per_host (вежливость к сайтам). Тело читается потоком и парсится на
+    лету не больше max_bytes, каждая страница - не дольше page_timeout.
+    Семафор хоста живет, пока к хосту есть загрузки, и затем удаляется.
+    Извлеченный текст кэшируется по URL. compose убирает повторяющиеся
+    абзацы и делит бюджет токенов между страницами по порядку выдачи.
+    """
+
+    def __init__(self, cache: SearchResultCache):
+        config = settings.web_search
+        self.cache = cache
+        self.max_bytes = config.deep_max_bytes
+        self.page_timeout = config.deep_page_timeout
+        self.per_host = config.deep_per_host
+        self._semaphore = asyncio.Semaphore(config.deep_concurrency)
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._host_users: Dict[str, int] = {}
+        self.counters = {"fetched": 0, "cached": 0, "failed": 0, "truncated": 0, "bytes": 0}
+
+    def _decoder(self, charset: Optional[str]):
+        try:
+            return codecs.getincrementaldecoder(charset or "utf-8")(errors="replace")
+        except LookupError:
+            return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    @asynccontextmanager
+    async def _host_slot(self, host: str):
+        """Слот хоста; семафор удаляется вместе с последним его пользователем"""
+        semaphore = self._hosts.setdefault(host, asyncio.Semaphore(self.per_host))
+        self._host_users[host] = self._host_users.get(host, 0) + 1
+        try:
+            async with semaphore:
+                yield
+        finally:
+            self._host_users[host] -= 1
+            if not self._host_users[host]:
+                del self._host_users[host]
+                self._hosts.pop(host, None)
+
+    async def _download(self, session: aiohttp.ClientSession, url: str) -> Dict[str, Any]:
+        async with session.get(url, headers={"User-Agent": USER_AGENT, "Accept": "text/html"}) as response:
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}")
+            if "html" not in response.content_type:
+                raise RuntimeError(f"unsupported content type {response.content_type}")
+
+            parser = MainTextParser()
+            decoder = self._decoder(response.charset)
+            received = 0
+            async for chunk in response.content.iter_chunked(16 * 1024):
+                chunk = chunk[:self.max_bytes - received]
+                received += len(chunk)
+                parser.feed(decoder.decode(chunk))
+                if received >= self.max_bytes:
+                    self.counters["truncated"] += 1
+                    break
+            parser.feed(decoder.decode(b"", final=True))
+            self.counters["bytes"] += received
+            return parser.result()
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str) -> Dict[str, Any]:
+        page = await self.cache.get_page(url)
+        if page:
+            self.counters["cached"] += 1
+            return {"url": url, **page, "cache": "hit", "elapsed_ms": 0.0}
+
+        host = urlsplit(url).hostname or ""
+        started = time.monotonic()
+        try:
+            async with self._semaphore, self._host_slot(host):
+                async with asyncio.timeout(self.page_timeout):
+                    page = await self._download(session, url)
+        except TimeoutError:
+            self.counters["failed"] += 1
+            return {"url": url, "error": f"timeout after {self.page_timeout}s"}
+        except Exception as e:
+            self.counters["failed"] += 1
+            return {"url": url, "error": str(e) or e.__class__.__name__}
+
+        self.counters["fetched"] += 1
+        await self.cache.put_page(url, page)
+        return {"url": url, **page, "cache": "miss", "elapsed_ms": round((time.monotonic() - started) * 1000, 1)}
+
+    @staticmethod
+    def compose(pages: List[Dict[str, Any]], token_budget: int) -> List[Dict[str, Any]]:
+        """Текст страниц без повторов в пределах token_budget (примерно CHARS_PER_TOKEN символов на токен)"""
+        seen = set()
+        usable = [page for page in pages if page.get("paragraphs")]
+        budget = token_budget * CHARS_PER_TOKEN
+        composed = []
+        for index, page in enumerate(usable):
+            # Свою долю получает каждая страница, неиспользованное переходит следующим
+            share = budget // (len(usable) - index)
+            parts, used = [], 0
+            for paragraph in page["paragraphs"]:
+                digest = hashlib.sha1(paragraph.casefold().encode()).digest()
+                if digest in seen:
+                    continue
+                seen.add(digest)
+                if used + len(paragraph) > share:
+                    if share - used >= MIN_PARAGRAPH_CHARS:
+                        parts.append(paragraph[:share - used].rsplit(" ", 1)[0] + "…")
+                        used = share
+                    break
+                parts.append(paragraph)
+                used += len(paragraph) + 1
+            budget -= used
+            if parts:
+                content = "\n".join(parts)
+                composed.append({
+                    "url": page["url"],
+                    "title": page.get("title", ""),
+                    "content": content,
+                    "tokens": len(content) // CHARS_PER_TOKEN,
+                    "cache": page["cache"],
+                    "elapsed_ms": page["elapsed_ms"]
+                })
+        return composed
+
+    async def fetch_pages(
+        self,
+        session: aiohttp.ClientSession,
+        urls: List[str],
+        token_budget: int,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Загрузка страниц; по истечении timeout возвращается то, что успело загрузиться"""
+        started = time.monotonic()
+        tasks = [asyncio.create_task(self.fetch(session, url)) for url in urls]
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        pages = [
+            task.result() if not task.cancelled() else {"url": url, "error": "deep search deadline exceeded"}
+            for url, task in zip(urls, tasks)
+        ]
+        return {
+            "pages": self.compose(pages, token_budget),
+            "failed": [{"url": page["url"], "error": page["error"]} for page in pages if page.get("error")],
+            "elapsed_ms": round((time.monotonic() - started) * 1000, 1)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "hosts": len(self._hosts)}
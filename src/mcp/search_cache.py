@@ -0,0 +1,121 @@
+import hashlib
+import json
+import re
+import time
+from typing import Any, Dict, Optional
+import redis.asyncio as redis
+import logging
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+STOP_WORDS = frozenset([
+    "и", "в", "во", "на", "по", "о", "об", "про", "для", "с", "со", "к", "ко", "из", "от", "до", "за",
+    "у", "а", "но", "или", "ли", "же", "как", "что", "это", "какая", "какой", "какие", "сколько",
+    "the", "a", "an", "of", "in", "on", "for", "to", "and", "or", "is", "are", "what", "how",
+])
+TOKEN_PATTERN = re.compile(r"[\w+#.-]+")
+WHITESPACE = re.compile(r"\s+")
+
+def normalize_query(query: str) -> str:
+    """Ключ запроса: регистр, ё/е, без стоп-слов и пунктуации, токены по алфавиту.
+
+    «Средняя зарплата Python-developer» и «python-developer средняя зарплата?»
+    дают один ключ. Символы + # . - внутри токена сохраняются (c++, c#, node.js).
+    Запрос только из стоп-слов («что это») ключом служит целиком, иначе
+    все такие запросы делили бы один пустой ключ.
+    """
+    folded = query.casefold().replace("ё", "е")
+    tokens = {token.strip(".-") for token in TOKEN_PATTERN.findall(folded)}
+    normalized = " ".join(sorted(token for token in tokens if token and token not in STOP_WORDS))
+    return normalized or WHITESPACE.sub(" ", folded).strip()
+
+class SearchResultCache:
+    """Кэш результатов веб-поиска в Redis по нормализованному запросу.
+
+    В течение ttl ответ свежий; после - до stale_ttl отдается устаревший
+    ответ, а обновление идет в фоне (stale-while-revalidate). Ошибки
+    провайдера не кэшируются. При недоступности Redis кэш пропускается.
+    """
+
+    def __init__(self):
+        self.enabled = settings.web_search.cache_enabled
+        self.ttl = settings.web_search.cache_ttl
+        self.stale_ttl = settings.web_search.cache_stale_ttl
+        self.prefix = "search:cache"
+        self._client: Optional[redis.Redis] = None
+        self.counters = {
+            "hits": 0,
+            "stale_served": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "errors": 0
+        }
+
+    async def _redis(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.from_url(settings.redis.url, socket_connect_timeout=2)
+        return self._client
+
+    def key(self, query: str) -> str:
+        digest = hashlib.sha1(normalize_query(query).encode()).hexdigest()
+        return f"{self.prefix}:{digest}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        try:
+            raw = await (await self._redis()).get(key)
+        except Exception as e:
+            self.counters["errors"] += 1
+            logger.warning(f"Search cache read failed: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+    async def put(self, key: str, entry: Dict[str, Any]):
+        if not self.enabled:
+            return
+        try:
+            await (await self._redis()).set(key, json.dumps(entry), ex=self.ttl + self.stale_ttl)
+        except Exception as e:
+            self.counters["errors"] += 1
+            logger.warning(f"Search cache write failed: {e}")
+
+    def page_key(self, url: str) -> str:
+        return f"search:page:{hashlib.sha1(url.encode()).hexdigest()}"
+
+    async def get_page(self, url: str) -> Optional[Dict[str, Any]]:
+        """Извлеченный текст страницы для глубокого поиска"""
+        return await self.get(self.page_key(url))
+
+    async def put_page(self, url: str, page: Dict[str, Any]):
+        if not self.enabled:
+            return
+        try:
+            await (await self._redis()).set(
+                self.page_key(url), json.dumps(page), ex=settings.web_search.deep_content_ttl
+            )
+        except Exception as e:
+            self.counters["errors"] += 1
+            logger.warning(f"Search cache write failed: {e}")
+
+    def age(self, entry: Dict[str, Any]) -> float:
+        return time.time() - entry["fetched_at"]
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return self.age(entry) < self.ttl
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["stale_served"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round((self.counters["hits"] + self.counters["stale_served"]) / lookups, 4) if lookups else 0.0,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl
+        }
+
+    async def close(self):
+        if self._client:
+            await self._client.close()
+            self._client = None
@@ -1,51 +1,217 @@
+import asyncio
 import os
+import re
+import threading
+import time
 import aiohttp
 import gspread
 import logging
 import ssl
-from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from html import unescape
+from urllib.parse import parse_qs, urlsplit
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from src.config import settings
+from src.mcp.github_cache import GitHubResponseCache
+from src.mcp.github_scheduler import GitHubRateScheduler, BULK, INTERACTIVE, CORE, SEARCH, GRAPHQL
+from src.mcp.page_fetcher import PageFetcher, USER_AGENT
+from src.mcp.search_cache import SearchResultCache
 
 logger = logging.getLogger(__name__)
 
+RESULT_LINK_PATTERN = re.compile(r'class="result__a"[^>]*href="([^"]+)"')
+
+GRAPHQL_USER_FIELDS = """
+fragment CandidateProfile on User {
+  login
+  name
+  company
+  location
+  bio
+  email
+  websiteUrl
+  isHireable
+  createdAt
+  followers { totalCount }
+  repositories(first: 10, ownerAffiliations: OWNER, isFork: false, privacy: PUBLIC,
+               orderBy: {field: STARGAZERS, direction: DESC}) {
+    totalCount
+    nodes {
+      name
+      url
+      description
+      stargazerCount
+      forkCount
+      pushedAt
+      primaryLanguage { name }
+      languages(first: 5, orderBy: {field: SIZE, direction: DESC}) {
+        edges { size node { name } }
+      }
+    }
+  }
+  contributionsCollection {
+    totalCommitContributions
+    totalPullRequestContributions
+    totalPullRequestReviewContributions
+    totalIssueContributions
+    contributionCalendar { totalContributions }
+  }
+}
+"""
+
 ssl_context = ssl.create_default_context()
 ssl_context.check_hostname = False
 ssl_context.verify_mode = ssl.CERT_NONE
 
+class PooledHTTPService:
+    """Базовый класс сервиса с одной долгоживущей aiohttp-сессией на upstream.
+
+    Сессия создается на старте приложения (start) и переиспользует
+    соединения: DNS кэшируется, TCP/TLS поднимаются один раз и живут
+    keep-alive. Если start не вызывали (скрипты), сессия создается лениво.
+    """
+
+    ssl = None
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=settings.mcp.http_pool_limit,
+            limit_per_host=settings.mcp.http_pool_limit_per_host,
+            ttl_dns_cache=settings.mcp.http_dns_cache_ttl,
+            keepalive_timeout=settings.mcp.http_keepalive_timeout,
+            ssl=self.ssl
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=settings.mcp.http_timeout)
+        )
+
+    async def start(self):
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+
+    async def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
 class GoogleSheetsService:
+    """Сервис Google Sheets с кэшированным клиентом и пулом потоков.
+
+    Авторизованный клиент gspread создается один раз (токен обновляется
+    им самим), хэндлы таблиц и листов кэшируются на handle_ttl секунд,
+    чтобы не запрашивать метаданные на каждый вызов. Синхронные вызовы
+    gspread выполняются в ограниченном пуле потоков и не блокируют
+    event loop MCP-сервера. batch_read/batch_update стоят один запрос
+    к API на любое число диапазонов.
+    """
+    
     def __init__(self):
         self.credentials_path = os.getenv("GOOGLE_CREDENTIALS_PATH", "google_credentials.json")
+        self.handle_ttl = settings.mcp.sheets_handle_ttl
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.mcp.sheets_max_workers, thread_name_prefix="sheets"
+        )
+        self._client: Optional[gspread.Client] = None
+        self._lock = threading.Lock()
+        self._spreadsheets: Dict[str, Tuple[float, gspread.Spreadsheet]] = {}
+        self._worksheets: Dict[Tuple[str, str], Tuple[float, gspread.Worksheet]] = {}
+        self.counters = {"calls": 0, "authorized": 0, "handle_hits": 0, "handle_misses": 0}
     
-    async def read_spreadsheet(self, spreadsheet_id: str, range_name: str) -> Dict[str, Any]:
+    async def start(self):
+        try:
+            await self._run(self._get_client)
+        except Exception as e:
+            logger.warning(f"Google Sheets client is not authorized yet: {e}")
+    
+    async def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    async def _run(self, func: Callable[..., Any], *args) -> Any:
+        self.counters["calls"] += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args))
+    
+    def _get_client(self) -> gspread.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = gspread.service_account(filename=self.credentials_path)
+                self.counters["authorized"] += 1
+            return self._client
+    
+    def _get_spreadsheet(self, spreadsheet_id: str) -> gspread.Spreadsheet:
+        cached = self._spreadsheets.get(spreadsheet_id)
+        if cached and time.monotonic() - cached[0] < self.handle_ttl:
+            self.counters["handle_hits"] += 1
+            return cached[1]
+        self.counters["handle_misses"] += 1
+        spreadsheet = self._get_client().open_by_key(spreadsheet_id)
+        self._spreadsheets[spreadsheet_id] = (time.monotonic(), spreadsheet)
+        return spreadsheet
+    
+    def _get_worksheet(self, spreadsheet_id: str, range_name: str) -> Tuple[gspread.Worksheet, str]:
+        """Лист и диапазон внутри него по 'Лист!A1:D10' (без имени - первый лист)"""
+        sheet_name, cell_range = range_name.split('!', 1) if '!' in range_name else ("", range_name)
+        key = (spreadsheet_id, sheet_name)
+        cached = self._worksheets.get(key)
+        if cached and time.monotonic() - cached[0] < self.handle_ttl:
+            self.counters["handle_hits"] += 1
+            return cached[1], cell_range
+        
+        spreadsheet = self._get_spreadsheet(spreadsheet_id)
+        worksheet = spreadsheet.worksheet(sheet_name) if sheet_name else spreadsheet.sheet1
+        self._worksheets[key] = (time.monotonic(), worksheet)
+        return worksheet, cell_range
+    
+    def _invalidate(self, spreadsheet_id: str):
+        """Сброс хэндлов после ошибки: лист могли переименовать или удалить"""
+        self._spreadsheets.pop(spreadsheet_id, None)
+        for key in [key for key in self._worksheets if key[0] == spreadsheet_id]:
+            self._worksheets.pop(key, None)
+    
+    def _read_sync(self, spreadsheet_id: str, range_name: str) -> List[List[str]]:
+        worksheet, cell_range = self._get_worksheet(spreadsheet_id, range_name)
+        return worksheet.get(cell_range)
+    
+    def _update_sync(self, spreadsheet_id: str, range_name: str, values: List[List[str]]):
+        worksheet, cell_range = self._get_worksheet(spreadsheet_id, range_name)
+        worksheet.update(cell_range, values)
+    
+    def _batch_read_sync(self, spreadsheet_id: str, ranges: List[str]) -> Dict[str, Any]:
+        return self._get_spreadsheet(spreadsheet_id).values_batch_get(ranges)
+    
+    def _batch_update_sync(self, spreadsheet_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        return self._get_spreadsheet(spreadsheet_id).values_batch_update(body)
+    
+    async def _call(self, spreadsheet_id: str, description: str, func: Callable[..., Any], *args) -> Dict[str, Any]:
         try:
-            gc = gspread.service_account(filename=self.credentials_path)
-            
-            spreadsheet = gc.open_by_key(spreadsheet_id)
-            
-            if '!' in range_name:
-                sheet_name, cell_range = range_name.split('!')
-                worksheet = spreadsheet.worksheet(sheet_name)
-                data = worksheet.get(cell_range)
-            else:
-                worksheet = spreadsheet.sheet1
-                data = worksheet.get(range_name)
-            
             return {
                 "status": "success",
-                "data": data
+                "data": await self._run(func, spreadsheet_id, *args)
             }
-            
         except gspread.SpreadsheetNotFound:
+            self._invalidate(spreadsheet_id)
             return {
                 "status": "error",
                 "message": f"Spreadsheet with ID {spreadsheet_id} not found"
             }
         except gspread.WorksheetNotFound:
+            self._invalidate(spreadsheet_id)
             return {
                 "status": "error", 
-                "message": f"Worksheet in range '{range_name}' not found"
+                "message": f"Worksheet in range '{description}' not found"
             }
         except gspread.APIError as e:
+            self._invalidate(spreadsheet_id)
             return {
                 "status": "error",
                 "message": f"Google Sheets API error: {str(e)}"
@@ -56,74 +222,171 @@ class GoogleSheetsService:
                 "message": f"Unexpected error: {str(e)}"
             }
     
+    async def read_spreadsheet(self, spreadsheet_id: str, range_name: str) -> Dict[str, Any]:
+        return await self._call(spreadsheet_id, range_name, self._read_sync, range_name)
+    
     async def update_spreadsheet(self, spreadsheet_id: str, range_name: str, values: List[List[str]]) -> Dict[str, Any]:
-        try:
-            gc = gspread.service_account(filename=self.credentials_path)
-            spreadsheet = gc.open_by_key(spreadsheet_id)
-            
-            if '!' in range_name:
-                sheet_name, cell_range = range_name.split('!')
-                worksheet = spreadsheet.worksheet(sheet_name)
-                worksheet.update(cell_range, values)
-            else:
-                worksheet = spreadsheet.sheet1
-                worksheet.update(range_name, values)
-            
-            return {
-                "status": "success",
-                "data": "Updated successfully"
+        result = await self._call(spreadsheet_id, range_name, self._update_sync, range_name, values)
+        if result["status"] == "success":
+            result["data"] = "Updated successfully"
+        return result
+    
+    async def batch_read(self, spreadsheet_id: str, ranges: List[str]) -> Dict[str, Any]:
+        """Несколько диапазонов одним values.batchGet: data - {диапазон из запроса: значения}"""
+        result = await self._call(spreadsheet_id, ", ".join(ranges), self._batch_read_sync, ranges)
+        if result["status"] == "success":
+            value_ranges = result["data"].get("valueRanges", [])
+            result["data"] = {
+                range_name: value_range.get("values", [])
+                for range_name, value_range in zip(ranges, value_ranges)
             }
-            
-        except Exception as e:
-            return {
-                "status": "error", 
-                "message": str(e)
+        return result
+    
+    async def batch_update(
+        self,
+        spreadsheet_id: str,
+        data: List[Dict[str, Any]],
+        value_input_option: str = "USER_ENTERED"
+    ) -> Dict[str, Any]:
+        """Запись в несколько диапазонов одним values.batchUpdate; data - [{"range": ..., "values": [[...]]}]"""
+        body = {
+            "valueInputOption": value_input_option,
+            "data": [{"range": item["range"], "values": item["values"]} for item in data]
+        }
+        result = await self._call(
+            spreadsheet_id, ", ".join(item["range"] for item in data), self._batch_update_sync, body
+        )
+        if result["status"] == "success":
+            result["data"] = {
+                "updated_ranges": len(result["data"].get("responses", [])),
+                "updated_cells": result["data"].get("totalUpdatedCells", 0)
             }
+        return result
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "cached_spreadsheets": len(self._spreadsheets),
+            "cached_worksheets": len(self._worksheets)
+        }
 
-class GitHubService:
+class GitHubService(PooledHTTPService):
+    
+    ssl = ssl_context
     
     def __init__(self):
+        super().__init__()
         self.token = settings.mcp.github_token
         self.base_url = "https://api.github.com"
         self.headers = {
             "Authorization": f"token {self.token}",
             "Accept": "application/vnd.github.v3+json"
         }
+        self.cache = GitHubResponseCache()
+        self.scheduler = GitHubRateScheduler(resource=CORE)
+        # У поиска (30 в минуту) и GraphQL API (очки в час) свои квоты, поэтому и планировщики отдельные
+        self.search_scheduler = GitHubRateScheduler(resource=SEARCH)
+        self.graphql_scheduler = GitHubRateScheduler(resource=GRAPHQL)
     
-    async def get_user_profile(self, username: str) -> Dict[str, Any]:
-        try:
-            connector = aiohttp.TCPConnector(ssl=ssl_context)
-            async with aiohttp.ClientSession(connector=connector) as session:
-                async with session.get(
-                    f"{self.base_url}/users/{username}",
-                    headers=self.headers
-                ) as response:
-                    if response.status == 200:
+    async def close(self):
+        await super().close()
+        await self.cache.close()
+    
+    async def _get_json(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        priority: str = INTERACTIVE
+    ) -> Tuple[int, Any]:
+        """GET к GitHub API через кэш и планировщик лимитов: (HTTP статус, JSON или текст ошибки)"""
+        url = f"{self.base_url}{path}"
+        key = self.cache.key(url, params)
+        entry = await self.cache.get(key)
+        
+        if entry and self.cache.is_fresh(entry):
+            self.cache.counters["hits"] += 1
+            return 200, entry["body"]
+        
+        headers = dict(self.headers)
+        if entry:
+            headers.update(self.cache.conditional_headers(entry))
+        
+        scheduler = self.search_scheduler if path.startswith("/search/") else self.scheduler
+        status, error_text, retry_after = None, None, 0.0
+        session = await self.session()
+        for attempt in range(settings.github.max_rate_limit_retries + 1):
+            token = await scheduler.acquire(priority)
+            if token.token:
+                headers["Authorization"] = f"token {token.token}"
+            status, response_headers = None, {}
+            try:
+                async with session.get(url, params=params, headers=headers) as response:
+                    status, response_headers = response.status, response.headers
+                    if status == 304 and entry:
+                        self.cache.counters["revalidated"] += 1
+                        await self.cache.touch(key, entry)
+                        return 200, entry["body"]
+                    if status == 200:
+                        self.cache.counters["misses"] += 1
                         data = await response.json()
-                        return {
-                            "status": "success",
-                            "data": {
-                                "login": data.get("login"),
-                                "name": data.get("name"),
-                                "company": data.get("company"),
-                                "blog": data.get("blog"),
-                                "location": data.get("location"),
-                                "email": data.get("email"),
-                                "hireable": data.get("hireable"),
-                                "bio": data.get("bio"),
-                                "public_repos": data.get("public_repos"),
-                                "followers": data.get("followers"),
-                                "following": data.get("following"),
-                                "created_at": data.get("created_at"),
-                                "updated_at": data.get("updated_at")
-                            }
-                        }
-                    else:
-                        error_text = await response.text()
-                        return {
-                            "status": "error",
-                            "error": f"HTTP {response.status}: {error_text}"
-                        }
+                        await self.cache.put(
+                            key, data,
+                            response.headers.get("ETag"),
+                            response.headers.get("Last-Modified")
+                        )
+                        return 200, data
+                    error_text = await response.text()
+            except Exception:
+                if not entry:
+                    raise
+                break
+            finally:
+                retry_after = await scheduler.release(token, status, response_headers)
+            
+            # Лимит исчерпан: повторяем с другим токеном или после короткой паузы,
+            # долгие ожидания не держат интерактивный запрос
+            if not retry_after or entry:
+                break
+            if scheduler.wait_time(priority) > settings.github.max_retry_wait:
+                break
+            scheduler.counters["retried"] += 1
+        
+        if entry and self.cache.can_serve_stale(status, bool(retry_after)):
+            # GitHub недоступен или ограничил запросы - лучше устаревший ответ, чем ошибка
+            self.cache.counters["stale_served"] += 1
+            return 200, entry["body"]
+        if entry and status in (404, 410):
+            # Пользователь или репозиторий удален - устаревший ответ больше не отдаем
+            await self.cache.delete(key)
+        return status, error_text
+    
+    async def get_user_profile(self, username: str, priority: str = INTERACTIVE) -> Dict[str, Any]:
+        try:
+            status, data = await self._get_json(f"/users/{username}", priority=priority)
+            if status == 200:
+                return {
+                    "status": "success",
+                    "data": {
+                        "login": data.get("login"),
+                        "name": data.get("name"),
+                        "company": data.get("company"),
+                        "blog": data.get("blog"),
+                        "location": data.get("location"),
+                        "email": data.get("email"),
+                        "hireable": data.get("hireable"),
+                        "bio": data.get("bio"),
+                        "public_repos": data.get("public_repos"),
+                        "followers": data.get("followers"),
+                        "following": data.get("following"),
+                        "created_at": data.get("created_at"),
+                        "updated_at": data.get("updated_at")
+                    }
+                }
+            else:
+                return {
+                    "status": "error",
+                    "error": f"HTTP {status}: {data}"
+                }
         except Exception as e:
             logger.error(f"Error fetching GitHub user profile: {e}")
             return {
@@ -131,43 +394,41 @@ class GitHubService:
                 "error": str(e)
             }
     
-    async def search_repositories(self, query: str, language: str = None, sort: str = "stars") -> Dict[str, Any]:
+    async def search_repositories(
+        self, query: str, language: str = None, sort: str = "stars", priority: str = INTERACTIVE
+    ) -> Dict[str, Any]:
         try:
             search_query = query
             if language:
                 search_query += f" language:{language}"
             
-            connector = aiohttp.TCPConnector(ssl=ssl_context)
-            async with aiohttp.ClientSession(connector=connector) as session:
-                async with session.get(
-                    f"{self.base_url}/search/repositories",
-                    params={"q": search_query, "sort": sort, "per_page": 5},
-                    headers=self.headers
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        repos = []
-                        for item in data.get("items", []):
-                            repos.append({
-                                "name": item.get("name"),
-                                "full_name": item.get("full_name"),
-                                "html_url": item.get("html_url"),
-                                "description": item.get("description"),
-                                "language": item.get("language"),
-                                "stargazers_count": item.get("stargazers_count"),
-                                "forks_count": item.get("forks_count"),
-                                "updated_at": item.get("updated_at")
-                            })
-                        return {
-                            "status": "success",
-                            "data": repos
-                        }
-                    else:
-                        error_text = await response.text()
-                        return {
-                            "status": "error",
-                            "error": f"HTTP {response.status}: {error_text}"
-                        }
+            status, data = await self._get_json(
+                "/search/repositories",
+                params={"q": search_query, "sort": sort, "per_page": 5},
+                priority=priority
+            )
+            if status == 200:
+                repos = []
+                for item in data.get("items", []):
+                    repos.append({
+                        "name": item.get("name"),
+                        "full_name": item.get("full_name"),
+                        "html_url": item.get("html_url"),
+                        "description": item.get("description"),
+                        "language": item.get("language"),
+                        "stargazers_count": item.get("stargazers_count"),
+                        "forks_count": item.get("forks_count"),
+                        "updated_at": item.get("updated_at")
+                    })
+                return {
+                    "status": "success",
+                    "data": repos
+                }
+            else:
+                return {
+                    "status": "error",
+                    "error": f"HTTP {status}: {data}"
+                }
         except Exception as e:
             logger.error(f"Error searching GitHub repositories: {e}")
             return {
@@ -175,54 +436,305 @@ class GitHubService:
                 "error": str(e)
             }
     
+    async def _post_graphql(self, query: str, variables: Dict[str, Any], priority: str) -> Tuple[int, Any]:
+        """POST к GraphQL API через планировщик его отдельной квоты: (HTTP статус, JSON или текст ошибки)"""
+        status, payload = None, None
+        session = await self.session()
+        for attempt in range(settings.github.max_rate_limit_retries + 1):
+            token = await self.graphql_scheduler.acquire(priority)
+            headers = dict(self.headers)
+            if token.token:
+                headers["Authorization"] = f"bearer {token.token}"
+            status, response_headers = None, {}
+            try:
+                async with session.post(
+                    f"{self.base_url}/graphql",
+                    json={"query": query, "variables": variables},
+                    headers=headers
+                ) as response:
+                    status, response_headers = response.status, response.headers
+                    payload = await response.json() if status == 200 else await response.text()
+            finally:
+                retry_after = await self.graphql_scheduler.release(token, status, response_headers)
+            
+            if not retry_after or self.graphql_scheduler.wait_time(priority) > settings.github.max_retry_wait:
+                break
+            self.graphql_scheduler.counters["retried"] += 1
+        return status, payload
+    
+    @staticmethod
+    def _summarize_profile(user: Dict[str, Any]) -> Dict[str, Any]:
+        repositories = user["repositories"]["nodes"]
+        language_sizes: Dict[str, int] = {}
+        for repo in repositories:
+            for edge in repo["languages"]["edges"]:
+                language_sizes[edge["node"]["name"]] = language_sizes.get(edge["node"]["name"], 0) + edge["size"]
+        total_size = sum(language_sizes.values())
+        contributions = user["contributionsCollection"]
+        
+        return {
+            "login": user["login"],
+            "name": user.get("name"),
+            "company": user.get("company"),
+            "location": user.get("location"),
+            "bio": user.get("bio"),
+            "email": user.get("email") or None,
+            "blog": user.get("websiteUrl"),
+            "hireable": user.get("isHireable"),
+            "created_at": user.get("createdAt"),
+            "followers": user["followers"]["totalCount"],
+            "public_repos": user["repositories"]["totalCount"],
+            "top_repositories": [
+                {
+                    "name": repo["name"],
+                    "html_url": repo["url"],
+                    "description": repo.get("description"),
+                    "language": (repo.get("primaryLanguage") or {}).get("name"),
+                    "stargazers_count": repo["stargazerCount"],
+                    "forks_count": repo["forkCount"],
+                    "pushed_at": repo.get("pushedAt")
+                }
+                for repo in repositories
+            ],
+            "languages": {
+                name: round(size / total_size, 3)
+                for name, size in sorted(language_sizes.items(), key=lambda item: -item[1])
+            } if total_size else {},
+            "contributions": {
+                "total": contributions["contributionCalendar"]["totalContributions"],
+                "commits": contributions["totalCommitContributions"],
+                "pull_requests": contributions["totalPullRequestContributions"],
+                "reviews": contributions["totalPullRequestReviewContributions"],
+                "issues": contributions["totalIssueContributions"]
+            }
+        }
+    
+    async def bulk_user_profiles(self, usernames: List[str], priority: str = BULK) -> Dict[str, Any]:
+        """Профили, топ репозиториев, языки и вклад пачками по graphql_batch_size пользователей за запрос.
+
+        В data профиль по логину; None - пользователь не найден (ошибка
+        NOT_FOUND с path на его алиас). В failed - логины из неудавшихся
+        пачек и логины, чей алиас пришел пустым по другой причине.
+        """
+        if not self.token and not settings.github.tokens:
+            return {"status": "error", "error": "GitHub GraphQL API requires GITHUB_TOKEN"}
+        
+        usernames = list(dict.fromkeys(name.strip() for name in usernames if name and name.strip()))
+        batch_size = settings.github.graphql_batch_size
+        batches = [usernames[i:i + batch_size] for i in range(0, len(usernames), batch_size)]
+        
+        async def fetch(batch: List[str]) -> Tuple[List[str], Dict[str, Any], List[str], Optional[str]]:
+            # Логины передаются переменными, алиасы u0..uN разделяют пользователей в одном ответе
+            declarations = ", ".join(f"$u{i}: String!" for i in range(len(batch)))
+            selections = "\n".join(f"  u{i}: user(login: $u{i}) {{ ...CandidateProfile }}" for i in range(len(batch)))
+            query = f"query({declarations}) {{\n{selections}\n}}\n{GRAPHQL_USER_FIELDS}"
+            try:
+                status, payload = await self._post_graphql(
+                    query, {f"u{i}": login for i, login in enumerate(batch)}, priority
+                )
+            except Exception as e:
+                return batch, {}, batch, str(e)
+            if status != 200:
+                return batch, {}, batch, f"HTTP {status}: {payload}"
+            
+            data = payload.get("data") or {}
+            errors = payload.get("errors") or []
+            if not data and any(error.get("type") != "NOT_FOUND" for error in errors):
+                message = next(error.get("message") for error in errors if error.get("type") != "NOT_FOUND")
+                return batch, {}, batch, message or "GraphQL error"
+            
+            # path[0] ошибки - алиас пользователя; пустой алиас без NOT_FOUND - сбой, а не «не найден»
+            not_found = {
+                error["path"][0] for error in errors
+                if error.get("type") == "NOT_FOUND" and error.get("path")
+            }
+            batch_profiles, batch_failed = {}, []
+            for i, login in enumerate(batch):
+                alias = f"u{i}"
+                if data.get(alias):
+                    batch_profiles[login] = self._summarize_profile(data[alias])
+                elif alias in not_found:
+                    batch_profiles[login] = None
+                else:
+                    batch_failed.append(login)
+            messages = {error.get("message") for error in errors if error.get("type") != "NOT_FOUND"}
+            reason = "; ".join(sorted(message for message in messages if message)) or "empty result"
+            return batch, batch_profiles, batch_failed, reason if batch_failed else None
+        
+        profiles: Dict[str, Any] = {}
+        failed: List[str] = []
+        for batch, batch_profiles, batch_failed, error in await asyncio.gather(*(fetch(batch) for batch in batches)):
+            if batch_failed:
+                logger.error(f"GitHub GraphQL failed for {len(batch_failed)} of {len(batch)} users: {error}")
+                failed.extend(batch_failed)
+            profiles.update(batch_profiles)
+        
+        return {
+            "status": "success" if profiles or not failed else "error",
+            "data": profiles,
+            "failed": failed,
+            "error": None if profiles or not failed else "All GraphQL batches failed"
+        }
+    
     async def check_connection(self) -> bool:
         try:
-            connector = aiohttp.TCPConnector(ssl=ssl_context)
-            async with aiohttp.ClientSession(connector=connector) as session:
-                async with session.get(
-                    f"{self.base_url}/user",
-                    headers=self.headers
-                ) as response:
-                    return response.status == 200
+            session = await self.session()
+            async with session.get(
+                f"{self.base_url}/user",
+                headers=self.headers
+            ) as response:
+                return response.status == 200
         except Exception as e:
             logger.error(f"GitHub connection check failed: {e}")
             return False
 
-class WebSearchService:
-    """Сервис веб-поиска через DuckDuckGo"""
+class WebSearchService(PooledHTTPService):
+    """Сервис веб-поиска через DuckDuckGo с кэшем по нормализованному запросу"""
     
     def __init__(self):
+        super().__init__()
         self.base_url = "https://api.duckduckgo.com"
+        self.html_url = settings.web_search.html_url
+        self.cache = SearchResultCache()
+        self.pages = PageFetcher(self.cache)
+        self._inflight: Dict[str, asyncio.Task] = {}
         logger.info("WebSearchService initialized with DuckDuckGo")
     
-    async def search(self, query: str, num_results: int = 5) -> Dict[str, Any]:
-        """Поиск через DuckDuckGo API"""
+    async def close(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        await super().close()
+        await self.cache.close()
+    
+    async def _fetch(self, query: str) -> Dict[str, Any]:
+        """Запрос к DuckDuckGo с замером задержки; успешный ответ кладется в кэш"""
+        params = {
+            "q": query,
+            "format": "json",
+            "no_html": "1",
+            "skip_disambig": "1"
+        }
+        
+        started = time.monotonic()
+        session = await self.session()
+        async with session.get(self.base_url, params=params) as response:
+            if response.status != 200:
+                return {
+                    "status": "error",
+                    "error": f"HTTP {response.status}"
+                }
+            data = await response.json(content_type=None)
+        
+        entry = {
+            "results": self._format_results(data, query),
+            "upstream_ms": round((time.monotonic() - started) * 1000, 1),
+            "fetched_at": time.time()
+        }
+        await self.cache.put(self.cache.key(query), entry)
+        return entry
+    
+    def _fetch_shared(self, query: str) -> asyncio.Task:
+        """Один запрос к провайдеру на ключ: параллельные промахи и фоновые обновления ждут его же"""
+        key = self.cache.key(query)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(query))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+    
+    def _refresh_in_background(self, query: str):
+        def log_failure(task: asyncio.Task):
+            if not task.cancelled() and task.exception():
+                logger.warning(f"Background search refresh failed: {task.exception()}")
+        
+        self.cache.counters["refreshes"] += 1
+        self._fetch_shared(query).add_done_callback(log_failure)
+    
+    async def _result_links(
+        self, query: str, results: List[Dict[str, Any]], limit: int, timeout: float
+    ) -> List[str]:
+        """Ссылки для глубокого поиска: из мгновенного ответа, затем из HTML-выдачи DuckDuckGo"""
+        links = [
+            item["link"] for item in results
+            if item.get("link") and "duckduckgo.com" not in urlsplit(item["link"]).netloc
+        ]
+        if len(links) < limit:
+            try:
+                session = await self.session()
+                async with session.get(
+                    self.html_url,
+                    params={"q": query},
+                    headers={"User-Agent": USER_AGENT},
+                    timeout=aiohttp.ClientTimeout(total=timeout)
+                ) as response:
+                    html = await response.text() if response.status == 200 else ""
+                for href in RESULT_LINK_PATTERN.findall(html):
+                    # Ссылки выдачи идут через редирект //duckduckgo.com/l/?uddg=<url>
+                    target = parse_qs(urlsplit(unescape(href)).query).get("uddg", [unescape(href)])[0]
+                    if target.startswith("http"):
+                        links.append(target)
+            except Exception as e:
+                logger.warning(f"DuckDuckGo HTML results failed: {e or e.__class__.__name__}")
+        return list(dict.fromkeys(links))[:limit]
+    
+    async def _deep(self, query: str, results: List[Dict[str, Any]], deadline: float) -> Dict[str, Any]:
+        """Текст страниц выдачи к моменту deadline (time.monotonic): что не успело - в failed"""
+        config = settings.web_search
+        links = await self._result_links(
+            query, results, config.deep_max_pages,
+            max(min(config.deep_serp_timeout, deadline - time.monotonic()), 0.1)
+        )
+        return await self.pages.fetch_pages(
+            await self.session(), links, config.deep_token_budget,
+            timeout=max(deadline - time.monotonic(), 0)
+        )
+    
+    async def search(self, query: str, num_results: int = 5, deep: bool = False) -> Dict[str, Any]:
+        """Поиск через DuckDuckGo API; deep - дополнительно текст страниц из выдачи"""
+        started = time.monotonic()
         try:
-            params = {
-                "q": query,
-                "format": "json",
-                "no_html": "1",
-                "skip_disambig": "1"
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.base_url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return self._format_results(data, query)
-                    else:
-                        return {
-                            "status": "error",
-                            "error": f"HTTP {response.status}"
-                        }
+            entry = await self.cache.get(self.cache.key(query))
+            if entry and self.cache.is_fresh(entry):
+                self.cache.counters["hits"] += 1
+                cache_status = "hit"
+            elif entry:
+                self.cache.counters["stale_served"] += 1
+                cache_status = "stale"
+                self._refresh_in_background(query)
+            else:
+                self.cache.counters["misses"] += 1
+                cache_status = "miss" if self.cache.enabled else "bypass"
+                entry = await asyncio.shield(self._fetch_shared(query))
+                if entry.get("status") == "error":
+                    return entry
         except Exception as e:
             logger.error(f"DuckDuckGo search error: {e}")
             return {
                 "status": "error",
                 "error": str(e)
             }
+        
+        response = {
+            "status": "success",
+            "data": entry["results"][:num_results],
+            "upstream_ms": entry["upstream_ms"],
+            "cache": cache_status,
+            "cache_age": round(self.cache.age(entry), 1) if cache_status != "miss" else 0.0,
+            "provider": "duckduckgo"
+        }
+        if deep:
+            try:
+                response["deep"] = await self._deep(
+                    query, entry["results"], started + settings.web_search.deep_deadline
+                )
+            except Exception as e:
+                logger.error(f"Deep search error: {e}")
+                response["deep"] = {"pages": [], "failed": [], "error": str(e)}
+        response["query_time"] = round(time.monotonic() - started, 4)
+        return response
     
-    def _format_results(self, data: Dict[str, Any], query: str) -> Dict[str, Any]:
+    def _format_results(self, data: Dict[str, Any], query: str) -> List[Dict[str, Any]]:
         """Форматирует результаты DuckDuckGo"""
         results = []
         
@@ -248,33 +760,12 @@ class WebSearchService:
                 "link": ""
             })
         
-        return {
-            "status": "success",
-            "data": results[:5],
-            "query_time": 1.0,
-            "provider": "duckduckgo"
-        }
+        return results[:5]
     
     async def check_connection(self) -> bool:
         return True
 
 async def check_mcp_services() -> Dict[str, bool]:
-    """Проверяет доступность MCP серверов через HTTP запросы"""
-    services_status = {}
-    
-    services_to_check = {
-        "github": "http://mcp_github:8001/health",
-        "web_search": "http://mcp_web_search:8002/health",
-        "google_sheets": "http://mcp_sheets:8003/health"
-    }
-    
-    for service_name, url in services_to_check.items():
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=5) as response:
-                    services_status[service_name] = response.status == 200
-        except Exception as e:
-            logger.warning(f"MCP service {service_name} check failed: {e}")
-            services_status[service_name] = False
-    
-    return services_status
+    """Доступность MCP серверов из снимка фонового health prober'а"""
+    from src.monitoring.health_prober import health_prober
+    return await health_prober.mcp_status()
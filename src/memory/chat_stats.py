@@ -0,0 +1,82 @@
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import select, func, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+
+from src.database.models import ChatStats, ConversationHistory
+
+logger = logging.getLogger(__name__)
+
+class ChatStatsService:
+    """Инкрементальная статистика по чатам (таблица chat_stats).
+
+    record() вызывается в той же транзакции, что и вставка истории,
+    поэтому статистика не расходится с conversation_history, а запрос
+    статистики - это выборка одной строки по первичному ключу.
+    """
+
+    async def record(
+        self,
+        session: AsyncSession,
+        messages: Iterable[Tuple[int, datetime, str]]
+    ):
+        """Учет вставленных сообщений: (chat_id, timestamp, bot_response). Без commit."""
+        rollup: Dict[int, Dict] = {}
+        for chat_id, timestamp, bot_response in messages:
+            stats = rollup.setdefault(chat_id, {
+                "chat_id": chat_id,
+                "message_count": 0,
+                "first_message_at": timestamp,
+                "last_message_at": timestamp,
+                "total_response_chars": 0
+            })
+            stats["message_count"] += 1
+            stats["first_message_at"] = min(stats["first_message_at"], timestamp)
+            stats["last_message_at"] = max(stats["last_message_at"], timestamp)
+            stats["total_response_chars"] += len(bot_response)
+
+        if not rollup:
+            return
+
+        stmt = insert(ChatStats).values(list(rollup.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ChatStats.chat_id],
+            set_={
+                "message_count": ChatStats.message_count + stmt.excluded.message_count,
+                "first_message_at": func.least(ChatStats.first_message_at, stmt.excluded.first_message_at),
+                "last_message_at": func.greatest(ChatStats.last_message_at, stmt.excluded.last_message_at),
+                "total_response_chars": ChatStats.total_response_chars + stmt.excluded.total_response_chars,
+                "updated_at": func.now()
+            }
+        )
+        await session.execute(stmt)
+
+    async def get(self, session: AsyncSession, chat_id: int) -> Optional[ChatStats]:
+        result = await session.execute(select(ChatStats).where(ChatStats.chat_id == chat_id))
+        return result.scalar_one_or_none()
+
+    async def rebuild(self, session: AsyncSession, chat_id: Optional[int] = None):
+        """Пересчет статистики по conversation_history (после удаления или для backfill). Без commit."""
+        aggregate = select(
+            ConversationHistory.chat_id,
+            func.count(ConversationHistory.id),
+            func.min(ConversationHistory.timestamp),
+            func.max(ConversationHistory.timestamp),
+            func.coalesce(func.sum(func.length(ConversationHistory.bot_response)), 0)
+        ).group_by(ConversationHistory.chat_id)
+
+        clear_stmt = delete(ChatStats)
+        if chat_id is not None:
+            aggregate = aggregate.where(ConversationHistory.chat_id == chat_id)
+            clear_stmt = clear_stmt.where(ChatStats.chat_id == chat_id)
+
+        await session.execute(clear_stmt)
+        stmt = insert(ChatStats).from_select(
+            ["chat_id", "message_count", "first_message_at", "last_message_at", "total_response_chars"],
+            aggregate
+        )
+        await session.execute(stmt)
+
+chat_stats_service = ChatStatsService()
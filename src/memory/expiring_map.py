@@ -0,0 +1,104 @@
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+class ExpiringLRUMap(Generic[K, V]):
+    """Словарь с ограничением размера (LRU) и временем жизни записей.
+
+    Порядок использования хранится в OrderedDict, сроки истечения - в
+    min-куче с ленивым удалением устаревших элементов. Обращение к ключу
+    продлевает его TTL, sweep() снимает истекшие записи за O(k log n).
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[K, Tuple[V, float]]" = OrderedDict()
+        self._heap: List[Tuple[float, int, K]] = []
+        self._sequence = itertools.count()
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        item = self._data.get(key)
+        return item is not None and item[1] > self._clock()
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """Значение по ключу с продлением TTL и переносом в конец LRU"""
+        item = self._data.get(key)
+        if item is None:
+            return default
+
+        now = self._clock()
+        if item[1] <= now:
+            del self._data[key]
+            self.expirations += 1
+            return default
+
+        self._touch(key, item[0], now)
+        return item[0]
+
+    def set(self, key: K, value: V):
+        self._touch(key, value, self._clock())
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+        self._compact_heap()
+
+    def pop(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        item = self._data.pop(key, None)
+        return item[0] if item is not None else default
+
+    def sweep(self) -> int:
+        """Удаление истекших записей, возвращает их количество"""
+        now = self._clock()
+        removed = 0
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, _, key = heapq.heappop(self._heap)
+            item = self._data.get(key)
+            # в куче могут остаться старые сроки уже продленных ключей
+            if item is not None and item[1] == expires_at:
+                del self._data[key]
+                removed += 1
+        self.expirations += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+    def _touch(self, key: K, value: V, now: float):
+        expires_at = now + self.ttl
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        heapq.heappush(self._heap, (expires_at, next(self._sequence), key))
+        # get() тоже пушит в кучу, поэтому пересборка проверяется на каждом продлении
+        self._compact_heap()
+
+    def _compact_heap(self):
+        """Пересборка кучи, если устаревших элементов стало больше живых"""
+        if len(self._heap) <= 2 * len(self._data) + 64:
+            return
+        self._heap = [
+            (expires_at, next(self._sequence), key)
+            for key, (_, expires_at) in self._data.items()
+        ]
+        heapq.heapify(self._heap)
@@ -0,0 +1,140 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+from sqlalchemy import select
+import logging
+
+from src.database.database import AsyncSessionLocal
+from src.database.models import ConversationHistory
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "txt": "text/plain",
+    "json": "application/json",
+}
+
+CSV_COLUMNS = ["chat_id", "id", "timestamp", "user_message", "bot_response"]
+
+class ConversationExporter:
+    """Потоковая выгрузка истории диалогов.
+
+    Строки читаются серверным курсором пачками по chunk_size и сразу
+    сериализуются, поэтому расход памяти не зависит от длины истории.
+    """
+
+    def __init__(self, chunk_size: int = 500):
+        self.chunk_size = chunk_size
+
+    async def _iter_chunks(
+        self,
+        chat_ids: List[int],
+        since: Optional[datetime],
+        until: Optional[datetime]
+    ) -> AsyncIterator[list]:
+        stmt = select(
+            ConversationHistory.chat_id,
+            ConversationHistory.id,
+            ConversationHistory.timestamp,
+            ConversationHistory.user_message,
+            ConversationHistory.bot_response
+        ).where(
+            ConversationHistory.chat_id.in_(chat_ids)
+        ).order_by(
+            ConversationHistory.chat_id,
+            ConversationHistory.timestamp,
+            ConversationHistory.id
+        ).execution_options(yield_per=self.chunk_size)
+
+        if since:
+            stmt = stmt.where(ConversationHistory.timestamp >= since)
+        if until:
+            stmt = stmt.where(ConversationHistory.timestamp < until)
+
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(stmt)
+            async for rows in result.partitions(self.chunk_size):
+                yield rows
+
+    async def _iter_text(
+        self,
+        chat_ids: List[int],
+        format: str,
+        since: Optional[datetime],
+        until: Optional[datetime]
+    ) -> AsyncIterator[str]:
+        if format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(CSV_COLUMNS)
+            yield buffer.getvalue()
+        elif format == "json":
+            header = {"chat_id": chat_ids[0]} if len(chat_ids) == 1 else {"chat_ids": chat_ids}
+            yield json.dumps(header, ensure_ascii=False)[:-1] + ', "messages": ['
+
+        first = True
+        current_chat = None
+        async for rows in self._iter_chunks(chat_ids, since, until):
+            parts = []
+            if format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for row in rows:
+                    writer.writerow([row[0], row[1], row[2].isoformat(), row[3], row[4]])
+                parts.append(buffer.getvalue())
+            else:
+                for chat_id, message_id, timestamp, user_message, bot_response in rows:
+                    if format == "txt":
+                        if chat_id != current_chat:
+                            current_chat = chat_id
+                            parts.append(f"История диалога {chat_id}\n\n")
+                        parts.append(f"Пользователь: {user_message}\nБот: {bot_response}\n\n")
+                        continue
+
+                    record = json.dumps({
+                        "chat_id": chat_id,
+                        "id": message_id,
+                        "timestamp": timestamp.isoformat(),
+                        "user_message": user_message,
+                        "bot_response": bot_response
+                    }, ensure_ascii=False)
+                    if format == "ndjson":
+                        parts.append(record + "\n")
+                    else:
+                        parts.append(record if first else "," + record)
+                        first = False
+            yield "".join(parts)
+
+        if format == "json":
+            yield "]}"
+
+    async def stream(
+        self,
+        chat_ids: List[int],
+        format: str = "ndjson",
+        gzip: bool = False,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> AsyncIterator[bytes]:
+        compressor = zlib.compressobj(wbits=31) if gzip else None
+        exported_bytes = 0
+
+        async for chunk in self._iter_text(chat_ids, format, since, until):
+            data = chunk.encode("utf-8")
+            exported_bytes += len(data)
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+
+        if compressor:
+            yield compressor.flush()
+
+        logger.info(f"Экспорт истории {chat_ids} ({format}): {exported_bytes} байт")
+
+conversation_exporter = ConversationExporter()
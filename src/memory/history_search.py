@@ -0,0 +1,134 @@
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+
+logger = logging.getLogger(__name__)
+
+HEADLINE_OPTIONS = 'StartSel=<b>, StopSel=</b>, MaxFragments=2, MaxWords=25, MinWords=8, FragmentDelimiter=" … "'
+
+# Триграммный индекс работает только для подстрок от 3 символов
+MIN_SUBSTRING_LENGTH = 3
+
+def encode_cursor(rank: float, message_id: int) -> str:
+    payload = json.dumps([rank, message_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        rank, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), int(message_id)
+    except Exception:
+        raise ValueError("Invalid search cursor")
+
+def _escape_like(query: str) -> str:
+    return query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+class ConversationSearch:
+    """Поиск по истории: tsvector (russian + english) с GIN и pg_trgm для подстрок.
+
+    Результаты ранжируются ts_rank_cd плюс триграммной близостью и
+    листаются keyset-курсором (rank, id), сниппеты строит ts_headline
+    только для строк текущей страницы.
+    """
+
+    async def search(
+        self,
+        session: AsyncSession,
+        chat_id: int,
+        query: str,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> Dict:
+        query = query.strip()
+        if not query:
+            return {"results": [], "next_cursor": None}
+
+        params = {
+            "chat_id": chat_id,
+            "query": query,
+            "pattern": f"%{_escape_like(query)}%",
+            "limit": limit + 1
+        }
+
+        filters = ["chat_id = :chat_id"]
+        if since:
+            filters.append("timestamp >= :since")
+            params["since"] = since
+        if until:
+            filters.append("timestamp < :until")
+            params["until"] = until
+
+        match_conditions = ["search_vector @@ q.tsq"]
+        if len(query) >= MIN_SUBSTRING_LENGTH:
+            match_conditions.append(
+                "user_message ILIKE :pattern OR bot_response ILIKE :pattern"
+            )
+
+        cursor_filter = ""
+        if cursor:
+            params["cursor_rank"], params["cursor_id"] = decode_cursor(cursor)
+            cursor_filter = (
+                "WHERE rank < :cursor_rank OR (rank = :cursor_rank AND id < :cursor_id)"
+            )
+
+        sql = text(f"""
+            WITH q AS (
+                SELECT websearch_to_tsquery('russian', :query)
+                    || websearch_to_tsquery('english', :query) AS tsq
+            ),
+            matches AS (
+                SELECT
+                    id, timestamp, user_message, bot_response, q.tsq,
+                    (
+                        ts_rank_cd(search_vector, q.tsq)
+                        + 0.5 * greatest(
+                            word_similarity(:query, user_message),
+                            word_similarity(:query, bot_response)
+                        )
+                    )::float8 AS rank
+                FROM conversation_history, q
+                WHERE {" AND ".join(filters)}
+                  AND ({" OR ".join(match_conditions)})
+            ),
+            page AS (
+                SELECT * FROM matches
+                {cursor_filter}
+                ORDER BY rank DESC, id DESC
+                LIMIT :limit
+            )
+            SELECT
+                id, timestamp, rank,
+                ts_headline('russian', user_message, tsq, '{HEADLINE_OPTIONS}'),
+                ts_headline('russian', bot_response, tsq, '{HEADLINE_OPTIONS}')
+            FROM page
+            ORDER BY rank DESC, id DESC
+        """)
+
+        result = await session.execute(sql, params)
+        rows = result.all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][2], rows[-1][0])
+
+        results: List[Dict] = []
+        for row in rows:
+            results.append({
+                "id": row[0],
+                "timestamp": row[1],
+                "rank": row[2],
+                "user_message_snippet": row[3],
+                "bot_response_snippet": row[4]
+            })
+
+        logger.info(f"Поиск по истории {chat_id}: '{query}', найдено {len(results)}")
+        return {"results": results, "next_cursor": next_cursor}
+
+conversation_search = ConversationSearch()
@@ -0,0 +1,122 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+
+from src.config import settings
+from src.database.models import ConversationHistory
+from src.memory.redis_manager import redis_session_manager
+
+logger = logging.getLogger(__name__)
+
+class HistoryStore:
+    """Единая точка чтения истории диалога (read-through кэш).
+
+    Сначала Redis, при промахе - последние сообщения чата из PostgreSQL
+    с массовой догрузкой в Redis. Если в Redis сообщений меньше нужного
+    (сессия истекла и началась заново), недостающие берутся из PostgreSQL:
+    списки сливаются по message_key, сообщения Redis, еще не записанные в
+    базу (write-behind), сохраняются, а более старые строки базы
+    догружаются в начало списка Redis. Возвращает ровно запрошенное число
+    последних обменов (или меньше, если история короче), от старых к новым.
+    """
+
+    def __init__(self):
+        self.max_history = settings.max_conversation_history
+        self.metrics = {
+            "redis_hits": 0,
+            "redis_partial": 0,
+            "redis_misses": 0,
+            "redis_errors": 0,
+            "db_hits": 0,
+            "db_misses": 0,
+            "db_errors": 0
+        }
+
+    async def get_recent(
+        self,
+        chat_id: int,
+        turns: Optional[int],
+        session: AsyncSession
+    ) -> List[Dict]:
+        turns = turns if turns and turns > 0 else self.max_history
+
+        # Redis хранит не больше max_history сообщений - больше он дать не может
+        history: List[Dict] = []
+        try:
+            history = await redis_session_manager.get_conversation_history(chat_id, turns)
+            if len(history) >= min(turns, self.max_history):
+                self.metrics["redis_hits"] += 1
+                return history
+            self.metrics["redis_partial" if history else "redis_misses"] += 1
+        except Exception as e:
+            self.metrics["redis_errors"] += 1
+            logger.warning(f"Redis history failed: {e}")
+
+        try:
+            stmt = select(
+                ConversationHistory.user_message,
+                ConversationHistory.bot_response,
+                ConversationHistory.timestamp,
+                ConversationHistory.message_key
+            ).where(
+                ConversationHistory.chat_id == chat_id
+            ).order_by(
+                ConversationHistory.timestamp.desc(),
+                ConversationHistory.id.desc()
+            ).limit(max(turns, self.max_history))
+
+            result = await session.execute(stmt)
+            rows = list(reversed(result.all()))
+        except Exception as e:
+            self.metrics["db_errors"] += 1
+            logger.error(f"Database history failed: {e}")
+            return history
+
+        if not rows:
+            self.metrics["db_misses"] += 1
+            return history
+        self.metrics["db_hits"] += 1
+
+        # В начало списка Redis догружаются только строки старше его первой записи
+        cached_keys = {conv.get("message_key") for conv in history}
+        oldest = datetime.fromisoformat(history[0]["timestamp"]).timestamp() if history else None
+        missing = [
+            {"user_message": user_message, "bot_response": bot_response, "timestamp": timestamp, "message_key": message_key}
+            for user_message, bot_response, timestamp, message_key in rows
+            if str(message_key) not in cached_keys and (oldest is None or timestamp.timestamp() < int(oldest))
+        ]
+        try:
+            await redis_session_manager.rehydrate_conversation(chat_id, missing)
+        except Exception as e:
+            logger.warning(f"Failed to cache history in Redis: {e}")
+
+        stored_keys = {str(message_key) for *_, message_key in rows}
+        merged = [
+            {
+                "user_message": user_message,
+                "bot_response": bot_response,
+                "timestamp": timestamp.isoformat(),
+                "message_key": str(message_key)
+            }
+            for user_message, bot_response, timestamp, message_key in rows
+        ] + [
+            conv for conv in history
+            if conv.get("message_key") and conv["message_key"] not in stored_keys
+        ]
+        merged.sort(key=lambda conv: datetime.fromisoformat(conv["timestamp"]).timestamp())
+        return merged[-turns:]
+
+    def get_metrics(self) -> Dict:
+        """Счетчики и доля попаданий по слоям"""
+        metrics = dict(self.metrics)
+        redis_total = (
+            metrics["redis_hits"] + metrics["redis_partial"] + metrics["redis_misses"] + metrics["redis_errors"]
+        )
+        db_total = metrics["db_hits"] + metrics["db_misses"] + metrics["db_errors"]
+        metrics["redis_hit_rate"] = round(metrics["redis_hits"] / redis_total, 4) if redis_total else 0.0
+        metrics["db_hit_rate"] = round(metrics["db_hits"] / db_total, 4) if db_total else 0.0
+        return metrics
+
+history_store = HistoryStore()
@@ -1,20 +1,152 @@
 import json
 import asyncio
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from uuid import uuid4, UUID
 from datetime import datetime, timedelta
+import msgpack
+import zstandard
 import redis.asyncio as redis
 import logging
 from src.config import settings
 
 logger = logging.getLogger(__name__)
 
+ACTIVE_CHATS_KEY = "chats:active"
+
+_zstd_compressor = zstandard.ZstdCompressor(level=3)
+_zstd_decompressor = zstandard.ZstdDecompressor()
+
+def encode_conversation(
+    user_message: str,
+    bot_response: str,
+    timestamp: Optional[datetime] = None,
+    message_key: Optional[UUID] = None
+) -> bytes:
+    """Компактная запись сообщения: msgpack [user, bot, epoch, message_key].
+
+    Длинный ответ бота сжимается zstd и хранится как bin, короткий - как str.
+    message_key (тот же, что в conversation_history) - 16 байт bin; у
+    записей без него список из трех элементов.
+    """
+    timestamp = timestamp or datetime.now()
+    response = bot_response
+    if (
+        settings.redis.history_compression
+        and len(bot_response) >= settings.redis.history_compression_threshold
+    ):
+        response = _zstd_compressor.compress(bot_response.encode("utf-8"))
+    entry = [user_message, response, int(timestamp.timestamp())]
+    if message_key is not None:
+        entry.append(message_key.bytes)
+    return msgpack.packb(entry, use_bin_type=True)
+
+def decode_conversation(raw: bytes) -> Dict:
+    """Декодирование записи истории; старые JSON-записи читаются как есть"""
+    if raw[:1] == b"{":
+        return json.loads(raw)
+    
+    user_message, response, timestamp, *rest = msgpack.unpackb(raw, raw=False)
+    if isinstance(response, bytes):
+        response = _zstd_decompressor.decompress(response).decode("utf-8")
+    return {
+        "user_message": user_message,
+        "bot_response": response,
+        "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+        "message_key": str(UUID(bytes=rest[0])) if rest else None
+    }
+
+def session_keys(chat_id: int) -> Tuple[str, str, str]:
+    """Ключи чата: сессия, история, блокировка загрузки истории.
+
+    История и блокировка помечены hash tag {session:<chat_id>}, поэтому в
+    Redis Cluster лежат в одном слоте с ключом сессии и передаются в
+    скрипты через KEYS.
+    """
+    session_key = f"session:{chat_id}"
+    return session_key, f"conversation:{{{session_key}}}", f"rehydrate_lock:{{{session_key}}}"
+
+# KEYS[1] - ключ сессии; ARGV[1] - TTL, ARGV[2] - id новой сессии на случай промаха
+SESSION_SCRIPT = """
+local session_id = redis.call('GET', KEYS[1])
+if session_id then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+else
+    session_id = ARGV[2]
+    redis.call('SET', KEYS[1], session_id, 'EX', ARGV[1])
+end
+return session_id
+"""
+
+# То же, плюс KEYS[2] - ключ истории; ARGV[3] - сериализованное сообщение,
+# ARGV[4] - максимальная длина истории. Новая сессия начинается с пустой истории.
+SAVE_CONVERSATION_SCRIPT = """
+local session_id = redis.call('GET', KEYS[1])
+if session_id then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+else
+    session_id = ARGV[2]
+    redis.call('SET', KEYS[1], session_id, 'EX', ARGV[1])
+    redis.call('DEL', KEYS[2])
+end
+redis.call('RPUSH', KEYS[2], ARGV[3])
+redis.call('LTRIM', KEYS[2], -tonumber(ARGV[4]), -1)
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return session_id
+"""
+
+# KEYS[1] - ключ сессии, KEYS[2] - ключ истории; ARGV[1] - TTL, ARGV[2] - id новой сессии,
+# ARGV[3] - количество последних сообщений; возвращает {session_id, msg...}
+GET_HISTORY_SCRIPT = """
+local session_id = redis.call('GET', KEYS[1])
+if session_id then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+else
+    session_id = ARGV[2]
+    redis.call('SET', KEYS[1], session_id, 'EX', ARGV[1])
+    redis.call('DEL', KEYS[2])
+end
+local messages = redis.call('LRANGE', KEYS[2], -tonumber(ARGV[3]), -1)
+if #messages > 0 then
+    redis.call('EXPIRE', KEYS[2], ARGV[1])
+end
+table.insert(messages, 1, session_id)
+return messages
+"""
+
+# KEYS[1] - ключ сессии, KEYS[2] - ключ истории, KEYS[3] - ключ блокировки; ARGV[1] - TTL,
+# ARGV[2] - id новой сессии, ARGV[3] - максимальная длина истории, ARGV[4] - TTL блокировки,
+# ARGV[5..] - сообщения (от старых к новым)
+REHYDRATE_SCRIPT = """
+if not redis.call('SET', KEYS[3], '1', 'NX', 'EX', ARGV[4]) then
+    return 0
+end
+local session_id = redis.call('GET', KEYS[1])
+if session_id then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+else
+    session_id = ARGV[2]
+    redis.call('SET', KEYS[1], session_id, 'EX', ARGV[1])
+end
+for i = #ARGV, 5, -1 do
+    redis.call('LPUSH', KEYS[2], ARGV[i])
+end
+redis.call('LTRIM', KEYS[2], -tonumber(ARGV[3]), -1)
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return 1
+"""
+
 class RedisSessionManager:
     """Менеджер сессий с использованием Redis"""
     
     def __init__(self):
         self.redis_client = None
         self.session_timeout = 24 * 3600
+        self.max_history = settings.max_conversation_history
+        self.rehydrate_lock_timeout = 10
+        self._session_script = None
+        self._save_script = None
+        self._history_script = None
+        self._rehydrate_script = None
     
     async def init_redis(self):
         """Инициализация Redis клиента"""
@@ -24,93 +156,164 @@ class RedisSessionManager:
                 port=settings.redis.port,
                 password=settings.redis.password if settings.redis.password else None,
                 db=settings.redis.db,
-                decode_responses=True,
+                decode_responses=False,
                 socket_connect_timeout=5,
                 retry_on_timeout=True
             )
             await self.redis_client.ping()
+            self._session_script = self.redis_client.register_script(SESSION_SCRIPT)
+            self._save_script = self.redis_client.register_script(SAVE_CONVERSATION_SCRIPT)
+            self._history_script = self.redis_client.register_script(GET_HISTORY_SCRIPT)
+            self._rehydrate_script = self.redis_client.register_script(REHYDRATE_SCRIPT)
             logger.info("Redis connection established successfully")
         except Exception as e:
             logger.error(f"Failed to connect to Redis: {e}")
             raise
     
     async def get_or_create_session(self, chat_id: int) -> UUID:
-        """Получение или создание сессии для chat_id"""
+        """Получение или создание сессии для chat_id (один round trip)"""
         if not self.redis_client:
             await self.init_redis()
         
-        session_key = f"session:{chat_id}"
-        existing_session = await self.redis_client.get(session_key)
-        
-        if existing_session:
-            await self.redis_client.expire(session_key, self.session_timeout)
-            return UUID(existing_session)
-        
-        session_id = uuid4()
-        await self.redis_client.setex(
-            session_key, 
-            self.session_timeout, 
-            str(session_id)
+        session_id = await self._session_script(
+            keys=[f"session:{chat_id}"],
+            args=[self.session_timeout, str(uuid4())]
         )
-        return session_id
+        return UUID(session_id.decode())
     
     async def save_conversation(
         self, 
         chat_id: int, 
         user_message: str, 
-        bot_response: str
+        bot_response: str,
+        message_key: Optional[UUID] = None
     ):
-        """Сохранение сообщения в Redis"""
+        """Сохранение сообщения в Redis.
+
+        Сессия, RPUSH, обрезка до max_conversation_history и продление TTL
+        выполняются одним Lua-скриптом; отметка в ZSET активных чатов (другой
+        слот кластера) уходит в том же пайплайне.
+        """
         if not self.redis_client:
             await self.init_redis()
         
-        session_id = await self.get_or_create_session(chat_id)
-        conversation_key = f"conversation:{session_id}"
-        
-        conversation = {
-            "user_message": user_message,
-            "bot_response": bot_response,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        await self.redis_client.rpush(
-            conversation_key, 
-            json.dumps(conversation, ensure_ascii=False)
-        )
-        await self.redis_client.expire(conversation_key, self.session_timeout)
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            await self._save_script(
+                keys=list(session_keys(chat_id)[:2]),
+                args=[
+                    self.session_timeout,
+                    str(uuid4()),
+                    encode_conversation(user_message, bot_response, message_key=message_key),
+                    self.max_history
+                ],
+                client=pipe
+            )
+            pipe.zadd(ACTIVE_CHATS_KEY, {chat_id: int(datetime.now().timestamp())})
+            await pipe.execute()
     
     async def get_conversation_history(
         self, 
         chat_id: int, 
         limit: int = 10
     ) -> List[Dict]:
-        """Получение истории диалога"""
+        """Получение истории диалога (один round trip)"""
         if not self.redis_client:
             await self.init_redis()
         
-        session_id = await self.get_or_create_session(chat_id)
-        conversation_key = f"conversation:{session_id}"
-        
-        conversations = await self.redis_client.lrange(
-            conversation_key, 
-            -limit, 
-            -1
+        result = await self._history_script(
+            keys=list(session_keys(chat_id)[:2]),
+            args=[self.session_timeout, str(uuid4()), limit or 0]
         )
         
-        return [json.loads(conv) for conv in conversations]
+        return [decode_conversation(conv) for conv in result[1:]]
+    
+    async def rehydrate_conversation(self, chat_id: int, conversations: List[Dict]) -> bool:
+        """Массовая загрузка истории в Redis одним вызовом.
+
+        conversations - сообщения от старых к новым, timestamp - datetime,
+        message_key - UUID или None.
+        Записи добавляются в начало списка, поэтому сообщения, сохраненные
+        во время загрузки, остаются последними. Короткая блокировка не дает
+        параллельным промахам по одному чату загружать историю повторно.
+        Возвращает False, если загрузку уже выполняет другой обработчик.
+        """
+        if not self.redis_client:
+            await self.init_redis()
+        
+        if not conversations:
+            return False
+        
+        entries = [
+            encode_conversation(
+                conv["user_message"], conv["bot_response"], conv.get("timestamp"), conv.get("message_key")
+            )
+            for conv in conversations[-self.max_history:]
+        ]
+        
+        rehydrated = await self._rehydrate_script(
+            keys=list(session_keys(chat_id)),
+            args=[
+                self.session_timeout,
+                str(uuid4()),
+                self.max_history,
+                self.rehydrate_lock_timeout,
+                *entries
+            ]
+        )
+        return bool(rehydrated)
     
     async def clear_session(self, chat_id: int):
-        """Очистка сессии"""
+        """Очистка сессии вместе с блокировкой загрузки: следующий промах снова заполнит историю"""
+        if not self.redis_client:
+            await self.init_redis()
+        
+        await self.redis_client.delete(*session_keys(chat_id))
+    
+    async def count_active_chats(self) -> int:
+        """Количество чатов с сообщениями за время жизни сессии (O(log n))"""
+        if not self.redis_client:
+            await self.init_redis()
+        
+        cutoff = int(datetime.now().timestamp()) - self.session_timeout
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(ACTIVE_CHATS_KEY, "-inf", cutoff)
+            pipe.zcard(ACTIVE_CHATS_KEY)
+            _, active = await pipe.execute()
+        return active
+    
+    async def get_memory_usage(self, chat_id: int) -> Dict:
+        """Объем памяти Redis, занимаемый историей чата"""
         if not self.redis_client:
             await self.init_redis()
         
-        session_key = f"session:{chat_id}"
-        session_id = await self.redis_client.get(session_key)
+        _, conversation_key, _ = session_keys(chat_id)
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.llen(conversation_key)
+            pipe.memory_usage(conversation_key)
+            messages, memory = await pipe.execute()
         
-        if session_id:
-            conversation_key = f"conversation:{session_id}"
-            await self.redis_client.delete(conversation_key)
-            await self.redis_client.delete(session_key)
+        return {"chat_id": chat_id, "messages": messages, "bytes": memory or 0}
+    
+    async def get_memory_report(self, max_chats: int = 1000) -> Dict:
+        """Сводка по памяти историй активных чатов (по выборке SCAN)"""
+        if not self.redis_client:
+            await self.init_redis()
+        
+        chats = []
+        async for key in self.redis_client.scan_iter(match="session:*", count=500):
+            chat_id = int(key.decode().split(":", 1)[1])
+            chats.append(await self.get_memory_usage(chat_id))
+            if len(chats) >= max_chats:
+                break
+        
+        total_bytes = sum(chat["bytes"] for chat in chats)
+        return {
+            "active_chats": len(chats),
+            "total_bytes": total_bytes,
+            "avg_bytes_per_chat": total_bytes // len(chats) if chats else 0,
+            "max_bytes_per_chat": max((chat["bytes"] for chat in chats), default=0),
+            "max_history": self.max_history
+        }
     
     async def cleanup_expired_sessions(self):
         """Очистка просроченных сессий (вызывается периодически)"""
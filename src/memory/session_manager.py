@@ -1,12 +1,19 @@
+import asyncio
 from typing import Dict, List, Optional
 from uuid import uuid4, UUID
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import delete
 import logging
 
+from src.config import settings
 from src.database.models import ConversationHistory
 from src.memory.redis_manager import redis_session_manager
+from src.memory.write_behind import history_writer
+from src.memory.history_search import conversation_search
+from src.memory.chat_stats import chat_stats_service
+from src.memory.expiring_map import ExpiringLRUMap
+from src.memory.history_store import history_store
 
 logger = logging.getLogger(__name__)
 
@@ -14,8 +21,11 @@ class SessionManager:
     """Гибридный менеджер сессий (Redis + PostgreSQL)"""
     
     def __init__(self):
-        self.active_sessions: Dict[int, UUID] = {}
-        self.session_timeouts: Dict[UUID, datetime] = {}
+        self.active_sessions: ExpiringLRUMap[int, UUID] = ExpiringLRUMap(
+            max_size=settings.memory_sessions_max_size,
+            ttl=settings.memory_sessions_ttl
+        )
+        self._cleanup_task: Optional[asyncio.Task] = None
     
     async def get_or_create_session(self, chat_id: int) -> UUID:
         """Получение или создание сессии для chat_id"""
@@ -23,14 +33,12 @@ class SessionManager:
             return await redis_session_manager.get_or_create_session(chat_id)
         except Exception as e:
             logger.warning(f"Redis session failed, using memory: {e}")
-            if chat_id in self.active_sessions:
-                session_id = self.active_sessions[chat_id]
-                self.session_timeouts[session_id] = datetime.now()
+            session_id = self.active_sessions.get(chat_id)
+            if session_id:
                 return session_id
             
             session_id = uuid4()
-            self.active_sessions[chat_id] = session_id
-            self.session_timeouts[session_id] = datetime.now()
+            self.active_sessions.set(chat_id, session_id)
             return session_id
     
     async def get_session_history(
@@ -40,48 +48,7 @@ class SessionManager:
         limit: Optional[int] = 10
     ) -> List[dict]:
         """Получение истории диалога (сначала Redis, потом PostgreSQL)"""
-        
-        try:
-            redis_history = await redis_session_manager.get_conversation_history(chat_id, limit)
-            if redis_history:
-                return redis_history
-        except Exception as e:
-            logger.warning(f"Redis history failed: {e}")
-        
-        try:
-            session_id = await self.get_or_create_session(chat_id)
-            
-            stmt = select(ConversationHistory).where(
-                ConversationHistory.session_id == session_id
-            ).order_by(ConversationHistory.timestamp.asc())
-            
-            if limit:
-                stmt = stmt.limit(limit)
-            
-            result = await session.execute(stmt)
-            db_history = result.scalars().all()
-            
-            history_list = []
-            for msg in db_history:
-                history_list.append({
-                    "user_message": msg.user_message,
-                    "bot_response": msg.bot_response,
-                    "timestamp": msg.timestamp.isoformat()
-                })
-            
-            try:
-                for conv in history_list:
-                    await redis_session_manager.save_conversation(
-                        chat_id, conv['user_message'], conv['bot_response']
-                    )
-            except Exception as e:
-                logger.warning(f"Failed to cache history in Redis: {e}")
-            
-            return history_list
-            
-        except Exception as e:
-            logger.error(f"Database history failed: {e}")
-            return []
+        return await history_store.get_recent(chat_id, limit, session)
     
     async def save_conversation(
         self, 
@@ -90,25 +57,39 @@ class SessionManager:
         bot_response: str,
         session: AsyncSession
     ) -> ConversationHistory:
-        """Сохранение сообщения (и в Redis, и в PostgreSQL)"""
+        """Сохранение сообщения (и в Redis, и в PostgreSQL) под одним message_key"""
         
+        message_key = uuid4()
         try:
             await redis_session_manager.save_conversation(
-                chat_id, user_message, bot_response
+                chat_id, user_message, bot_response, message_key
             )
         except Exception as e:
             logger.warning(f"Failed to save to Redis: {e}")
         
         session_id = await self.get_or_create_session(chat_id)
         
+        if history_writer.enabled:
+            try:
+                return await history_writer.enqueue(
+                    chat_id, session_id, user_message, bot_response, message_key
+                )
+            except Exception as e:
+                logger.warning(f"Write-behind enqueue failed, writing directly: {e}")
+        
         conversation = ConversationHistory(
             chat_id=chat_id,
             user_message=user_message,
             bot_response=bot_response,
-            session_id=session_id
+            session_id=session_id,
+            message_key=message_key,
+            timestamp=datetime.now(timezone.utc)
         )
         
         session.add(conversation)
+        await chat_stats_service.record(
+            session, [(chat_id, conversation.timestamp, bot_response)]
+        )
         await session.commit()
         await session.refresh(conversation)
         
@@ -122,76 +103,83 @@ class SessionManager:
         except Exception as e:
             logger.warning(f"Failed to clear Redis session: {e}")
         
-        if chat_id in self.active_sessions:
-            session_id = self.active_sessions[chat_id]
-            del self.active_sessions[chat_id]
-            if session_id in self.session_timeouts:
-                del self.session_timeouts[session_id]
+        self.active_sessions.pop(chat_id)
         
         try:
-            session_id = await self.get_or_create_session(chat_id)
-            
             stmt = delete(ConversationHistory).where(
-                ConversationHistory.session_id == session_id
+                ConversationHistory.chat_id == chat_id
             )
             await session.execute(stmt)
+            await chat_stats_service.rebuild(session, chat_id)
             await session.commit()
             
         except Exception as e:
             logger.error(f"Failed to clear database session: {e}")
             await session.rollback()
     
-    async def cleanup_expired_sessions(self, timeout_hours: int = 24):
+    async def cleanup_expired_sessions(self) -> int:
         """Очистка просроченных сессий в памяти"""
-        now = datetime.now()
-        expired_sessions = []
-        
-        for session_id, last_activity in self.session_timeouts.items():
-            if now - last_activity > timedelta(hours=timeout_hours):
-                expired_sessions.append(session_id)
-        
-        for session_id in expired_sessions:
-            chat_id = None
-            for cid, sid in self.active_sessions.items():
-                if sid == session_id:
-                    chat_id = cid
-                    break
-            
-            if chat_id:
-                del self.active_sessions[chat_id]
-            del self.session_timeouts[session_id]
+        removed = self.active_sessions.sweep()
+        if removed:
+            logger.debug(f"Expired {removed} in-memory sessions")
+        return removed
+    
+    async def _cleanup_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            await self.cleanup_expired_sessions()
+    
+    def start_cleanup(self, interval: float = 60):
+        """Фоновая очистка резервного хранилища сессий"""
+        if self._cleanup_task is None or self._cleanup_task.done():
+            self._cleanup_task = asyncio.create_task(self._cleanup_loop(interval))
+    
+    async def stop_cleanup(self):
+        if self._cleanup_task:
+            self._cleanup_task.cancel()
+            self._cleanup_task = None
+    
+    def get_memory_stats(self) -> Dict[str, int]:
+        """Размер и счетчики вытеснения резервного хранилища сессий"""
+        return self.active_sessions.stats()
 
     async def get_conversation_statistics(self, chat_id: int, session: AsyncSession) -> Dict:
-        """Статистика по диалогу"""
-        from sqlalchemy import func, select
-        stmt = select(
-            func.count(ConversationHistory.id),
-            func.min(ConversationHistory.timestamp),
-            func.max(ConversationHistory.timestamp)
-        ).where(ConversationHistory.chat_id == chat_id)
+        """Статистика по диалогу (одна строка из chat_stats)"""
+        stats = await chat_stats_service.get(session, chat_id)
         
-        result = await session.execute(stmt)
-        count, first_msg, last_msg = result.one()
+        if not stats:
+            return {
+                "total_messages": 0,
+                "first_message": None,
+                "last_message": None,
+                "session_duration": None,
+                "avg_response_length": 0
+            }
         
+        first_msg, last_msg = stats.first_message_at, stats.last_message_at
         return {
-            "total_messages": count,
+            "total_messages": stats.message_count,
             "first_message": first_msg,
             "last_message": last_msg,
-            "session_duration": last_msg - first_msg if last_msg and first_msg else None
+            "session_duration": last_msg - first_msg if last_msg and first_msg else None,
+            "avg_response_length": (
+                stats.total_response_chars // stats.message_count if stats.message_count else 0
+            )
         }
 
-    async def search_conversations(self, query: str, chat_id: int, session: AsyncSession) -> List[Dict]:
-        """Поиск по истории сообщений"""
-        from sqlalchemy import or_
-        stmt = select(ConversationHistory).where(
-            ConversationHistory.chat_id == chat_id,
-            or_(
-                ConversationHistory.user_message.ilike(f"%{query}%"),
-                ConversationHistory.bot_response.ilike(f"%{query}%")
-            )
-        ).order_by(ConversationHistory.timestamp.desc())
-        
-        result = await session.execute(stmt)
-        return [msg for msg in result.scalars().all()]
+    async def search_conversations(
+        self,
+        query: str,
+        chat_id: int,
+        session: AsyncSession,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> Dict:
+        """Поиск по истории сообщений (полнотекстовый + триграммный, постранично)"""
+        return await conversation_search.search(
+            session, chat_id, query, limit=limit, cursor=cursor, since=since, until=until
+        )
 
 session_manager = SessionManager()
@@ -0,0 +1,298 @@
+import asyncio
+import os
+import socket
+import time
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4, UUID
+from datetime import datetime, timezone
+import redis.asyncio as redis
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+import logging
+
+from src.config import settings
+from src.database.database import AsyncSessionLocal
+from src.database.models import ConversationHistory
+from src.memory.redis_manager import redis_session_manager
+from src.memory.chat_stats import chat_stats_service
+
+logger = logging.getLogger(__name__)
+
+def is_transient(error: Exception) -> bool:
+    """Сбой инфраструктуры (БД или Redis недоступны): пачка повторяется целиком"""
+    if isinstance(error, DBAPIError):
+        return error.connection_invalidated or isinstance(error, (OperationalError, InterfaceError))
+    return isinstance(error, (OSError, asyncio.TimeoutError, redis.ConnectionError, redis.TimeoutError))
+
+class ConversationWriteBehind:
+    """Отложенная пакетная запись истории диалогов в PostgreSQL.
+
+    Сообщение сначала попадает в Redis Stream, фоновый flusher читает его
+    через consumer group и вставляет пачками. Подтверждение (XACK) идет
+    только после COMMIT, поэтому доставка at-least-once, а повторы
+    отсекаются уникальной парой (message_key, timestamp).
+    Если пачка не записывается max_attempts раз подряд не из-за
+    недоступности БД, она делится пополам до отдельных записей; записи,
+    которые не пишутся и поодиночке, уходят в dead letter с текстом
+    ошибки, остальные записываются.
+    """
+
+    def __init__(self):
+        self.stream_key = settings.write_behind.stream_key
+        self.group = settings.write_behind.consumer_group
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = settings.write_behind.batch_size
+        self.flush_interval = settings.write_behind.flush_interval
+        self.claim_idle_ms = settings.write_behind.claim_idle_ms
+        self.max_attempts = settings.write_behind.max_attempts
+        self.dead_letter_key = settings.write_behind.dead_letter_key
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+        self._last_claim = 0.0
+        self.flushed_total = 0
+        self.dead_lettered = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.write_behind.enabled
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def _client(self) -> redis.Redis:
+        if not redis_session_manager.redis_client:
+            await redis_session_manager.init_redis()
+        return redis_session_manager.redis_client
+
+    async def enqueue(
+        self,
+        chat_id: int,
+        session_id: UUID,
+        user_message: str,
+        bot_response: str,
+        message_key: Optional[UUID] = None
+    ) -> ConversationHistory:
+        """Надежная постановка сообщения в очередь записи (XADD)"""
+        client = await self._client()
+        message_key = message_key or uuid4()
+        timestamp = datetime.now(timezone.utc)
+
+        await client.xadd(self.stream_key, {
+            "message_key": str(message_key),
+            "chat_id": chat_id,
+            "session_id": str(session_id),
+            "timestamp": timestamp.timestamp(),
+            "user_message": user_message,
+            "bot_response": bot_response
+        })
+
+        return ConversationHistory(
+            chat_id=chat_id,
+            user_message=user_message,
+            bot_response=bot_response,
+            session_id=session_id,
+            message_key=message_key,
+            timestamp=timestamp
+        )
+
+    async def start(self):
+        """Запуск фонового flusher'а"""
+        if not self.enabled or self.is_running:
+            return
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"History write-behind started (consumer {self.consumer})")
+
+    async def stop(self):
+        """Остановка с дозаписью всего, что уже прочитано из потока"""
+        if not self._task:
+            return
+        self._stopping.set()
+        try:
+            await self._task
+        finally:
+            self._task = None
+        logger.info(f"History write-behind stopped, flushed {self.flushed_total} messages")
+
+    async def _ensure_group(self, client: redis.Redis):
+        try:
+            await client.xgroup_create(self.stream_key, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _read(self, client: redis.Redis, count: int, block_ms: Optional[int]) -> List[Tuple[bytes, Dict]]:
+        response = await client.xreadgroup(
+            self.group,
+            self.consumer,
+            streams={self.stream_key: ">"},
+            count=count,
+            block=block_ms
+        )
+        if not response:
+            return []
+        return response[0][1]
+
+    async def _claim_stale(
+        self, client: redis.Redis, limit: int, held: Optional[set] = None
+    ) -> List[Tuple[bytes, Dict]]:
+        """Перехват до limit записей, зависших у упавших обработчиков (включая прежний PID).
+
+        held - идентификаторы, уже лежащие в текущей пачке: свои записи,
+        прочитанные, но еще не подтвержденные, не берутся повторно.
+        """
+        self._last_claim = time.monotonic()
+        held = held or set()
+        claimed = []
+        start_id = "0-0"
+        while len(claimed) < limit:
+            response = await client.xautoclaim(
+                self.stream_key,
+                self.group,
+                self.consumer,
+                min_idle_time=self.claim_idle_ms,
+                start_id=start_id,
+                count=limit - len(claimed)
+            )
+            start_id, entries = response[0], response[1]
+            claimed.extend(entry for entry in entries if entry[1] and entry[0] not in held)
+            if start_id in (b"0-0", "0-0") or not entries:
+                break
+        if claimed:
+            logger.info(f"Claimed {len(claimed)} stale history entries")
+        return claimed
+
+    async def _flush(self, client: redis.Redis, entries: List[Tuple[bytes, Dict]]):
+        rows = {}
+        for _, fields in entries:
+            message_key = fields[b"message_key"].decode()
+            rows[message_key] = {
+                "message_key": UUID(message_key),
+                "chat_id": int(fields[b"chat_id"]),
+                "session_id": UUID(fields[b"session_id"].decode()),
+                "timestamp": datetime.fromtimestamp(float(fields[b"timestamp"]), tz=timezone.utc),
+                "user_message": fields[b"user_message"].decode("utf-8"),
+                "bot_response": fields[b"bot_response"].decode("utf-8"),
+                "message_type": "text"
+            }
+
+        values = list(rows.values())
+        inserted = []
+        async with AsyncSessionLocal() as session:
+            # По batch_size строк на INSERT: 7 колонок упираются в лимит 32767 параметров уже на ~4.6k строк
+            for start in range(0, len(values), self.batch_size):
+                stmt = insert(ConversationHistory).values(values[start:start + self.batch_size])
+                stmt = stmt.on_conflict_do_nothing(
+                    index_elements=["message_key", "timestamp"]
+                ).returning(
+                    ConversationHistory.chat_id,
+                    ConversationHistory.timestamp,
+                    ConversationHistory.bot_response
+                )
+                inserted.extend((await session.execute(stmt)).all())
+            # повторно доставленные записи не попадают в RETURNING и не учитываются дважды
+            await chat_stats_service.record(session, inserted)
+            await session.commit()
+
+        entry_ids = [entry_id for entry_id, _ in entries]
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.xack(self.stream_key, self.group, *entry_ids)
+            pipe.xdel(self.stream_key, *entry_ids)
+            await pipe.execute()
+
+        self.flushed_total += len(rows)
+        logger.debug(f"Flushed {len(rows)} history messages to PostgreSQL")
+
+    async def _isolate(self, client: redis.Redis, entries: List[Tuple[bytes, Dict]], error: Exception):
+        """Поиск битых записей делением пачки пополам"""
+        if len(entries) == 1:
+            # текст ошибки SQLAlchemy содержит SQL и параметры - укорачиваем
+            await self._dead_letter(client, entries, f"{error.__class__.__name__}: {error}"[:1000])
+            return
+        middle = len(entries) // 2
+        for half in (entries[:middle], entries[middle:]):
+            try:
+                await self._flush(client, half)
+            except Exception as e:
+                if is_transient(e):
+                    raise
+                await self._isolate(client, half, e)
+
+    async def _dead_letter(self, client: redis.Redis, entries: List[Tuple[bytes, Dict]], error: str):
+        entry_ids = [entry_id for entry_id, _ in entries]
+        async with client.pipeline(transaction=False) as pipe:
+            for _, fields in entries:
+                pipe.xadd(self.dead_letter_key, {**fields, b"error": error}, maxlen=10000, approximate=True)
+            pipe.xack(self.stream_key, self.group, *entry_ids)
+            pipe.xdel(self.stream_key, *entry_ids)
+            await pipe.execute()
+        self.dead_lettered += len(entries)
+        logger.error(f"Moved {len(entries)} history entries to {self.dead_letter_key}: {error}")
+
+    async def _run(self):
+        client = await self._client()
+        await self._ensure_group(client)
+
+        batch = await self._claim_stale(client, self.batch_size)
+        last_flush = time.monotonic()
+        retrying = False
+        attempts = 0
+
+        while not self._stopping.is_set():
+            try:
+                elapsed = time.monotonic() - last_flush
+                block_ms = max(1, int((self.flush_interval - elapsed) * 1000))
+                if len(batch) < self.batch_size:
+                    batch.extend(await self._read(client, self.batch_size - len(batch), block_ms))
+
+                # Пока пачка не записана из-за сбоя, новые записи не перехватываются: иначе
+                # она растет без ограничений и подбирает собственные неподтвержденные записи
+                if (
+                    not retrying
+                    and len(batch) < self.batch_size
+                    and time.monotonic() - self._last_claim > self.claim_idle_ms / 1000
+                ):
+                    batch.extend(await self._claim_stale(
+                        client,
+                        self.batch_size - len(batch),
+                        {entry_id for entry_id, _ in batch}
+                    ))
+
+                if batch and (
+                    len(batch) >= self.batch_size
+                    or time.monotonic() - last_flush >= self.flush_interval
+                ):
+                    try:
+                        await self._flush(client, batch)
+                    except Exception as e:
+                        attempts += 1
+                        if is_transient(e) or attempts < self.max_attempts:
+                            raise
+                        logger.error(f"History batch failed {attempts} times, isolating bad entries: {e}")
+                        await self._isolate(client, batch, e)
+                    batch = []
+                    retrying = False
+                    attempts = 0
+                if not batch:
+                    last_flush = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                retrying = bool(batch)
+                logger.error(f"History write-behind error, retrying: {e}")
+                await asyncio.sleep(self.flush_interval)
+
+        try:
+            while True:
+                entries = await self._read(client, self.batch_size, None)
+                batch.extend(entries)
+                if batch:
+                    await self._flush(client, batch)
+                    batch = []
+                if not entries:
+                    break
+        except Exception as e:
+            logger.error(f"History write-behind drain failed, entries stay pending: {e}")
+
+history_writer = ConversationWriteBehind()
@@ -0,0 +1,186 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+import aiohttp
+from sqlalchemy import text
+import logging
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+class HealthProber:
+    """Фоновая проверка зависимостей с кэшированным снимком состояния.
+
+    Все проверки запускаются одновременно раз в interval секунд, результат
+    (статус, задержка, ошибка) хранится в памяти вместе с метриками из
+    Redis - числом активных чатов и очередью апдейтов бота. Health-эндпоинты
+    и команда /health читают снимок и не нагружают зависимости сами.
+    Если снимка еще нет, первый вызов выполняет проверку, а параллельные
+    вызовы ждут ее же результат.
+    """
+
+    def __init__(self):
+        self.interval = settings.monitoring.health_probe_interval
+        self.timeout = settings.monitoring.health_probe_timeout
+        self.mcp_urls = {
+            "github": settings.mcp.github_url,
+            "web_search": settings.mcp.web_search_url,
+            "google_sheets": settings.mcp.sheets_url
+        }
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._probe_lock = asyncio.Lock()
+
+    async def _http_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=10, keepalive_timeout=60)
+            )
+        return self._session
+
+    async def _check_database(self):
+        from src.database.database import AsyncSessionLocal
+        async with AsyncSessionLocal() as session:
+            await session.execute(text("SELECT 1"))
+
+    async def _check_redis(self):
+        from src.memory.redis_manager import redis_session_manager
+        if not redis_session_manager.redis_client:
+            await redis_session_manager.init_redis()
+        await redis_session_manager.redis_client.ping()
+
+    async def _check_telegram(self):
+        if not settings.telegram.bot_token:
+            raise RuntimeError("TELEGRAM_BOT_TOKEN is not set")
+        session = await self._http_session()
+        async with session.get(f"https://api.telegram.org/bot{settings.telegram.bot_token}/getMe") as response:
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}")
+
+    def _check_http(self, url: str) -> Callable[[], Awaitable[None]]:
+        async def check():
+            session = await self._http_session()
+            async with session.get(f"{url}/health") as response:
+                if response.status != 200:
+                    raise RuntimeError(f"HTTP {response.status}")
+        return check
+
+    async def _active_chats(self) -> int:
+        from src.memory.redis_manager import redis_session_manager
+        return await redis_session_manager.count_active_chats()
+
+    async def _bot_queue(self) -> Dict[str, Any]:
+        from src.bot.update_stream import update_stream
+        return {"partitions": await update_stream.backlog(), "published": update_stream.published}
+
+    async def _collect(self, name: str, collect: Callable[[], Awaitable[Any]]) -> Any:
+        """Значение метрики для снимка; при ошибке или таймауте - None"""
+        try:
+            async with asyncio.timeout(self.timeout):
+                return await collect()
+        except Exception as e:
+            logger.warning(f"Health metric {name} failed: {e or e.__class__.__name__}")
+            return None
+
+    async def _run_check(self, check: Callable[[], Awaitable[None]]) -> Dict[str, Any]:
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(self.timeout):
+                await check()
+            ok, error = True, None
+        except TimeoutError:
+            ok, error = False, f"timeout after {self.timeout}s"
+        except Exception as e:
+            ok, error = False, str(e) or e.__class__.__name__
+        return {
+            "ok": ok,
+            "latency_ms": round((time.monotonic() - started) * 1000, 1),
+            "error": error
+        }
+
+    async def probe(self) -> Dict[str, Any]:
+        """Одновременная проверка всех зависимостей и обновление снимка"""
+        checks = {
+            "database": self._check_database,
+            "redis": self._check_redis,
+            "telegram": self._check_telegram,
+            **{f"mcp_{name}": self._check_http(url) for name, url in self.mcp_urls.items()}
+        }
+        metrics = {
+            "active_chats": self._active_chats,
+            "bot_queue": self._bot_queue
+        }
+        started = time.monotonic()
+        results, values = await asyncio.gather(
+            asyncio.gather(*(self._run_check(check) for check in checks.values())),
+            asyncio.gather(*(self._collect(name, collect) for name, collect in metrics.items()))
+        )
+
+        self._snapshot = {
+            "checked_at": datetime.now(),
+            "duration_ms": round((time.monotonic() - started) * 1000, 1),
+            "checks": dict(zip(checks, results)),
+            "metrics": dict(zip(metrics, values))
+        }
+        failed = [name for name, result in self._snapshot["checks"].items() if not result["ok"]]
+        if failed:
+            logger.warning(f"Health probe failed checks: {', '.join(failed)}")
+        return self._snapshot
+
+    async def snapshot(self) -> Dict[str, Any]:
+        """Последний снимок; без фонового цикла - проверка по требованию"""
+        if self._snapshot is not None and (self.is_running or not self.is_stale()):
+            return self._snapshot
+        async with self._probe_lock:
+            if self._snapshot is None or (not self.is_running and self.is_stale()):
+                await self.probe()
+        return self._snapshot
+
+    def is_stale(self) -> bool:
+        if self._snapshot is None:
+            return True
+        age = (datetime.now() - self._snapshot["checked_at"]).total_seconds()
+        return age > self.interval * 3
+
+    async def mcp_status(self) -> Dict[str, bool]:
+        checks = (await self.snapshot())["checks"]
+        return {name: checks[f"mcp_{name}"]["ok"] for name in self.mcp_urls}
+
+    async def is_ok(self, name: str) -> bool:
+        return (await self.snapshot())["checks"][name]["ok"]
+
+    async def metric(self, name: str) -> Any:
+        return (await self.snapshot())["metrics"][name]
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.is_running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe()
+            except Exception as e:
+                logger.error(f"Health probe error: {e}")
+            await asyncio.sleep(self.interval)
+
+health_prober = HealthProber()
@@ -5,7 +5,7 @@ from sqlalchemy import select, text
 
 from src.database.database import get_db
 from src.database.models import Candidate
-from src.schemas import CandidateCreate, CandidateResponse
+from src.schemas import CandidateCreate, CandidateEnrichRequest, CandidateResponse
 
 router = APIRouter()
 
@@ -44,6 +44,25 @@ async def get_candidates(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching candidates: {str(e)}")
 
+@router.post("/candidates/enrich")
+async def enrich_candidates(request: CandidateEnrichRequest):
+    """Внеочередное обогащение данными GitHub: устаревшие профили или выбранные кандидаты"""
+    from src.candidates.enrichment import candidate_enricher
+    try:
+        summary = await candidate_enricher.enrich(request.candidate_ids, force=request.force)
+        return {**summary, "totals": candidate_enricher.stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error enriching candidates: {str(e)}")
+
+@router.post("/candidates/sync-sheet")
+async def sync_candidates_sheet():
+    """Внеочередная синхронизация таблицы рекрутеров с кандидатами"""
+    from src.candidates.sheets_sync import candidate_sheet_sync
+    try:
+        return await candidate_sheet_sync.sync()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error syncing sheet: {str(e)}")
+
 @router.get("/candidates/{candidate_id}", response_model=CandidateResponse)
 async def get_candidate(
     candidate_id: int,
@@ -1,14 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 
 from src.database.database import get_db
 from src.memory.session_manager import session_manager
-from src.schemas import ConversationResponse
+from src.memory.redis_manager import redis_session_manager
+from src.memory.history_export import conversation_exporter, EXPORT_FORMATS
+from src.schemas import ConversationHistoryItem, ConversationSearchPage
 
 router = APIRouter()
 
-@router.get("/conversations/{chat_id}", response_model=List[ConversationResponse])
+@router.get("/conversations/export")
+async def export_conversations(
+    chat_ids: List[int] = Query(...),
+    format: str = "ndjson",
+    gzip: bool = False,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """Потоковый экспорт истории нескольких диалогов"""
+    return _export_response(chat_ids, format, gzip, since, until, "conversations")
+
+@router.get("/conversations/{chat_id}", response_model=List[ConversationHistoryItem])
 async def get_conversation_history(
     chat_id: int,
     limit: int = 50,
@@ -40,30 +55,65 @@ async def get_conversation_stats(
     stats = await session_manager.get_conversation_statistics(chat_id, db)
     return stats
 
-@router.get("/conversations/{chat_id}/search")
+@router.get("/conversations/{chat_id}/memory")
+async def get_conversation_memory(chat_id: int):
+    """Объем памяти Redis, занимаемый историей диалога"""
+    try:
+        return await redis_session_manager.get_memory_usage(chat_id)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Redis unavailable: {str(e)}")
+
+@router.get("/conversations/{chat_id}/search", response_model=ConversationSearchPage)
 async def search_conversation(
     chat_id: int,
-    query: str,
+    query: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Поиск по истории диалога"""
-    results = await session_manager.search_conversations(query, chat_id, db)
-    return {"results": results}
+    """Поиск по истории диалога с ранжированием и курсорной пагинацией"""
+    try:
+        return await session_manager.search_conversations(
+            query, chat_id, db, limit=limit, cursor=cursor, since=since, until=until
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _export_response(
+    chat_ids: List[int],
+    format: str,
+    gzip: bool,
+    since: Optional[datetime],
+    until: Optional[datetime],
+    filename: str
+) -> StreamingResponse:
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format: {format}. Use one of: {', '.join(EXPORT_FORMATS)}"
+        )
+    
+    filename = f"{filename}.{format}"
+    media_type = EXPORT_FORMATS[format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    
+    return StreamingResponse(
+        conversation_exporter.stream(chat_ids, format, gzip, since, until),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @router.get("/conversations/{chat_id}/export")
 async def export_conversation(
     chat_id: int,
     format: str = "json",
-    db: AsyncSession = Depends(get_db)
+    gzip: bool = False,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
 ):
-    """Экспорт истории диалога"""
-    history = await session_manager.get_session_history(chat_id, db, limit=1000)
-    
-    if format == "json":
-        return {"chat_id": chat_id, "messages": history}
-    elif format == "txt":
-        text_content = f"История диалога {chat_id}\n\n"
-        for msg in history:
-            text_content += f"Пользователь: {msg['user_message']}\n"
-            text_content += f"Бот: {msg['bot_response']}\n\n"
-        return Response(content=text_content, media_type="text/plain")
+    """Потоковый экспорт истории диалога (json, ndjson, csv, txt)"""
+    return _export_response([chat_id], format, gzip, since, until, f"conversation_{chat_id}")
@@ -1,8 +1,8 @@
 from fastapi import APIRouter
 from datetime import datetime
-from src.database.database import check_db_connection
 from src.bot.telegram_bot import check_bot_health
-from src.mcp.services import check_mcp_services
+from src.memory.history_store import history_store
+from src.monitoring.health_prober import health_prober
 from src.schemas import HealthResponse
 
 router = APIRouter()
@@ -10,20 +10,19 @@ router = APIRouter()
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     try:
-        db_status = await check_db_connection()
-        telegram_status = await check_bot_health()
-        mcp_status = await check_mcp_services()
-
-        telegram_healthy = telegram_status.get("status") == "healthy"
+        snapshot = await health_prober.snapshot()
+        checks = snapshot["checks"]
+        db_status = checks["database"]["ok"]
+        telegram_healthy = checks["telegram"]["ok"]
         
-        overall_status = "healthy" if all([db_status, telegram_healthy]) else "unhealthy"
+        overall_status = "healthy" if all([db_status, telegram_healthy]) and not health_prober.is_stale() else "unhealthy"
         
         return HealthResponse(
             status=overall_status,
             database=db_status,
             telegram=telegram_healthy,
-            mcp_services=mcp_status,
-            timestamp=datetime.now()
+            mcp_services=await health_prober.mcp_status(),
+            timestamp=snapshot["checked_at"]
         )
     except Exception as e:
         return HealthResponse(
@@ -34,9 +33,15 @@ async def health_check():
             timestamp=datetime.now()
         )
 
+@router.get("/health/snapshot")
+async def health_snapshot():
+    """Полный снимок проверок с задержками"""
+    snapshot = await health_prober.snapshot()
+    return {**snapshot, "stale": health_prober.is_stale()}
+
 @router.get("/health/db")
 async def health_db():
-    status = await check_db_connection()
+    status = await health_prober.is_ok("database")
     return {"database": "connected" if status else "disconnected"}
 
 @router.get("/health/telegram")
@@ -44,7 +49,16 @@ async def health_telegram():
     status = await check_bot_health()
     return status
 
+@router.get("/health/history-cache")
+async def health_history_cache():
+    return history_store.get_metrics()
+
+@router.get("/health/bot-queue")
+async def health_bot_queue():
+    """Очередь апдейтов из снимка health prober'а"""
+    return await health_prober.metric("bot_queue") or {"partitions": {}, "published": 0}
+
 @router.get("/health/mcp")
 async def health_mcp():
-    status = await check_mcp_services()
+    status = await health_prober.mcp_status()
     return {"mcp_services": status}
@@ -21,6 +21,22 @@ class ConversationResponse(BaseModel):
     class Config:
         from_attributes=True
 
+class ConversationHistoryItem(BaseModel):
+    user_message: str
+    bot_response: str
+    timestamp: datetime
+
+class ConversationSearchHit(BaseModel):
+    id: int
+    timestamp: datetime
+    rank: float
+    user_message_snippet: str
+    bot_response_snippet: str
+
+class ConversationSearchPage(BaseModel):
+    results: List[ConversationSearchHit]
+    next_cursor: Optional[str] = None
+
 class KnowledgeBaseCreate(BaseModel):
     content: str
     knowledge_metadata: Optional[Dict[str, Any]] = None
@@ -57,12 +73,18 @@ class CandidateResponse(BaseModel):
     experience_level: Optional[str]
     status: Optional[str]
     notes: Optional[str]
+    github_profile: Optional[Dict[str, Any]] = None
+    enriched_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
 
     class Config:
         from_attributes=True
 
+class CandidateEnrichRequest(BaseModel):
+    candidate_ids: Optional[List[int]] = None
+    force: bool = False
+
 class CandidateUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=200)
     email: Optional[EmailStr] = None